@@ -0,0 +1,249 @@
+# benchmarks/__main__.py
+# Conversion throughput benchmark:
+#
+#     python -m benchmarks [--standard ntsc pal] [--minutes 2] [--scenes 6] [--save-baseline]
+#
+# Builds a synthetic tape (benchmarks/dv_synth.py), then times each stage the way the app
+# runs it: frame index, native/dvgrab autosplit, the TapeConverter plan / encode / concat /
+# report phases and hashing. Results are compared with a baseline JSON recorded on the same
+# machine; a stage that got slower (or hungrier) than --tolerance percent fails the run.
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from core import dv_format, dv_index, tools
+from core.config_manager import ConfigManager
+from core.capture_manager import CaptureManager
+from core.converter import TapeConverter
+from retroreel.__main__ import parse_overrides
+from benchmarks import dv_synth
+from benchmarks.meter import StageMeter
+
+STAGES = ["index", "split", "plan", "encode", "concat", "report", "hash"]
+CONVERT_STAGES = {"plan", "encode", "concat", "report"}
+# Stages whose frames/bytes are the whole tape, so fps and MB/s mean something
+THROUGHPUT_STAGES = {"index", "split", "encode", "concat", "hash"}
+COMPARED = ("seconds", "cpu_seconds", "peak_rss_mb") # lower is better for all of them
+# Differences below these are timer / sampling noise, whatever the percentage
+NOISE_FLOOR = {'seconds': 0.25, 'cpu_seconds': 0.25, 'peak_rss_mb': 10}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def machine_info():
+    try:
+        ffmpeg = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    except OSError:
+        ffmpeg = None
+    return {'machine': platform.machine(), 'cpus': os.cpu_count(), 'python': platform.python_version(),
+            'ffmpeg': ffmpeg}
+
+
+def tape_folder(workdir, standard):
+    """Archive layout the converter expects: <root>/<format>/<session>/<client>/dv_format/<tape>."""
+    client = f"bench_{standard.lower()}"
+    folder = os.path.join(workdir, "archive", "mini_dv", "bench", client, "dv_format", f"tape_01_dv-{standard.lower()}")
+    return folder, f"{client}_mdv_t01"
+
+
+def run_standard(standard, args, config, meter, log):
+    """Builds the tape, runs every selected stage, returns {stage: metrics}."""
+    os.makedirs(args.workdir, exist_ok=True)
+    folder, tape_name = tape_folder(args.workdir, standard)
+    shutil.rmtree(os.path.dirname(os.path.dirname(folder)), ignore_errors=True)
+    os.makedirs(folder)
+    master = os.path.join(folder, f"{tape_name}_MASTER.dv")
+
+    source = None
+    if args.fixture in ("auto", "ffmpeg"):
+        source = dv_synth.ffmpeg_source_frames(standard, args.workdir, log)
+        if source is None and args.fixture == "ffmpeg":
+            raise RuntimeError("ffmpeg could not generate the DV source (is a real ffmpeg on PATH?)")
+    decodable = source is not None
+    if source is None:
+        source = dv_synth.raw_source_frames(standard)
+    plan = dv_synth.scene_plan(standard, args.minutes, args.scenes, args.scenes_per_date)
+    log(f"{standard}: writing {args.minutes:g} min in {len(plan)} scenes "
+        f"({'ffmpeg' if decodable else 'raw, not decodable'} frames)...")
+    frames = dv_synth.write_tape(master, source, standard, plan)
+    tape_bytes = frames * dv_format.FRAME_SIZE[standard]
+
+    selected = set(args.stages)
+    skipped = {}
+
+    # Frame index: what trimming, native autosplit and date recovery read
+    if "index" in selected:
+        if dv_index.available():
+            with meter.stage("index"):
+                dv_index.save_index(dv_index.build_index(master), dv_index.index_path_for(master))
+        else:
+            skipped["index"] = "NumPy not installed"
+
+    # Autosplit, the way the capture tab runs it after recording
+    manager = CaptureManager(config)
+    split = False
+    if "split" in selected:
+        if manager.use_native_autosplit() or (dv_index.available() and not tools.which("dvgrab", config)):
+            with meter.stage("split"):
+                manager.split_master(master)
+            split = True
+        elif tools.which("dvgrab", config):
+            with meter.stage("split"):
+                subprocess.run(manager.get_autosplit_command(master), shell=True, check=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            split = True
+        else:
+            skipped["split"] = "needs NumPy (autosplit_engine native) or dvgrab"
+
+    # The master goes out of the tape folder after the split, as in the app; hashing reads it there
+    hash_source = os.path.join(args.workdir, f"master_{standard.lower()}.dv")
+    os.replace(master, hash_source)
+    if os.path.exists(dv_index.index_path_for(master)):
+        os.remove(dv_index.index_path_for(master))
+    if not split:
+        dv_synth.write_scenes(folder, f"{tape_name}-", source, standard, plan)
+
+    if selected & CONVERT_STAGES:
+        if decodable:
+            converter = TapeConverter(folder, config, log=lambda message: None,
+                                      stage=lambda name: meter.switch(name if name in selected else None))
+            if not converter.run():
+                raise RuntimeError(f"{standard}: conversion failed")
+        else:
+            for name in selected & CONVERT_STAGES:
+                skipped[name] = "raw fixture frames can't be decoded (no working ffmpeg)"
+
+    if "hash" in selected:
+        hasher = TapeConverter(folder, config)
+        with meter.stage("hash"):
+            hasher.generate_checksum(hash_source, hasher.checksum_algorithm)
+
+    results = {}
+    for name in STAGES:
+        if name in meter.results:
+            metrics = meter.results.pop(name)
+            if name in THROUGHPUT_STAGES and metrics['seconds'] > 0:
+                metrics['fps'] = frames / metrics['seconds']
+                metrics['mb_s'] = tape_bytes / metrics['seconds'] / 1e6
+            results[name] = {k: round(v, 3) for k, v in metrics.items()}
+        elif name in skipped:
+            results[name] = {'skipped': skipped[name]}
+    if not args.keep:
+        os.remove(hash_source)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Per stage: {metric: percent change}, and the list of regressions beyond tolerance."""
+    changes, regressions = {}, []
+    for standard, stages in results.items():
+        for name, metrics in stages.items():
+            before = baseline.get('results', {}).get(standard, {}).get(name)
+            if not before or 'skipped' in metrics or 'skipped' in before:
+                continue
+            for key in COMPARED:
+                if before.get(key):
+                    change = (metrics[key] - before[key]) / before[key] * 100
+                    changes[(standard, name, key)] = change
+                    if change > tolerance and metrics[key] - before[key] > NOISE_FLOOR[key]:
+                        regressions.append(f"{standard} {name}: {key} {before[key]:g} -> {metrics[key]:g} (+{change:.1f}%)")
+    return changes, regressions
+
+
+def print_table(standard, stages, changes, out=sys.stdout):
+    out.write(f"\n{standard}\n")
+    out.write(f"{'stage':<8}{'seconds':>10}{'fps':>10}{'MB/s':>10}{'CPU s':>10}{'RSS MB':>10}   vs baseline\n")
+    for name, m in stages.items():
+        if 'skipped' in m:
+            out.write(f"{name:<8}  skipped: {m['skipped']}\n")
+            continue
+        delta = " ".join(f"{key.split('_')[0]} {changes[(standard, name, key)]:+.1f}%"
+                         for key in COMPARED if (standard, name, key) in changes)
+        fps = f"{m['fps']:.1f}" if 'fps' in m else "-"
+        mb_s = f"{m['mb_s']:.1f}" if 'mb_s' in m else "-"
+        out.write(f"{name:<8}{m['seconds']:>10.2f}{fps:>10}{mb_s:>10}"
+                  f"{m['cpu_seconds']:>10.2f}{m['peak_rss_mb']:>10.1f}   {delta}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="RetroReel conversion benchmarks")
+    parser.add_argument("--standard", nargs="+", choices=["ntsc", "pal"], default=["ntsc"])
+    parser.add_argument("--minutes", type=float, default=2.0, help="tape length (default 2)")
+    parser.add_argument("--scenes", type=int, default=6, help="number of scenes (default 6)")
+    parser.add_argument("--scenes-per-date", type=int, default=3,
+                        help="scenes recorded on each date, i.e. clips per conversion group (default 3)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--fixture", choices=["auto", "ffmpeg", "raw"], default="auto",
+                        help="ffmpeg: decodable test pattern; raw: layout-only frames (no encode stages); "
+                             "auto: ffmpeg if it works")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="config override for the run (e.g. converter_max_jobs=4, segment_encoding=true)")
+    parser.add_argument("--workdir", help="where the tapes are written (default: a temp folder)")
+    parser.add_argument("--keep", action="store_true", help="leave the tapes and outputs on disk")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="percent a metric may worsen (default 10)")
+    parser.add_argument("--json", metavar="FILE", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    config = ConfigManager()
+    # Reproducible runs: the user's spool / throttling settings stay out of the numbers
+    config.settings.update({"spool_dir": "", "governor": False})
+    config.settings.update(parse_overrides(args.set))
+    temp = None
+    if not args.workdir:
+        temp = args.workdir = tempfile.mkdtemp(prefix="retroreel-bench-")
+    config.settings["root_archive_path"] = os.path.join(args.workdir, "archive")
+
+    params = {'minutes': args.minutes, 'scenes': args.scenes, 'scenes_per_date': args.scenes_per_date,
+              'stages': args.stages, 'fixture': args.fixture, 'overrides': parse_overrides(args.set)}
+    log = lambda message: print(message, file=sys.stderr)
+    results = {}
+    try:
+        with StageMeter() as meter:
+            for standard in args.standard:
+                results[standard.upper()] = run_standard(standard.upper(), args, config, meter, log)
+    except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+        log(f"ERROR: {e}")
+        return 2
+    finally:
+        if temp and not args.keep:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    run = {'version': 1, 'params': params, 'machine': machine_info(), 'results': results}
+    baseline = None
+    if not args.save_baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError):
+            log(f"No baseline at {args.baseline} (record one with --save-baseline)")
+    if baseline and baseline.get('params') != params:
+        log("Baseline was recorded with different parameters; the comparison is only indicative")
+    if baseline and baseline.get('machine') != run['machine']:
+        log("Baseline was recorded on a different machine / ffmpeg; the comparison is only indicative")
+    changes, regressions = compare(results, baseline or {}, args.tolerance)
+
+    for standard, stages in results.items():
+        print_table(standard, stages, changes)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        log(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# benchmarks/capture_load.py
+# Capture load tests on fake hardware (benchmarks/fakehw.py), no camera needed:
+#
+#     python -m benchmarks.capture_load [--decks 4] [--minutes 1] [--rate 0] [--scenarios throughput watchdog stall]
+#
+#   throughput  every deck records at once through the real CaptureEngine (ring buffer, aligned
+#               writer, preview feed); write MB/s per deck and in total, ring high water, CPU, RSS
+#   watchdog    dvgrab dies with SIGSEGV mid-recording; time until RecordingWatchdog reports it
+#   stall       the deck stops sending; time until the capture sees blank_stop_seconds of nothing,
+#               polled like the capture tab does
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+
+from core import dv_format, tools
+from core.config_manager import ConfigManager
+from core.capture_manager import CaptureManager
+from retroreel.__main__ import parse_overrides
+from benchmarks import fakehw
+from benchmarks.meter import StageMeter
+
+SCENARIOS = ["throughput", "watchdog", "stall"]
+STATS_INTERVAL = 1.0 # seconds, the capture tab's stats timer
+FAULT_AT = 2 # tape seconds into the recording before the scripted fault
+
+
+def start_capture(config, deck, folder):
+    os.makedirs(folder, exist_ok=True)
+    master = os.path.join(folder, "bench_mdv_t01_MASTER.dv")
+    return CaptureManager(config, deck).get_capture_engine(master, 0).start()
+
+
+def fake_root(workdir, name, **settings):
+    """Fresh fake hardware for one scenario; the environment selects it for every child process."""
+    root = os.path.join(workdir, name)
+    shutil.rmtree(root, ignore_errors=True)
+    os.environ.update(fakehw.setup(root, **settings))
+    return root
+
+
+def run_throughput(args, config, log):
+    root = fake_root(args.workdir, "throughput", decks=args.decks, standard=args.standard, rate=args.rate,
+                     minutes=args.minutes, end="exit")
+    decks = tools.list_decks(config)
+    log(f"throughput: {len(decks)} deck(s), {args.minutes:g} min each at "
+        f"{'unpaced' if not args.rate else f'{args.rate:g}x'}...")
+    with StageMeter() as meter:
+        meter.switch("throughput")
+        started = time.monotonic()
+        engines = [start_capture(config, deck, os.path.join(root, "capture", deck['node'])) for deck in decks]
+        while any(engine.poll() is None for engine in engines):
+            time.sleep(0.05)
+        for engine in engines:
+            engine.stop()
+        elapsed = time.monotonic() - started
+    metrics = meter.results["throughput"]
+
+    frame_size = dv_format.FRAME_SIZE[args.standard]
+    expected = int(args.minutes * 60 * dv_format.FRAME_RATE[args.standard]) * frame_size
+    per_deck = []
+    for deck, engine in zip(decks, engines):
+        st = engine.stats()
+        if st['error'] or st['bytes_written'] != expected:
+            raise RuntimeError(f"{deck['node']}: wrote {st['bytes_written']} of {expected} bytes ({st['error']})")
+        per_deck.append({'deck': deck['node'], 'mb_s': st['bytes_written'] / elapsed / 1e6,
+                         'ring_high_water_mb': st['buffer_high_water'] / 2**20,
+                         'preview_dropped': st['preview_frames_dropped']})
+    return {'decks': len(decks), 'seconds': elapsed, 'mb_s': expected * len(decks) / elapsed / 1e6,
+            'cpu_seconds': metrics['cpu_seconds'], 'peak_rss_mb': metrics['peak_rss_mb'], 'per_deck': per_deck}
+
+
+def fault_clock(root, kind):
+    for event in fakehw.read_events(root):
+        if event['event'] == kind:
+            return event['clock']
+    return None
+
+
+def run_watchdog(args, config, log):
+    try:
+        from core.workers import RecordingWatchdog
+    except ImportError:
+        return {'skipped': "RecordingWatchdog needs PyQt6"}
+    reactions = []
+    for n in range(args.repeats):
+        root = fake_root(args.workdir, f"watchdog_{n}", standard=args.standard, rate=1.0,
+                         script=f"crash@{FAULT_AT}")
+        engine = start_capture(config, tools.list_decks(config)[0], os.path.join(root, "capture"))
+        watchdog = RecordingWatchdog(engine)
+        # run() returns as soon as a critical stage is reported; no Qt event loop needed for that
+        thread = threading.Thread(target=watchdog.run, daemon=True)
+        thread.start()
+        thread.join(FAULT_AT + 30)
+        reacted = time.monotonic()
+        engine.stop()
+        crashed = fault_clock(root, "crash")
+        if thread.is_alive() or crashed is None:
+            watchdog.stop_monitoring()
+            raise RuntimeError("watchdog: the crash was not reported")
+        reactions.append((reacted - crashed) * 1000)
+        log(f"watchdog: run {n + 1}: {reactions[-1]:.1f} ms")
+    return {'runs': len(reactions), 'median_ms': statistics.median(reactions), 'max_ms': max(reactions)}
+
+
+def run_stall(args, config, log):
+    limit = args.stall_seconds
+    reactions = []
+    for n in range(args.repeats):
+        root = fake_root(args.workdir, f"stall_{n}", standard=args.standard, rate=1.0,
+                         script=f"dropout@{FAULT_AT}:{limit + 30}")
+        engine = start_capture(config, tools.list_decks(config)[0], os.path.join(root, "capture"))
+        deadline = time.monotonic() + FAULT_AT + limit + 30
+        try:
+            while engine.stats()['empty_seconds'] < limit:
+                if time.monotonic() > deadline or engine.poll() is not None:
+                    raise RuntimeError("stall: the capture never saw the dropout")
+                time.sleep(STATS_INTERVAL)
+            reacted = time.monotonic()
+        finally:
+            engine.stop()
+        reactions.append(reacted - fault_clock(root, "dropout") - limit)
+        log(f"stall: run {n + 1}: {limit:g} s limit + {reactions[-1]:.2f} s")
+    return {'runs': len(reactions), 'limit_seconds': limit,
+            'median_late_s': statistics.median(reactions), 'max_late_s': max(reactions)}
+
+
+def print_report(results, out=sys.stdout):
+    t = results.get('throughput')
+    if t:
+        out.write(f"\nthroughput: {t['decks']} deck(s) in {t['seconds']:.2f} s, {t['mb_s']:.1f} MB/s total, "
+                  f"CPU {t['cpu_seconds']:.2f} s, RSS {t['peak_rss_mb']:.1f} MB\n")
+        out.write(f"{'deck':<8}{'MB/s':>10}{'ring MB':>10}{'preview dropped':>18}\n")
+        for d in t['per_deck']:
+            out.write(f"{d['deck']:<8}{d['mb_s']:>10.1f}{d['ring_high_water_mb']:>10.1f}{d['preview_dropped']:>18}\n")
+    w = results.get('watchdog')
+    if w:
+        out.write("\nwatchdog: " + (f"skipped: {w['skipped']}" if 'skipped' in w else
+                                    f"crash reported after {w['median_ms']:.1f} ms (max {w['max_ms']:.1f})") + "\n")
+    s = results.get('stall')
+    if s:
+        out.write(f"\nstall: {s['limit_seconds']:g} s of no signal noticed {s['median_late_s']:.2f} s late "
+                  f"(max {s['max_late_s']:.2f})\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.capture_load",
+                                     description="RetroReel capture load tests on fake hardware")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--decks", type=int, default=2, help="decks recording at once (default 2)")
+    parser.add_argument("--standard", choices=["ntsc", "pal"], default="ntsc")
+    parser.add_argument("--minutes", type=float, default=1.0, help="tape per deck for throughput (default 1)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="throughput decks' speed in times real time (default 0 = unpaced)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of the watchdog / stall scenarios")
+    parser.add_argument("--stall-seconds", type=float, default=2.0, help="blank_stop_seconds for the stall test")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="config override (e.g. capture_mode=live_split, preview_policy=decimate)")
+    parser.add_argument("--workdir", help="where the fake hardware and captures go (default: a temp folder)")
+    parser.add_argument("--keep", action="store_true", help="leave the captures and event logs on disk")
+    parser.add_argument("--json", metavar="FILE", help="also write the results here")
+    args = parser.parse_args(argv)
+    args.standard = args.standard.upper()
+
+    config = ConfigManager()
+    # The fake hardware comes in through the environment; config overrides would hide it
+    config.settings.update({"tool_dir": "", "device_root": "", "firewire_sysfs": ""})
+    config.settings.update(parse_overrides(args.set))
+    temp = None
+    if not args.workdir:
+        temp = args.workdir = tempfile.mkdtemp(prefix="retroreel-capture-")
+    log = lambda message: print(message, file=sys.stderr)
+    results = {}
+    try:
+        for name in args.scenarios:
+            results[name] = globals()[f"run_{name}"](args, config, log)
+    except (OSError, RuntimeError) as e:
+        log(f"ERROR: {e}")
+        return 2
+    finally:
+        if temp and not args.keep:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'params': {k: v for k, v in vars(args).items() if k not in ("workdir", "json", "keep")},
+                       'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# benchmarks/dv_synth.py
+# Synthetic raw DV tapes for the benchmarks: NTSC or PAL, any length, split into scenes whose
+# frames carry camera recording dates/times (VAUX packs) and a running subcode timecode,
+# i.e. what the capture, autosplit and conversion code sees on a real tape.
+import os
+import random
+import datetime
+import subprocess
+
+from core import dv_format
+from core.scene_splitter import dated_scene_name
+
+SOURCE_SECONDS = 10   # length of the picture loop the tape is built from
+GAP_SECONDS = 600     # between scenes of the same date (a new scene, same conversion group)
+DATE_STEP = datetime.timedelta(days=1)
+
+FFMPEG_SOURCE = {
+    'NTSC': ["-f", "lavfi", "-i", "testsrc2=size=720x480:rate=30000/1001"],
+    'PAL': ["-f", "lavfi", "-i", "testsrc2=size=720x576:rate=25"],
+}
+# Output option: it has to come after every input, or ffmpeg applies it to the tone input
+PIXEL_FORMAT = {'NTSC': "yuv411p", 'PAL': "yuv420p"}
+
+
+def _bcd(value):
+    return ((value // 10) << 4) | (value % 10)
+
+
+def date_pack(dt):
+    return bytes([dv_format.PACK_REC_DATE, 0xFF, _bcd(dt.day), _bcd(dt.month), _bcd(dt.year % 100)])
+
+
+def time_pack(dt):
+    return bytes([dv_format.PACK_REC_TIME, 0xFF, _bcd(dt.second), _bcd(dt.minute), _bcd(dt.hour)])
+
+
+def timecode_pack(frame_number, standard):
+    fps = 30 if standard == "NTSC" else 25
+    seconds, frames = divmod(frame_number, fps)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return bytes([dv_format.PACK_TIMECODE, _bcd(frames), _bcd(seconds), _bcd(minutes), _bcd(hours % 24)])
+
+
+# --- SOURCE FRAMES ---
+def ffmpeg_source_frames(standard, workdir, log=print):
+    """
+    A SOURCE_SECONDS test pattern + tone encoded by ffmpeg's DV encoder: real, decodable
+    frames for the encode stages. Returns the frames, or None (after logging why) if ffmpeg
+    couldn't make them.
+    """
+    path = os.path.join(workdir, f"source_{standard.lower()}.dv")
+    if not os.path.exists(path):
+        cmd = (["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"] + FFMPEG_SOURCE[standard]
+               + ["-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000", "-t", str(SOURCE_SECONDS),
+                  "-pix_fmt", PIXEL_FORMAT[standard], "-c:v", "dvvideo", "-c:a", "pcm_s16le", "-ac", "2",
+                  "-f", "dv", path + ".tmp"])
+        try:
+            subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        except OSError as e:
+            log(f"ffmpeg could not generate the DV source: {e}")
+            return None
+        except subprocess.CalledProcessError as e:
+            log(f"ffmpeg could not generate the DV source (exit {e.returncode}): {e.stderr.strip()}")
+            return None
+        os.replace(path + ".tmp", path)
+
+    frame_size = dv_format.FRAME_SIZE[standard]
+    with open(path, "rb") as f:
+        data = f.read()
+    frames = [data[i:i + frame_size] for i in range(0, len(data) - frame_size + 1, frame_size)]
+    if not frames or dv_format.frame_standard(frames[0]) != standard:
+        return None
+    return frames
+
+
+def raw_source_frames(standard, seed=1):
+    """
+    Frames with a valid DIF layout (header, subcode, VAUX, AAUX) around noise: everything our
+    own parsers read, and not blank to the trimmer, but nothing a decoder can show.
+    Good for the index / split / hash stages without ffmpeg.
+    """
+    frame_size = dv_format.FRAME_SIZE[standard]
+    rng = random.Random(seed)
+    frame = bytearray(rng.randbytes(frame_size))
+    block = dv_format.DIF_BLOCK_SIZE
+    for seq in range(frame_size // dv_format.DIF_SEQUENCE_SIZE):
+        base = seq * dv_format.DIF_SEQUENCE_SIZE
+        frame[base:base + 6 * block] = b"\xff" * (6 * block) # header, 2 subcode, 3 VAUX: empty packs
+        frame[base:base + 4] = bytes([0x1F, 0x07, 0x00, 0xBF if standard == "PAL" else 0x3F])
+    # AAUX source pack: 48 kHz / 16-bit, in both the even- and odd-sequence position
+    for offset in (6 * block + 16 * block * 3 + 3, dv_format.DIF_SEQUENCE_SIZE + 6 * block + 3):
+        frame[offset:offset + 5] = bytes([0x50, 0xD0, 0x00, 0xC0, 0x00])
+    return [bytes(frame)]
+
+
+def stamp_offsets(frame):
+    """Where the rec date / rec time packs go in this frame: over existing ones, else in empty slots."""
+    offsets = {}
+    free = []
+    for offset in dv_format.VAUX_PACK_OFFSETS:
+        pack_id = frame[offset]
+        if pack_id in (dv_format.PACK_REC_DATE, dv_format.PACK_REC_TIME):
+            offsets.setdefault(pack_id, []).append(offset)
+        elif pack_id == 0xFF:
+            free.append(offset)
+    if dv_format.PACK_REC_DATE not in offsets or dv_format.PACK_REC_TIME not in offsets:
+        offsets = {dv_format.PACK_REC_DATE: free[0:1], dv_format.PACK_REC_TIME: free[1:2]}
+    return offsets
+
+
+# --- TAPES ---
+def scene_plan(standard, minutes, scenes, scenes_per_date=3, start=datetime.datetime(2004, 5, 21, 10, 0, 0)):
+    """
+    (recorded start, frame count) per scene. Scenes of a date are GAP_SECONDS apart, so they
+    split into separate files but convert into one date group; every scenes_per_date a new day starts.
+    """
+    total = int(minutes * 60 * dv_format.FRAME_RATE[standard])
+    scenes = max(1, min(scenes, total))
+    plan = []
+    for n in range(scenes):
+        frames = total // scenes + (1 if n < total % scenes else 0)
+        day, slot = divmod(n, max(1, scenes_per_date))
+        plan.append((start + day * DATE_STEP + datetime.timedelta(seconds=slot * GAP_SECONDS), frames))
+    return plan
+
+
+def write_frames(f, source, layouts, standard, recorded, frames, first_frame):
+    rate = dv_format.FRAME_RATE[standard]
+    for k in range(frames):
+        i = (first_frame + k) % len(source)
+        frame = bytearray(source[i])
+        dt = recorded + datetime.timedelta(seconds=int(k / rate))
+        for pack_id, pack in ((dv_format.PACK_REC_DATE, date_pack(dt)), (dv_format.PACK_REC_TIME, time_pack(dt))):
+            for offset in layouts[i][pack_id]:
+                frame[offset:offset + 5] = pack
+        frame[dv_format.TIMECODE_OFFSET:dv_format.TIMECODE_OFFSET + 5] = timecode_pack(first_frame + k, standard)
+        f.write(frame)
+
+
+def write_tape(path, source, standard, plan):
+    """The whole tape as one master file (what a capture leaves before autosplit)."""
+    layouts = [stamp_offsets(frame) for frame in source]
+    first = 0
+    with open(path + ".tmp", "wb") as f:
+        for recorded, frames in plan:
+            write_frames(f, source, layouts, standard, recorded, frames, first)
+            first += frames
+    os.replace(path + ".tmp", path)
+    return first
+
+
+def write_scenes(folder, base_name, source, standard, plan):
+    """The tape as dvgrab --autosplit --timestamp would have left it: one named file per scene."""
+    layouts = [stamp_offsets(frame) for frame in source]
+    first = 0
+    paths = []
+    for recorded, frames in plan:
+        path = os.path.join(folder, dated_scene_name(base_name, recorded))
+        with open(path, "wb") as f:
+            write_frames(f, source, layouts, standard, recorded, frames, first)
+        paths.append(path)
+        first += frames
+    return paths
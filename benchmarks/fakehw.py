@@ -0,0 +1,351 @@
+# benchmarks/fakehw.py
+# Fake FireWire hardware for load tests: a device root with fw* nodes, a sysfs tree listing
+# the decks by GUID, and stand-ins for dvgrab, dvcont, mpv, lsmod and groups.
+#
+#     python -m benchmarks.fakehw setup DIR [--decks 2] [--rate 1] [--minutes 10] [--script "dropout@30:5 crash@90"]
+#     eval "$(python -m benchmarks.fakehw setup DIR ...)"   # then start the app / CLI as usual
+#
+# setup prints the RETROREEL_* variables that point the app at DIR (see core/tools.py).
+# The dvgrab stand-in streams a synthetic tape (benchmarks/dv_synth.py, or --source FILE) at
+# --rate times real time (0 = as fast as the reader takes it). Script events, at tape seconds:
+#     dropout@T:D   no data for D seconds (deck lost signal)
+#     blank@T:D     D seconds of unrecorded tape (no date, no timecode)
+#     crash@T       dies with SIGSEGV
+#     exit@T:CODE   exits with CODE
+#     hang@T        stops sending and never exits
+# After the tape: "blank" plays unrecorded tape until stopped, "stop" sends nothing, "exit" exits 0.
+# Every stand-in appends what it did to DIR/events.jsonl, with a CLOCK_MONOTONIC time stamp.
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import argparse
+
+from core import dv_format, firewire
+from core.scene_splitter import SceneSplitter
+from benchmarks import dv_synth
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS = ["dvgrab", "dvcont", "mpv", "lsmod", "groups"]
+CONFIG_FILE = "fakehw.json"
+EVENTS_FILE = "events.jsonl"
+GUID_BASE = 0x0800460103000000 # Sony-style OUI, one per deck
+END_MODES = ("blank", "stop", "exit")
+
+
+# --- SETUP ---
+def parse_script(text):
+    """'dropout@30:5 crash@90' -> [{'kind', 'at', 'arg'}], sorted by tape position."""
+    events = []
+    for item in (text or "").replace(",", " ").split():
+        kind, _, rest = item.partition("@")
+        at, _, arg = rest.partition(":")
+        if kind not in ("dropout", "blank", "crash", "exit", "hang") or not at:
+            raise ValueError(f"bad script event: {item}")
+        events.append({'kind': kind, 'at': float(at), 'arg': float(arg) if arg else None})
+    return sorted(events, key=lambda e: e['at'])
+
+
+def write_attr(folder, name, value):
+    with open(os.path.join(folder, name), "w") as f:
+        f.write(f"{value}\n")
+
+
+def setup(root, decks=1, standard="NTSC", rate=1.0, minutes=10.0, scenes=3, script="", end="blank",
+          source=None, scripts=None):
+    """
+    Builds the fake hardware under root and returns the environment that selects it.
+    scripts: optional per-deck scripts (list), overriding script for those decks.
+    """
+    root = os.path.abspath(root)
+    dev, sysfs, bin_dir = (os.path.join(root, d) for d in ("dev", "sys", "bin"))
+    for d in (dev, sysfs, bin_dir):
+        os.makedirs(d, exist_ok=True)
+    parse_script(script)
+    for text in scripts or []:
+        parse_script(text)
+
+    # fw0 is our own card, fw1.. the decks
+    nodes = [{'node': "fw0", 'guid': f"{GUID_BASE - 1:016x}", 'name': "Fake OHCI", 'local': True}]
+    for n in range(decks):
+        nodes.append({'node': f"fw{n + 1}", 'guid': f"{GUID_BASE + n:016x}", 'name': f"Fake DV deck {n + 1}",
+                      'local': False, 'script': (scripts or [])[n] if n < len(scripts or []) else script})
+    for node in nodes:
+        open(os.path.join(dev, node['node']), "a").close()
+        folder = os.path.join(sysfs, node['node'])
+        os.makedirs(folder, exist_ok=True)
+        write_attr(folder, "guid", f"0x{node['guid']}")
+        vendor, _, model = node['name'].partition(" ")
+        write_attr(folder, "vendor_name", vendor)
+        write_attr(folder, "model_name", model)
+        write_attr(folder, "is_local", 1 if node['local'] else 0)
+        if not node['local']:
+            unit = folder + ".0"
+            os.makedirs(unit, exist_ok=True)
+            write_attr(unit, "specifier_id", f"0x{firewire.AVC_SPECIFIER_ID:06x}")
+
+    settings = {'standard': standard, 'rate': rate, 'minutes': minutes, 'scenes': scenes, 'end': end,
+                'source': os.path.abspath(source) if source else None,
+                'decks': [n for n in nodes if not n['local']]}
+    with open(os.path.join(root, CONFIG_FILE), "w") as f:
+        json.dump(settings, f, indent=2)
+
+    for tool in TOOLS:
+        path = os.path.join(bin_dir, tool)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n"
+                    f"FAKEHW_ROOT={shlex.quote(root)} PYTHONPATH={shlex.quote(APP_ROOT)} "
+                    f"exec {shlex.quote(sys.executable)} -m benchmarks.fakehw {tool} \"$@\"\n")
+        os.chmod(path, 0o755)
+    return {'RETROREEL_TOOL_DIR': bin_dir, 'RETROREEL_DEVICE_ROOT': dev, 'RETROREEL_FIREWIRE_SYSFS': sysfs}
+
+
+def load(root):
+    with open(os.path.join(root, CONFIG_FILE)) as f:
+        return json.load(f)
+
+
+def log_event(root, tool, event, **fields):
+    """One line in events.jsonl. O_APPEND keeps lines from several stand-ins whole."""
+    line = json.dumps({'clock': time.monotonic(), 'tool': tool, 'pid': os.getpid(), 'event': event, **fields})
+    fd = os.open(os.path.join(root, EVENTS_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (line + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+def read_events(root):
+    try:
+        with open(os.path.join(root, EVENTS_FILE)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+# --- DVGRAB ---
+class PacedStream:
+    """
+    File-like target for dv_synth.write_frames: sends each frame when it is due at the deck's
+    rate and plays the script (dropouts, blank tape, crashes) at its tape position.
+    """
+    def __init__(self, out, standard, rate, events, blank, log):
+        self.out = out
+        self.fps = dv_format.FRAME_RATE[standard]
+        self.rate = rate
+        self.events = list(events)
+        self.blank = blank
+        self.log = log
+        self.frames = 0
+        self.started = time.monotonic()
+
+    def pace(self):
+        if self.rate > 0:
+            delay = self.started + self.frames / (self.fps * self.rate) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def send(self, frame):
+        self.pace()
+        self.out.write(frame)
+        self.frames += 1
+
+    def write(self, frame):
+        while self.events and self.events[0]['at'] * self.fps <= self.frames:
+            self.play(self.events.pop(0))
+        self.send(frame)
+
+    def play(self, event):
+        kind, arg = event['kind'], event['arg']
+        self.out.flush()
+        self.log(kind, position=self.frames / self.fps, arg=arg)
+        if kind == "dropout":
+            wall = (arg or 1) / self.rate if self.rate > 0 else (arg or 1)
+            time.sleep(wall)
+            self.started += wall # the stream resumes at the rate, not in a burst
+        elif kind == "blank":
+            for _ in range(int((arg or 1) * self.fps)):
+                self.send(self.blank)
+        elif kind == "crash":
+            os.kill(os.getpid(), signal.SIGSEGV)
+        elif kind == "exit":
+            sys.exit(int(arg or 0))
+        elif kind == "hang":
+            while True:
+                time.sleep(3600)
+
+    def finish(self, end):
+        """Tape is over: play the remaining script while the deck keeps running, then `end`."""
+        self.out.flush()
+        self.log("tape_end", position=self.frames / self.fps)
+        if end == "exit":
+            return
+        while True:
+            if end == "blank" or self.events:
+                self.write(self.blank)
+            else:
+                time.sleep(3600)
+
+
+def deck_for(settings, guid):
+    decks = settings['decks']
+    if guid is None:
+        return decks[0] if decks else None
+    return next((d for d in decks if int(d['guid'], 16) == int(guid, 16)), None)
+
+
+def source_frames(settings):
+    standard = settings['standard']
+    if settings.get('source'):
+        frame_size = dv_format.FRAME_SIZE[standard]
+        with open(settings['source'], "rb") as f:
+            data = f.read()
+        frames = [data[i:i + frame_size] for i in range(0, len(data) - frame_size + 1, frame_size)]
+        if frames:
+            return frames
+    return dv_synth.raw_source_frames(standard)
+
+
+def dvgrab_autosplit(args):
+    """dvgrab --autosplit -I MASTER BASE: scene files in the current folder, dvgrab's naming."""
+    master = os.path.abspath(args.input)
+    splitter = SceneSplitter(master)
+    splitter.folder = os.getcwd()
+    splitter.base_name = args.base or splitter.base_name
+    splitter.index_path = os.path.join(os.getcwd(), f".fakehw-{os.getpid()}.index.json")
+    with open(master, "rb") as f:
+        while True:
+            data = f.read(4 * 1024 * 1024)
+            if not data:
+                break
+            splitter.feed(data)
+    index = splitter.close()
+    os.remove(splitter.index_path)
+    return index
+
+
+def dvgrab(argv, root):
+    parser = argparse.ArgumentParser(prog="dvgrab")
+    parser.add_argument("--guid")
+    parser.add_argument("--format", "-format")
+    parser.add_argument("--autosplit", action="store_true")
+    parser.add_argument("--timestamp", action="store_true")
+    parser.add_argument("--size")
+    parser.add_argument("-I", dest="input")
+    parser.add_argument("base", nargs="?")
+    args = parser.parse_args(argv)
+    settings = load(root)
+    log = lambda event, **fields: log_event(root, "dvgrab", event, guid=args.guid, **fields)
+
+    if args.input:
+        index = dvgrab_autosplit(args)
+        log("autosplit", scenes=len(index['scenes']), frames=index['total_frames'])
+        return 0
+
+    deck = deck_for(settings, args.guid)
+    if deck is None:
+        print(f"Error: no camera{' with GUID ' + args.guid if args.guid else ''} exists", file=sys.stderr)
+        return 1
+    standard = settings['standard']
+    source = source_frames(settings)
+    blank = dv_synth.raw_source_frames(standard)[0]
+    plan = dv_synth.scene_plan(standard, settings['minutes'], settings['scenes'])
+    layouts = [dv_synth.stamp_offsets(frame) for frame in source]
+
+    # SIGTERM from the app's Pipeline.stop() is an ordinary stop, not a crash
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    stream = PacedStream(sys.stdout.buffer, standard, settings['rate'], parse_script(deck.get('script')), blank,
+                         lambda event, **fields: log(event, deck=deck['node'], **fields))
+    log("start", deck=deck['node'], rate=settings['rate'])
+    try:
+        first = 0
+        for recorded, frames in plan:
+            dv_synth.write_frames(stream, source, layouts, standard, recorded, frames, first)
+            first += frames
+        stream.finish(settings['end'])
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Reader went away (capture stopped): like dvgrab, just leave
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
+
+# --- OTHER TOOLS ---
+def dvcont(argv, root):
+    guid = argv[argv.index("--guid") + 1] if "--guid" in argv else None
+    action = " ".join(a for a in argv if a != "--guid" and a != guid)
+    if deck_for(load(root), guid) is None:
+        print("Error: no camera exists", file=sys.stderr)
+        return 1
+    log_event(root, "dvcont", action, guid=guid)
+    return 0
+
+
+def mpv(argv, root):
+    """Reads the preview stream like a player would, without showing anything."""
+    log_event(root, "mpv", "start", args=argv)
+    total = 0
+    stdin = sys.stdin.buffer
+    try:
+        while True:
+            data = stdin.read1(1024 * 1024)
+            if not data:
+                break
+            total += len(data)
+    except KeyboardInterrupt:
+        pass
+    log_event(root, "mpv", "eof", bytes=total)
+    return 0
+
+
+def lsmod(argv, root):
+    print("Module                  Size  Used by")
+    print("firewire_ohci          57344  0")
+    print("firewire_core          86016  1 firewire_ohci")
+    return 0
+
+
+def groups(argv, root):
+    print(f"{os.environ.get('USER', 'user')} video")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in TOOLS:
+        root = os.environ.get("FAKEHW_ROOT")
+        if not root:
+            print("FAKEHW_ROOT is not set (run the wrappers made by `setup`)", file=sys.stderr)
+            return 2
+        return globals()[argv[0]](argv[1:], root)
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fakehw", description="Fake FireWire hardware")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("setup", help="build the fake device root and print the environment for it")
+    p.add_argument("root")
+    p.add_argument("--decks", type=int, default=1)
+    p.add_argument("--standard", choices=["ntsc", "pal"], default="ntsc")
+    p.add_argument("--rate", type=float, default=1.0, help="times real time (0 = unpaced, default 1)")
+    p.add_argument("--minutes", type=float, default=10.0, help="recorded part of each tape (default 10)")
+    p.add_argument("--scenes", type=int, default=3)
+    p.add_argument("--script", default="", help='events for every deck, e.g. "dropout@30:5 crash@90"')
+    p.add_argument("--deck-script", action="append", default=[], metavar="SCRIPT",
+                   help="script for the next deck (repeat per deck; overrides --script)")
+    p.add_argument("--end", choices=END_MODES, default="blank", help="after the tape (default blank)")
+    p.add_argument("--source", help="loop this raw DV file instead of synthetic frames")
+    args = parser.parse_args(argv)
+    try:
+        env = setup(args.root, args.decks, args.standard.upper(), args.rate, args.minutes, args.scenes,
+                    args.script, args.end, args.source, args.deck_script)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for key, value in env.items():
+        print(f"export {key}={shlex.quote(value)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# benchmarks/meter.py
+import os
+import time
+import resource
+import threading
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _descendants(root):
+    """Pids of every process below root (ffmpeg encodes, dvgrab, ...), from /proc."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # pid (comm) state ppid ...: comm may contain spaces, so split after the last ')'
+                ppid = int(f.read().rpartition(")")[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    found, todo = [], [root]
+    while todo:
+        children = parents.get(todo.pop(), [])
+        found += children
+        todo += children
+    return found
+
+
+class StageMeter:
+    """
+    Wall time, CPU time and peak memory of one benchmark stage at a time.
+
+    CPU is ours plus every child we waited for (getrusage deltas). Peak RSS is sampled:
+    this process plus all its descendants at once, which is what a stage running four
+    ffmpeg encodes side by side actually costs the machine.
+    """
+    SAMPLE_INTERVAL = 0.05
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+        self.thread = None
+        self.current = None
+        self.results = {}
+        self.started = self.cpu_start = 0.0
+
+    @staticmethod
+    def cpu_seconds():
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+    def sample(self):
+        pid = os.getpid()
+        while not self.stopped.wait(self.SAMPLE_INTERVAL):
+            total = _rss_kb(pid) + sum(_rss_kb(child) for child in _descendants(pid))
+            with self.lock:
+                self.peak_kb = max(self.peak_kb, total)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.sample, name="stage-meter", daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.switch(None)
+        self.stopped.set()
+        self.thread.join()
+
+    def switch(self, stage):
+        """Closes the running stage (if any) and starts measuring the next one (None = stop)."""
+        now, cpu = time.perf_counter(), self.cpu_seconds()
+        with self.lock:
+            if self.current is not None:
+                self.results[self.current] = {'seconds': now - self.started, 'cpu_seconds': cpu - self.cpu_start,
+                                              'peak_rss_mb': max(self.peak_kb, _rss_kb(os.getpid())) / 1024}
+            self.current = stage
+            self.started, self.cpu_start = now, cpu
+            self.peak_kb = 0
+
+    def stage(self, name):
+        """Context manager form for stages we run ourselves."""
+        meter = self
+
+        class _Stage:
+            def __enter__(self):
+                meter.switch(name)
+
+            def __exit__(self, *exc):
+                meter.switch(None)
+        return _Stage()
@@ -1,11 +1,12 @@
 # session_dialog.py
-import os
-import glob
-import re
+import sqlite3
 from PyQt6.QtWidgets import (QDialog, QFormLayout, QComboBox, QLineEdit, 
                              QLabel, QDialogButtonBox)
 from PyQt6.QtCore import Qt
 
+from core.catalog import ArchiveCatalog
+from core.workers import CatalogRescanWorker
+
 class SessionDialog(QDialog):
     def __init__(self, root_path):
         super().__init__()
@@ -13,6 +14,13 @@ class SessionDialog(QDialog):
         self.resize(450, 250)
         
         self.root_path = root_path 
+        # Tape history comes from the archive catalog (indexed), not from walking the disk per keystroke
+        self.catalog = None
+        self.rescan_worker = None
+        try:
+            self.catalog = ArchiveCatalog(root_path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Catalog unavailable: {e}")
         
         layout = QFormLayout()
         self.setLayout(layout)
@@ -68,6 +76,25 @@ class SessionDialog(QDialog):
         
         self.toggle_manual_input("MiniDV")
 
+        # First use on this archive: build the catalog in the background
+        if self.catalog and not self.catalog.has_been_scanned():
+            self.status_label.setText("Indexing archive for tape history...")
+            self.rescan_worker = CatalogRescanWorker(root_path)
+            self.rescan_worker.status_update.connect(self.status_label.setText)
+            self.rescan_worker.finished.connect(self.on_rescan_finished)
+            self.rescan_worker.start()
+
+    def on_rescan_finished(self, ok):
+        self.status_label.setText("Archive indexed." if ok else "Archive index incomplete.")
+        self.suggest_next_tape()
+
+    def done(self, result):
+        # Don't leave the rescan thread running against a destroyed dialog
+        if self.rescan_worker and self.rescan_worker.isRunning():
+            self.rescan_worker.cancel()
+            self.rescan_worker.wait()
+        super().done(result)
+
     def toggle_manual_input(self, text):
         if text == "MiniDV":
             self.manual_label_input.setVisible(False)
@@ -77,9 +104,15 @@ class SessionDialog(QDialog):
             self.manual_label_label.setVisible(True)
         self.suggest_next_tape()
 
-    def get_base_path(self):
-        fmt_folder = self.format_map[self.format_combo.currentText()]
-        return os.path.join(self.root_path, fmt_folder)
+    def get_format_folder(self):
+        return self.format_map[self.format_combo.currentText()]
+
+    def refresh_client(self, client_folder_name):
+        """Picks up tapes created since the catalog was last scanned (e.g. by another station)."""
+        try:
+            self.catalog.refresh_client(self.get_format_folder(), client_folder_name)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Catalog refresh failed: {e}")
 
     def suggest_next_tape(self):
         f_text = self.fname.text().strip().lower()
@@ -90,34 +123,21 @@ class SessionDialog(QDialog):
             self.status_label.setStyleSheet("color: #666;")
             return
 
+        if not self.catalog:
+            return
+
         client_folder_name = f"{l_text}_{f_text}"
-        base = self.get_base_path()
-        
-        # Pattern to find client folder in any season: .../mini_dv/*/quivey_lara
-        search_pattern = os.path.join(base, "*", client_folder_name)
-        found_client_dirs = glob.glob(search_pattern)
+        fmt_folder = self.get_format_folder()
+        self.refresh_client(client_folder_name)
 
-        if not found_client_dirs:
+        # Client folder in any season: .../mini_dv/*/quivey_lara
+        if not self.catalog.client_exists(fmt_folder, client_folder_name):
             self.tape.setText("01")
             self.status_label.setText("New Client. Starting at Tape 01.")
             self.status_label.setStyleSheet("color: green;")
             return
 
-        max_tape = 0
-        tape_pattern = re.compile(r"tape_(\d+)", re.IGNORECASE)
-
-        for client_dir in found_client_dirs:
-            for root, dirs, files in os.walk(client_dir):
-                for d in dirs:
-                    match = tape_pattern.search(d)
-                    if match:
-                        num = int(match.group(1))
-                        if num > max_tape: max_tape = num
-                for f in files:
-                    match = tape_pattern.search(f)
-                    if match:
-                        num = int(match.group(1))
-                        if num > max_tape: max_tape = num
+        max_tape = self.catalog.max_tape(fmt_folder, client_folder_name)
 
         next_tape = max_tape + 1
         self.tape.setText(f"{next_tape:02d}")
@@ -131,25 +151,12 @@ class SessionDialog(QDialog):
         l_text = self.lname.text().strip().lower()
         tape_num = self.tape.text().strip()
         
-        if not f_text or not l_text or not tape_num:
+        if not f_text or not l_text or not tape_num.isdigit() or not self.catalog:
             return
 
-        base = self.get_base_path()
         client_folder_name = f"{l_text}_{f_text}"
-        search_pattern = os.path.join(base, "*", client_folder_name)
-        found_client_dirs = glob.glob(search_pattern)
-        
-        collision_found = False
-        check_pattern = re.compile(rf"(?:tape_|t|_t)({tape_num})\b", re.IGNORECASE)
-
-        for client_dir in found_client_dirs:
-            for root, dirs, files in os.walk(client_dir):
-                for d in dirs:
-                    if check_pattern.search(d):
-                        collision_found = True
-                for f in files:
-                    if check_pattern.search(f):
-                        collision_found = True
+        self.refresh_client(client_folder_name)
+        collision_found = self.catalog.tape_exists(self.get_format_folder(), client_folder_name, int(tape_num))
 
         if collision_found:
             self.status_label.setText(f"⚠️ WARNING: Tape {tape_num} already exists!")
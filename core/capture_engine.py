@@ -0,0 +1,378 @@
+# core/capture_engine.py
+import os
+import time
+import threading
+import subprocess
+from collections import deque
+
+from core import dv_format, file_ops, governor
+from core.pipeline import Pipeline
+
+PAGE_SIZE = 4096
+
+
+class RingBuffer:
+    """
+    Fixed-size byte ring between the dvgrab reader and the disk writer.
+    put() blocks when the ring is full (the disk must never lose data); get() hands out
+    large contiguous runs. Tracks the high-water mark so we can see how close we came.
+    """
+    def __init__(self, capacity):
+        self.buf = bytearray(capacity)
+        self.capacity = capacity
+        self.head = 0       # next byte to read
+        self.size = 0       # bytes stored
+        self.closed = False
+        self.high_water = 0
+        self.cond = threading.Condition()
+
+    def put(self, data):
+        view = memoryview(data)
+        while len(view):
+            with self.cond:
+                while self.size == self.capacity and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                tail = (self.head + self.size) % self.capacity
+                n = min(len(view), self.capacity - self.size, self.capacity - tail)
+                self.buf[tail:tail + n] = view[:n]
+                self.size += n
+                self.high_water = max(self.high_water, self.size)
+                self.cond.notify_all()
+            view = view[n:]
+
+    def get(self, max_bytes, min_bytes=1, timeout=None):
+        """
+        Waits until min_bytes are buffered (or timeout / close) and returns up to max_bytes.
+        Returns b"" only once the ring is closed and empty.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        with self.cond:
+            while self.size < min_bytes and not self.closed:
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            n = min(self.size, max_bytes)
+            first = min(n, self.capacity - self.head)
+            data = bytes(self.buf[self.head:self.head + first]) + bytes(self.buf[:n - first])
+            self.head = (self.head + n) % self.capacity
+            self.size -= n
+            self.cond.notify_all()
+            return data
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class AlignedFileSink:
+    """
+    Writes the master in large page-aligned blocks; only the final tail may be short.
+    With extent_size set, disk space is reserved ahead of the writer in extents of that size.
+    """
+    def __init__(self, path, block_size, extent_size=0):
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.block_size = block_size
+        self.pending = bytearray()
+        self.extent_size = extent_size
+        self.offset = 0      # bytes written so far
+        self.allocated = 0   # bytes reserved on disk
+
+    def reserved_unused(self):
+        """Space already taken from the disk's free count but not yet written."""
+        return max(0, self.allocated - self.offset)
+
+    def reserve_ahead(self, upcoming):
+        if not self.extent_size or self.offset + upcoming <= self.allocated:
+            return
+        # Best effort: a failure (unsupported fs, no room for a whole extent) just means plain writes
+        if file_ops.preallocate(self.fd, self.allocated, self.extent_size):
+            self.allocated += self.extent_size
+        else:
+            self.extent_size = 0
+
+    def write(self, data, flush=False):
+        self.pending += data
+        # A timed flush writes whole pages only, so every write offset stays page aligned
+        limit = self.block_size if not flush else PAGE_SIZE
+        usable = len(self.pending) - len(self.pending) % limit
+        if usable:
+            self.reserve_ahead(usable)
+            view = memoryview(self.pending)
+            written = 0
+            while written < usable:
+                written += os.write(self.fd, view[written:usable])
+            view.release()
+            del self.pending[:usable]
+            self.offset += usable
+
+    def close(self):
+        try:
+            if self.pending:
+                os.write(self.fd, self.pending)
+                self.offset += len(self.pending)
+                self.pending.clear()
+            if self.allocated > self.offset:
+                os.ftruncate(self.fd, self.offset) # hand back the unused part of the last extent
+        finally:
+            os.close(self.fd)
+
+
+class SplitterSink:
+    """Adapts a SceneSplitter (live split) to the sink interface."""
+    def __init__(self, splitter):
+        self.splitter = splitter
+
+    def write(self, data, flush=False):
+        self.splitter.feed(data)
+
+    def reserved_unused(self):
+        return 0
+
+    def close(self):
+        self.splitter.close()
+
+
+class ContentMonitor:
+    """
+    Tracks how long the stream has carried nothing worth keeping, so a capture left running
+    can stop itself at the end of the recorded part of the tape. Counted as empty:
+      - frames with neither a recording date nor a timecode (unrecorded tape)
+      - undated frames once dated footage has been seen (camera clock gone = past the end)
+      - no frames at all (deck stopped / no signal)
+    Nothing counts until real content has been seen, so the leader before PLAY is ignored.
+    """
+    def __init__(self):
+        self.seen_content = False
+        self.seen_date = False
+        self.empty_frames = 0
+        self.frame_rate = dv_format.FRAME_RATE["NTSC"]
+        self.last_frame = time.monotonic()
+
+    def feed(self, frame, standard):
+        self.last_frame = time.monotonic()
+        self.frame_rate = dv_format.FRAME_RATE[standard]
+        dated = dv_format.frame_recording_datetime(frame) is not None
+        if dated:
+            self.seen_date = True
+        empty = not dated and (self.seen_date or dv_format.frame_timecode(frame) is None)
+        if empty:
+            self.empty_frames += 1
+        else:
+            self.empty_frames = 0
+            self.seen_content = True
+
+    def empty_seconds(self):
+        if not self.seen_content:
+            return 0.0
+        return max(self.empty_frames / self.frame_rate, time.monotonic() - self.last_frame)
+
+
+class CaptureEngine:
+    """
+    In-process replacement for `dvgrab | tee master | mpv`.
+
+    One thread reads dvgrab's stdout into a bounded ring buffer and cuts frames for the
+    preview. The disk writer drains the ring in large aligned writes and always comes first.
+    The preview gets a short frame queue that drops the oldest frame when mpv falls behind,
+    so a stalled X server can never back up into dvgrab.
+
+    Looks like a Pipeline to the rest of the app (start/stop/members/poll), so
+    RecordingWatchdog supervises dvgrab and mpv as before. The preview can be swapped
+    (set_preview) while recording; only mpv restarts, dvgrab and the writer never notice.
+    """
+    RING_BYTES = 64 * 1024 * 1024       # ~18 s of NTSC DV
+    WRITE_BLOCK = 4 * 1024 * 1024       # multiple of the page size
+    READ_CHUNK = 1024 * 1024
+    FLUSH_INTERVAL = 0.5                # seconds before a partly filled block is written anyway
+    PREVIEW_QUEUE_FRAMES = 8
+
+    def __init__(self, source_stages, sink, preview_stages=None, preview_every=1):
+        self.source = Pipeline(source_stages, stdout=subprocess.PIPE)
+        self.sink = sink
+        self.ring = RingBuffer(self.RING_BYTES)
+
+        self.preview = None
+        self.preview_stages = preview_stages
+        self.preview_every = max(1, preview_every) # 1 = every frame, N = every Nth frame
+        self.preview_frames = deque()
+        self.preview_cond = threading.Condition()
+        self.preview_done = False
+        self.preview_thread = None
+        self.frame_number = 0
+        self.standard = None
+        self.content = ContentMonitor()
+        # Preview processes we stopped on purpose; the watchdog shouldn't report them
+        self.retired = set()
+
+        self.counters_lock = threading.Lock()
+        self.counters = {'bytes_read': 0, 'bytes_written': 0, 'frames_written': 0,
+                         'preview_frames_sent': 0, 'preview_frames_dropped': 0, 'preview_frames_skipped': 0}
+        self.frame_size = None
+        self.error = None
+        self.threads = []
+        self.capture_token = None # Tells conversions (see ResourceGovernor) that we are recording
+
+    # --- PIPELINE INTERFACE ---
+    def start(self):
+        self.capture_token = governor.capture_started()
+        self.source.start()
+        self.threads = [threading.Thread(target=self.read_loop, name="capture-reader", daemon=True),
+                        threading.Thread(target=self.write_loop, name="capture-writer", daemon=True)]
+        for t in self.threads:
+            t.start()
+        if self.preview_stages:
+            self.set_preview(self.preview_stages, self.preview_every)
+        return self
+
+    def set_preview(self, stages, every=1):
+        """Replaces the preview process (None = no preview) without touching the recording."""
+        with self.preview_cond:
+            old, self.preview = self.preview, None
+            self.preview_cond.notify_all()
+        if old:
+            self.retired.update(old.processes)
+            old.stop()
+            if self.preview_thread:
+                self.preview_thread.join(5)
+
+        new = Pipeline(stages, stdin=subprocess.PIPE).start() if stages else None
+        with self.preview_cond:
+            self.preview_stages = stages
+            self.preview_every = max(1, every)
+            self.preview_frames.clear()
+            self.preview_done = False
+            self.preview = new
+        if new:
+            self.preview_thread = threading.Thread(target=self.preview_loop, args=(new,),
+                                                   name="capture-preview", daemon=True)
+            self.preview_thread.start()
+
+    def members(self):
+        preview = self.preview
+        return self.source.members() + (preview.members() if preview else [])
+
+    def poll(self):
+        return self.source.poll()
+
+    def stop(self, timeout=30):
+        """Stops dvgrab, lets the writer drain everything already read, then closes the preview."""
+        self.source.stop()
+        for t in self.threads:
+            t.join(timeout)
+        self.set_preview(None)
+        governor.capture_stopped(self.capture_token)
+        self.capture_token = None
+
+    def stats(self):
+        """Snapshot of the counters plus the ring buffer state, for the UI."""
+        with self.counters_lock:
+            stats = dict(self.counters)
+        stats['buffer_capacity'] = self.ring.capacity
+        stats['buffer_fill'] = self.ring.size
+        stats['buffer_high_water'] = self.ring.high_water
+        stats['reserved_unused'] = self.sink.reserved_unused()
+        stats['empty_seconds'] = self.content.empty_seconds()
+        stats['error'] = self.error
+        return stats
+
+    # --- THREADS ---
+    def read_loop(self):
+        stream = self.source.first.stdout
+        pending = bytearray() # partial frame (content check + preview)
+        try:
+            while True:
+                data = stream.read1(self.READ_CHUNK)
+                if not data:
+                    break
+                with self.counters_lock:
+                    self.counters['bytes_read'] += len(data)
+                self.ring.put(data)
+                pending += data
+                pending = self.process_frames(pending)
+        finally:
+            stream.close()
+            self.ring.close()
+
+    def process_frames(self, pending):
+        """Runs the content check on every whole frame and queues the preview's share of them."""
+        if self.frame_size is None:
+            if len(pending) < dv_format.DIF_BLOCK_SIZE:
+                return pending
+            self.standard = dv_format.frame_standard(pending)
+            self.frame_size = dv_format.FRAME_SIZE[self.standard]
+        whole = len(pending) - len(pending) % self.frame_size
+        if not whole:
+            return pending
+        with self.preview_cond:
+            for offset in range(0, whole, self.frame_size):
+                frame = memoryview(pending)[offset:offset + self.frame_size]
+                self.content.feed(frame, self.standard)
+                frame.release()
+                self.frame_number += 1
+                if not self.preview or self.preview_done:
+                    continue
+                if (self.frame_number - 1) % self.preview_every:
+                    with self.counters_lock:
+                        self.counters['preview_frames_skipped'] += 1
+                    continue
+                if len(self.preview_frames) >= self.PREVIEW_QUEUE_FRAMES:
+                    self.preview_frames.popleft()
+                    with self.counters_lock:
+                        self.counters['preview_frames_dropped'] += 1
+                self.preview_frames.append(bytes(pending[offset:offset + self.frame_size]))
+            self.preview_cond.notify()
+        return pending[whole:]
+
+    def write_loop(self):
+        try:
+            while True:
+                data = self.ring.get(self.WRITE_BLOCK, self.WRITE_BLOCK, timeout=self.FLUSH_INTERVAL)
+                if not data:
+                    if self.ring.closed:
+                        break
+                    continue
+                self.sink.write(data, flush=len(data) < self.WRITE_BLOCK)
+                with self.counters_lock:
+                    self.counters['bytes_written'] += len(data)
+                    if self.frame_size:
+                        self.counters['frames_written'] = self.counters['bytes_written'] // self.frame_size
+        except OSError as e:
+            # Disk full / gone: stop the capture rather than silently dropping footage
+            self.error = str(e)
+            self.ring.close()
+            self.source.stop()
+        finally:
+            try:
+                self.sink.close()
+            except OSError as e:
+                self.error = self.error or str(e)
+
+    def preview_loop(self, pipeline):
+        stdin = pipeline.first.stdin
+        try:
+            while True:
+                with self.preview_cond:
+                    while not self.preview_frames and self.preview is pipeline:
+                        self.preview_cond.wait()
+                    if self.preview is not pipeline:
+                        break # Replaced or shut down
+                    frame = self.preview_frames.popleft()
+                stdin.write(frame)
+                stdin.flush()
+                with self.counters_lock:
+                    self.counters['preview_frames_sent'] += 1
+        except (BrokenPipeError, OSError, ValueError):
+            # Preview died; recording carries on. Stop queueing frames until it is replaced.
+            with self.preview_cond:
+                if self.preview is pipeline:
+                    self.preview_done = True
+                    self.preview_frames.clear()
+        finally:
+            try:
+                stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
@@ -5,10 +5,32 @@ import glob
 import datetime
 import subprocess
 import re
+import json
+import sqlite3
+
+from core import dv_format, dv_index, file_ops, firewire, tools
+from core.catalog import ArchiveCatalog
+from core.pipeline import stage
+from core.capture_engine import CaptureEngine, AlignedFileSink, SplitterSink
+from core.scene_splitter import SceneSplitter, dated_scene_name, numbered_scene_name
 
 class CaptureManager:
-    def __init__(self, config):
+    # Preview policy while recording -> label for the UI
+    PREVIEW_POLICIES = {
+        "full": "Full preview",
+        "decimate": "Every Nth frame",
+        "half_res": "Half resolution",
+        "audio_meter": "Audio meter only",
+    }
+
+    def __init__(self, config, deck=None):
         self.config = config
+        # Deck dict from firewire.list_decks(); None = whatever single camera is plugged in
+        self.deck = deck
+
+    def guid_args(self):
+        """Selects our deck on the dvgrab/dvcont command line when several share the bus."""
+        return ["--guid", self.deck['guid']] if self.deck else []
 
     def check_disk_space(self):
         """
@@ -25,17 +47,91 @@ class CaptureManager:
             total, used, free = shutil.disk_usage(path)
             free_gb = free // (2**30)
             
-            # DV is ~13GB per hour. We warn if less than 15GB free.
-            return free_gb >= 15, free_gb
+            # DV is ~13GB per hour (see dv_hour_bytes). Threshold is configurable.
+            return free_gb >= float(self.config.get("min_free_gb") or 15), free_gb
         except Exception:
             return True, 0
 
+    @staticmethod
+    def dv_hour_bytes(standard="NTSC"):
+        return dv_format.FRAME_SIZE[standard] * dv_format.FRAME_RATE[standard] * 3600
+
+    @staticmethod
+    def dv_rate(standard="NTSC"):
+        """Bytes per second one deck writes."""
+        return dv_format.FRAME_SIZE[standard] * dv_format.FRAME_RATE[standard]
+
+    @staticmethod
+    def filesystem_id(path):
+        """st_dev of the nearest existing folder, so decks writing to the same disk are counted together."""
+        while path and not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return None
+
+    def check_capture_load(self, streams):
+        """
+        Combined load of every deck that is recording (or about to). streams are dicts:
+        name, bus (FireWire bus or None), path (output folder), rate (measured bytes/s or None),
+        buffer (capture ring fill 0..1 or None).
+        Returns warning strings; empty when the bench can sustain all of them.
+        """
+        warnings = []
+
+        # 1. FireWire: every DV stream on a bus reserves isochronous bandwidth each cycle
+        speed = int(self.config.get("fw_deck_speed") or 100)
+        by_bus = {}
+        for st in streams:
+            if st['bus']:
+                by_bus.setdefault(st['bus'], []).append(st['name'])
+        for bus, names in by_bus.items():
+            units = len(names) * firewire.dv_bandwidth_units(speed)
+            if units > firewire.BANDWIDTH_AVAILABLE:
+                warnings.append(f"FireWire bus {bus}: {len(names)} decks at S{speed} need ~{units} of "
+                                f"{firewire.BANDWIDTH_AVAILABLE} isochronous units ({', '.join(names)}). "
+                                "Move a deck to another card.")
+
+        # 2. Storage: all decks writing to one disk add up
+        limit = float(self.config.get("archive_write_mb_s") or 0) * 1e6
+        by_disk = {}
+        for st in streams:
+            by_disk.setdefault(self.filesystem_id(st['path']), []).append(st)
+        for members in by_disk.values():
+            needed = sum(st['rate'] or self.dv_rate() for st in members)
+            if limit and needed > limit:
+                warnings.append(f"{len(members)} decks need {needed / 1e6:.1f} MB/s on the disk holding "
+                                f"{members[0]['path']}, above the {limit / 1e6:.0f} MB/s it is rated for.")
+            behind = [st['name'] for st in members if (st['buffer'] or 0) >= 0.5]
+            if behind:
+                warnings.append(f"Storage is falling behind: capture buffer over half full for {', '.join(behind)}.")
+        return warnings
+
+    def project_disk_space(self, path, write_rate, reserved_unused=0):
+        """
+        Live projection while recording.
+        write_rate is the measured capture rate (bytes/s); reserved_unused is space the master
+        already preallocated but hasn't filled, which is still ours to write into.
+        Returns (free_bytes, seconds_until_stop or None, must_stop). must_stop becomes True
+        once free space drops to the configured stop reserve, well before ENOSPC.
+        """
+        free = shutil.disk_usage(path).free + reserved_unused
+        headroom = free - float(self.config.get("stop_reserve_gb") or 2) * 2**30
+        seconds = headroom / write_rate if write_rate > 0 else None
+        return free, seconds, headroom <= 0
+
     def check_firewire_permissions(self):
         """
         Checks if the current user has write access to the FireWire device.
         Returns: True if writable, False if we need sudo.
         """
-        devices = glob.glob('/dev/fw*')
+        if self.deck:
+            return os.access(self.deck['dev_path'], os.R_OK | os.W_OK)
+        devices = tools.fw_devices(self.config)
         if not devices:
             return False # No devices found, so we technically don't have access
         
@@ -74,6 +170,7 @@ class CaptureManager:
     def generate_paths(self, session_data):
         """
         Generates the full folder structure and filename based on session data.
+        The tape folder is created and recorded in the archive catalog.
         Returns: (directory_path, full_file_path, filename_only)
         """
         root_path = self.config.get("root_archive_path")
@@ -109,34 +206,78 @@ class CaptureManager:
         )
         
         full_path = os.path.join(full_dir_path, filename_base)
-        
+        os.makedirs(full_dir_path, exist_ok=True)
+        try:
+            ArchiveCatalog(root_path).record_path(full_dir_path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Catalog update failed: {e}")
+
         return full_dir_path, full_path, filename_base
 
     def run_tape_control(self, action):
         """Runs dvcont commands like play, stop, rewind."""
-        # Dynamic lookup instead of hardcoded path
-        executable = shutil.which("dvcont")
+        # Dynamic lookup instead of hardcoded path (tool_dir first, see core/tools.py)
+        executable = tools.which("dvcont", self.config)
         if not executable:
             # Fallback for systems where it might be in /usr/local/bin not in path
             executable = "/usr/bin/dvcont"
             
-        if not os.path.exists(executable) and shutil.which("dvcont") is None:
+        if not os.path.exists(executable):
              print(f"Error: Could not find dvcont for {action}")
              return
 
-        cmd = [executable, action]
+        cmd = [executable, *self.guid_args(), action]
         try:
             subprocess.Popen(cmd)
         except FileNotFoundError:
             print(f"Error: Could not execute {cmd}")
 
-    def get_capture_command(self, output_path, window_id):
-        """Returns the shell command string for recording."""
-        return f"dvgrab --format raw - | tee {output_path} | mpv --wid={window_id} --profile=low-latency -"
+    def is_live_split(self):
+        """True when scenes are split while recording instead of by a second autosplit pass."""
+        return self.config.get("capture_mode") == "live_split"
 
-    def get_preview_command(self, window_id):
-        """Returns the shell command string for preview only."""
-        return f"dvgrab -format raw - | mpv --wid={window_id} --profile=low-latency -"
+    def get_capture_engine(self, output_path, window_id):
+        """
+        Builds the in-process capture engine: dvgrab -> ring buffer -> master (or live scene
+        split), with a drop-oldest feed to the preview. Call start() on the result.
+        """
+        if self.is_live_split():
+            # Scenes + index are written directly; no _MASTER.dv
+            sink = SplitterSink(SceneSplitter(output_path))
+        else:
+            extent = int(self.config.get("preallocate_mb") or 0) * 1024 * 1024
+            sink = AlignedFileSink(output_path, CaptureEngine.WRITE_BLOCK, extent)
+        preview_stages, every = self.get_recording_preview(window_id)
+        dvgrab = [tools.command("dvgrab", self.config), *self.guid_args(), "--format", "raw", "-"]
+        return CaptureEngine([stage("dvgrab", dvgrab)], sink, preview_stages, every)
+
+    def get_recording_preview(self, window_id, policy=None):
+        """
+        Preview stages + frame decimation for a preview policy (see PREVIEW_POLICIES).
+        The recording never depends on the preview, so mpv isn't a critical stage.
+        """
+        policy = policy or self.config.get("preview_policy")
+        if policy == "decimate":
+            # Only every Nth frame reaches mpv; show them as they arrive, audio would just stutter
+            every = max(2, int(self.config.get("preview_decimation") or 4))
+            return [self.mpv_stage(window_id, ["--untimed", "--no-audio"], critical=False)], every
+        if policy == "half_res":
+            # lowres=1 makes the DV decoder skip the high-frequency coefficients (half size, far less CPU)
+            return [self.mpv_stage(window_id, ["--vd-lavc-o=lowres=1", "--vd-lavc-fast"], critical=False)], 1
+        if policy == "audio_meter":
+            # Video is never decoded: the window shows a level meter built from the audio track
+            meter = "--lavfi-complex=[aid1]asplit[ao][m];[m]showvolume=r=15:w=640:h=30[vo]"
+            return [self.mpv_stage(window_id, [meter], critical=False)], 1
+        return [self.mpv_stage(window_id, critical=False)], 1
+
+    def get_preview_stages(self, window_id):
+        """Returns the preview-only pipeline stages."""
+        dvgrab = [tools.command("dvgrab", self.config), *self.guid_args(), "-format", "raw", "-"]
+        return [stage("dvgrab", dvgrab), self.mpv_stage(window_id)]
+
+    def mpv_stage(self, window_id, extra_args=(), critical=True):
+        mpv = tools.command("mpv", self.config)
+        return stage("mpv", [mpv, f"--wid={window_id}", "--profile=low-latency", *extra_args, "-"], critical=critical)
 
     def get_autosplit_command(self, master_file):
         """Generates the dvgrab autosplit command string."""
@@ -145,7 +286,68 @@ class CaptureManager:
         base_name = os.path.basename(master_file).replace("_MASTER.dv", "-")
         
         # We cd into the directory first to ensure dvgrab writes files locally
-        return f'cd "{folder_path}" && dvgrab --autosplit --timestamp --size 0 --format raw -I "{master_file}" "{base_name}"'
+        dvgrab = tools.shell_command("dvgrab", self.config)
+        return f'cd "{folder_path}" && {dvgrab} --autosplit --timestamp --size 0 --format raw -I "{master_file}" "{base_name}"'
+
+    def get_scene_index_path(self, master_file):
+        """Where a live-split capture leaves its master index."""
+        return SceneSplitter.index_path_for(master_file)
+
+    def load_scene_index(self, master_file):
+        """Returns the live-split master index dict, or None if it hasn't been written (yet)."""
+        try:
+            with open(self.get_scene_index_path(master_file)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def use_native_autosplit(self):
+        """Byte-range splitting needs the frame index (NumPy); otherwise dvgrab does the pass."""
+        return self.config.get("autosplit_engine") == "native" and dv_index.available()
+
+    def split_master(self, master_file, frame_ranges=None, progress=None, should_continue=None):
+        """
+        Cuts the master into per-scene files by byte range. DV frames are fixed size, so a
+        scene is just a contiguous slice of the master: no decoder, and with copy_file_range
+        the data never passes through userspace (btrfs/xfs can share the extents outright).
+        frame_ranges is a list of (first_frame, end_frame); by default the dvgrab autosplit
+        rule is applied to the frame index. Returns the scene files written, in order.
+        """
+        folder_path = os.path.dirname(master_file)
+        base_name = os.path.basename(master_file).replace("_MASTER.dv", "-")
+        frame_size = dv_format.FRAME_SIZE[dv_format.detect_standard(master_file)]
+
+        index = dv_index.load_index(master_file)
+        if frame_ranges is None:
+            frame_ranges = dv_index.scene_ranges(index)
+
+        written = []
+        undated_count = 0
+        with open(master_file, "rb") as src:
+            for n, (first, end) in enumerate(frame_ranges):
+                if should_continue and not should_continue():
+                    break
+
+                # Name the scene after its first stamped frame, like dvgrab does
+                stamps = index['rec_time'][first:end]
+                stamps = stamps[stamps != dv_index.NO_VALUE]
+                name = None
+                if stamps.size:
+                    dt = dv_index.EPOCH + datetime.timedelta(seconds=int(stamps[0]))
+                    name = dated_scene_name(base_name, dt)
+                    if os.path.join(folder_path, name) in written:
+                        name = None
+                if name is None:
+                    undated_count += 1
+                    name = numbered_scene_name(base_name, undated_count)
+
+                scene_path = os.path.join(folder_path, name)
+                with open(scene_path, "wb") as dst:
+                    file_ops.copy_range(src.fileno(), dst.fileno(), first * frame_size, (end - first) * frame_size)
+                written.append(scene_path)
+                if progress:
+                    progress(n + 1, len(frame_ranges), name)
+        return written
 
     def find_split_files(self, master_file):
         """Finds files generated by autosplit in the master file's directory."""
@@ -159,15 +361,17 @@ class CaptureManager:
         return [f for f in files if "_MASTER.dv" not in f]
 
     def has_valid_timestamp(self, file_path):
-        """Checks if a file has a digital date stamp (YYYY.MM.DD) in its name."""
-        try:
-            filename = os.path.basename(file_path)
-            # dvgrab puts dates like 2004.05.21 in the filename if found
-            if "19" in filename or "20" in filename:
-                 return True
-        except:
-            pass
-        return False
+        """
+        Checks if a file carries the camera's recording date.
+        Reads the leading DV frames when NumPy is available (this runs on the UI thread, so no
+        full index), otherwise looks for the YYYY.MM.DD that dvgrab puts in the filename.
+        """
+        if dv_index.available():
+            try:
+                return dv_index.read_recording_datetime(file_path) is not None
+            except (OSError, ValueError):
+                pass
+        return re.search(r"\d{4}\.\d{2}\.\d{2}_\d{2}-\d{2}-\d{2}", os.path.basename(file_path)) is not None
 
     def batch_rename_files(self, file_list, date_str):
         """
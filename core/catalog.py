@@ -0,0 +1,245 @@
+# core/catalog.py
+import os
+import re
+import time
+import sqlite3
+from pathlib import Path
+
+# Tape numbers as they appear in folder and file names: tape_03_dv-2401_2401, doe_jane_mdv_t03-....dv
+TAPE_NUMBER = re.compile(r"(?:tape_|_t)(\d+)", re.IGNORECASE)
+TAPE_KINDS = ("dv_format", "mp4_format")
+
+
+def tape_number(name):
+    """First tape number in a folder/file name, or None."""
+    match = TAPE_NUMBER.search(name)
+    return int(match.group(1)) if match else None
+
+
+def default_db_path():
+    return os.path.join(Path.home(), ".config", "RetroReel", "catalog.db")
+
+
+class ArchiveCatalog:
+    """
+    SQLite index of the archive tree: clients -> tapes -> files.
+
+    Layout: <root>/<format>/<season>/<client>/<dv_format|mp4_format>/<tape folder>/...
+    Lookups (next tape number, collisions) hit the index instead of walking the disk.
+    It is kept current incrementally (new capture folders, finished conversions) and a
+    rescan only re-walks clients whose folders changed since the last one.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY,
+            root TEXT NOT NULL,
+            format TEXT NOT NULL,
+            season TEXT NOT NULL,
+            name TEXT NOT NULL,
+            path TEXT NOT NULL UNIQUE,
+            signature TEXT
+        );
+        CREATE INDEX IF NOT EXISTS clients_lookup ON clients (root, format, name);
+        CREATE TABLE IF NOT EXISTS tapes (
+            id INTEGER PRIMARY KEY,
+            client_id INTEGER NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+            kind TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            number INTEGER,
+            UNIQUE (client_id, kind, folder)
+        );
+        CREATE INDEX IF NOT EXISTS tapes_number ON tapes (client_id, number);
+        CREATE TABLE IF NOT EXISTS files (
+            tape_id INTEGER NOT NULL REFERENCES tapes(id) ON DELETE CASCADE,
+            relpath TEXT NOT NULL,
+            number INTEGER,
+            size INTEGER,
+            mtime REAL,
+            PRIMARY KEY (tape_id, relpath)
+        );
+        CREATE INDEX IF NOT EXISTS files_number ON files (tape_id, number);
+        CREATE TABLE IF NOT EXISTS scans (
+            root TEXT PRIMARY KEY,
+            finished REAL
+        );
+    """
+
+    def __init__(self, root_path, db_path=None):
+        self.root = os.path.abspath(root_path)
+        self.db_path = db_path or default_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self.connect() as db:
+            db.executescript(self.SCHEMA)
+
+    def connect(self):
+        """One short-lived connection per call so the UI and the rescan thread never share one."""
+        db = sqlite3.connect(self.db_path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    # --- LOOKUPS ---
+    def has_been_scanned(self):
+        with self.connect() as db:
+            return db.execute("SELECT 1 FROM scans WHERE root = ?", (self.root,)).fetchone() is not None
+
+    def client_exists(self, format_folder, client_name):
+        with self.connect() as db:
+            row = db.execute("SELECT 1 FROM clients WHERE root = ? AND format = ? AND name = ? LIMIT 1",
+                             (self.root, format_folder, client_name)).fetchone()
+        return row is not None
+
+    def max_tape(self, format_folder, client_name):
+        """Highest tape number seen in any folder/file of the client (any season), or 0."""
+        with self.connect() as db:
+            row = db.execute("""
+                SELECT MAX(n) FROM (
+                    SELECT t.number AS n FROM tapes t JOIN clients c ON c.id = t.client_id
+                        WHERE c.root = ? AND c.format = ? AND c.name = ?
+                    UNION ALL
+                    SELECT f.number FROM files f JOIN tapes t ON t.id = f.tape_id JOIN clients c ON c.id = t.client_id
+                        WHERE c.root = ? AND c.format = ? AND c.name = ?
+                )""", (self.root, format_folder, client_name) * 2).fetchone()
+        return row[0] or 0
+
+    def tape_exists(self, format_folder, client_name, number):
+        with self.connect() as db:
+            row = db.execute("""
+                SELECT 1 FROM tapes t JOIN clients c ON c.id = t.client_id
+                    WHERE c.root = ? AND c.format = ? AND c.name = ? AND t.number = ?
+                UNION ALL
+                SELECT 1 FROM files f JOIN tapes t ON t.id = f.tape_id JOIN clients c ON c.id = t.client_id
+                    WHERE c.root = ? AND c.format = ? AND c.name = ? AND f.number = ?
+                LIMIT 1""", (self.root, format_folder, client_name, number) * 2).fetchone()
+        return row is not None
+
+    # --- UPDATES ---
+    def split_path(self, path):
+        """(format, season, client, kind, tape folder) for a path inside the archive; missing parts are None."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        parts = rel.split(os.sep)
+        if rel.startswith(os.pardir) or len(parts) < 3:
+            return None
+        return tuple(parts[:5]) + (None,) * (5 - len(parts[:5]))
+
+    @staticmethod
+    def client_signature(client_dir):
+        """mtimes of the folders that change when a tape is added or removed."""
+        stamps = []
+        for sub in ("",) + TAPE_KINDS:
+            try:
+                stamps.append(str(os.stat(os.path.join(client_dir, sub)).st_mtime_ns))
+            except OSError:
+                stamps.append("-")
+        return ":".join(stamps)
+
+    def upsert_client(self, db, format_folder, season, client_name):
+        path = os.path.join(self.root, format_folder, season, client_name)
+        db.execute("INSERT OR IGNORE INTO clients (root, format, season, name, path) VALUES (?, ?, ?, ?, ?)",
+                   (self.root, format_folder, season, client_name, path))
+        return db.execute("SELECT id FROM clients WHERE path = ?", (path,)).fetchone()[0]
+
+    def index_tape(self, db, client_id, kind, folder, tape_dir):
+        db.execute("INSERT OR IGNORE INTO tapes (client_id, kind, folder, number) VALUES (?, ?, ?, ?)",
+                   (client_id, kind, folder, tape_number(folder)))
+        tape_id = db.execute("SELECT id FROM tapes WHERE client_id = ? AND kind = ? AND folder = ?",
+                             (client_id, kind, folder)).fetchone()[0]
+        db.execute("DELETE FROM files WHERE tape_id = ?", (tape_id,))
+
+        rows = []
+        for root, dirs, files in os.walk(tape_dir):
+            for name in dirs + files:
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                rows.append((tape_id, os.path.relpath(full, tape_dir), tape_number(name), st.st_size, st.st_mtime))
+        db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+
+    def record_path(self, path):
+        """
+        Brings one tape folder (or a whole client, for shallower paths) up to date.
+        Called when a capture folder is created and when a conversion finishes.
+        Paths outside the archive root are ignored.
+        """
+        parts = self.split_path(path)
+        if parts is None:
+            return
+        format_folder, season, client_name, kind, folder = parts
+        if kind is None or folder is None or kind not in TAPE_KINDS:
+            self.scan_client(os.path.join(self.root, format_folder, season, client_name))
+            return
+
+        with self.connect() as db:
+            client_id = self.upsert_client(db, format_folder, season, client_name)
+            self.index_tape(db, client_id, kind, folder, os.path.join(self.root, format_folder, season, client_name, kind, folder))
+
+    def scan_client(self, client_dir):
+        format_folder, season, client_name = self.split_path(client_dir)[:3]
+        with self.connect() as db:
+            db.execute("DELETE FROM clients WHERE path = ?", (os.path.join(self.root, format_folder, season, client_name),))
+            if not os.path.isdir(client_dir):
+                return
+            client_id = self.upsert_client(db, format_folder, season, client_name)
+            for kind in TAPE_KINDS:
+                kind_dir = os.path.join(client_dir, kind)
+                try:
+                    folders = [e.name for e in os.scandir(kind_dir) if e.is_dir()]
+                except OSError:
+                    continue
+                for folder in folders:
+                    self.index_tape(db, client_id, kind, folder, os.path.join(kind_dir, folder))
+            db.execute("UPDATE clients SET signature = ? WHERE id = ?", (self.client_signature(client_dir), client_id))
+
+    def refresh_client(self, format_folder, client_name):
+        """
+        Re-indexes this client's folders (any season) that changed since they were indexed,
+        e.g. a tape another station created while we were running. Only stats the client
+        folders unless something changed, so it is cheap enough to run before every lookup.
+        """
+        format_dir = os.path.join(self.root, format_folder)
+        current = [path for path in (os.path.join(season, client_name) for season in self._subdirs(format_dir))
+                   if os.path.isdir(path)]
+        with self.connect() as db:
+            known = dict(db.execute("SELECT path, signature FROM clients WHERE root = ? AND format = ? AND name = ?",
+                                    (self.root, format_folder, client_name)).fetchall())
+        for client_dir in sorted(set(current) | set(known)):
+            # scan_client also drops a client folder that has gone
+            if known.get(client_dir) != self.client_signature(client_dir) or client_dir not in current:
+                self.scan_client(client_dir)
+
+    def rescan(self, full=False, progress=None, should_continue=None):
+        """
+        Walks <root>/<format>/<season>/<client> and re-indexes clients whose signature changed
+        (all of them with full=True). Clients that disappeared are dropped.
+        progress(done, total) is called after each client; should_continue() can abort early.
+        """
+        client_dirs = []
+        for format_entry in self._subdirs(self.root):
+            for season_entry in self._subdirs(format_entry):
+                client_dirs.extend(self._subdirs(season_entry))
+
+        with self.connect() as db:
+            known = dict(db.execute("SELECT path, signature FROM clients WHERE root = ?", (self.root,)).fetchall())
+
+        for n, client_dir in enumerate(client_dirs):
+            if should_continue and not should_continue():
+                return False
+            if full or known.get(client_dir) != self.client_signature(client_dir):
+                self.scan_client(client_dir)
+            if progress:
+                progress(n + 1, len(client_dirs))
+
+        with self.connect() as db:
+            gone = set(known) - set(client_dirs)
+            db.executemany("DELETE FROM clients WHERE path = ?", [(p,) for p in gone])
+            db.execute("INSERT OR REPLACE INTO scans (root, finished) VALUES (?, ?)", (self.root, time.time()))
+        return True
+
+    @staticmethod
+    def _subdirs(path):
+        try:
+            return sorted(e.path for e in os.scandir(path) if e.is_dir() and not e.name.startswith("."))
+        except OSError:
+            return []
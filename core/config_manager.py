@@ -13,6 +13,37 @@ class ConfigManager:
             "root_archive_path": os.path.join(Path.home(), "Desktop", "RetroReel"),
             "ffmpeg_crf": "20",
             "ffmpeg_preset": "medium",
+            "converter_max_jobs": 0, # 0 = auto-size from CPU count
+            "segment_encoding": False, # Split long clips into frame-aligned chunks and encode them in parallel
+            "segment_seconds": 300,
+            "output_profiles": ["master"], # Add "proxy_360p" / "thumbnails" to get them from the same decode pass
+            "thumbnail_interval": 10, # Seconds between thumbnails
+            "keep_clip_files": True, # False = encode each date group straight into its merged MP4
+            "checksum_algorithm": "md5", # md5 (client default), sha256 or blake2b
+            "trim_blank": False, # Opt-in: leave unrecorded / black-and-silent stretches out of the MP4s (needs NumPy)
+            "blank_min_seconds": 3, # Shorter blank runs (fades, cuts) are kept
+            "capture_mode": "master", # "live_split" writes scene files during capture (no autosplit pass)
+            "autosplit_engine": "dvgrab", # "native" = byte-range split from the frame index (needs NumPy)
+            "preview_policy": "full", # Preview while recording: full, decimate, half_res or audio_meter
+            "preview_decimation": 4, # "decimate" shows every Nth frame
+            "min_free_gb": 15, # Warn before recording below this much free space
+            "stop_reserve_gb": 2, # Recording stops by itself when free space falls to this
+            "preallocate_mb": 1024, # Master file is reserved on disk in extents of this size (0 = off)
+            "blank_stop_seconds": 0, # Opt-in: stop recording after this long of blank tape / no signal / lost date (0 = off)
+            "fw_deck_speed": 100, # Mbit/s the decks send at (camcorders are S100); for bus bandwidth warnings
+            "archive_write_mb_s": 30, # Sustained write speed to trust the archive disk with (0 = don't check)
+            "governor": True, # Throttle conversions while a deck is recording
+            "capture_max_jobs": 1, # Parallel encodes allowed while recording
+            "capture_nice": 10, # Nice level of encodes while recording (I/O drops to the idle class too)
+            "capture_reserved_cores": 2, # Cores kept free of encodes while recording
+            "ingest_watch": False, # Queue tape folders finished anywhere in the archive (other stations too); ones already there on first use are left alone
+            "ingest_settle_seconds": 120, # A tape's .dv files must be unchanged this long before it is queued
+            "spool_dir": "", # Shared folder (on the archive share) for handing encodes to other stations; "" = local only
+            "spool_worker": False, # Take encodes other stations put in the spool
+            "spool_lease_seconds": 60, # A claimed encode whose station stays silent this long goes back in the pool
+            "tool_dir": "", # Folder searched for dvgrab / dvcont / mpv / lsmod / groups before PATH (DIR/bin of `python -m benchmarks.fakehw setup DIR` for load tests)
+            "device_root": "", # Where the fw* nodes are; "" = $RETROREEL_DEVICE_ROOT or /dev
+            "firewire_sysfs": "", # FireWire sysfs device tree; "" = $RETROREEL_FIREWIRE_SYSFS or /sys/bus/firewire/devices
             "show_startup_tutorial": True 
         }
         
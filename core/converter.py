@@ -0,0 +1,989 @@
+# core/converter.py
+import shutil
+import subprocess
+import os
+import re
+import datetime
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from core import dv_format, dv_index, file_ops
+from core.manifest import ConversionManifest, partial_path
+from core.catalog import ArchiveCatalog
+from core.governor import ResourceGovernor
+from core.spool import EncodeSpool, clear_attempts
+
+AUDIO_ARGS = ("-c:a", "-b:a") # Profile args that belong to the audio encoder
+
+
+class TapeConverter:
+    """
+    Converts one DV tape folder into its mp4_format twin: per-clip / per-date MP4s, extra
+    profiles, checksums and the transfer report.
+
+    No Qt in here, so the GUI worker, the CLI and the daemon all run the same code.
+    Progress goes out through plain callbacks:
+        log(message), progress(percent), job_progress(label, percent), throughput(fps, eta_seconds),
+        stage(name) as each phase starts: plan, encode, concat, report, then None when done
+    """
+    HASH_BUFFER_SIZE = 8 * 1024 * 1024
+    SPOOL_WAITERS = 32 # Pool threads that may wait on encodes running on other stations
+    SEGMENT_OVERLAP = 2 # Frames each segment also decodes past its cuts, for yadif's neighbours
+    # Supported digests and the sidecar extension md5sum/sha256sum/b2sum users expect
+    CHECKSUM_SIDECARS = {'md5': 'md5', 'sha256': 'sha256', 'blake2b': 'b2'}
+
+    # Deliverables that share the master's decode + yadif pass. 'filter' runs after the
+    # deinterlace ({interval}/{offset} are filled in per job), 'args' are the encoder options.
+    # Joinable outputs are video files that segment mode stitches back together.
+    OUTPUT_PROFILES = {
+        'master': {
+            'folder': None, 'suffix': '.mp4', 'filter': None, 'audio': True, 'joinable': True,
+            'args': ["-c:v", "libx264", "-crf", "20", "-preset", "medium",
+                     "-c:a", "aac", "-b:a", "192k", "-movflags", "+faststart"]
+        },
+        'proxy_360p': {
+            'folder': 'proxy', 'suffix': '_proxy.mp4', 'filter': "scale=-2:360", 'audio': True, 'joinable': True,
+            'args': ["-c:v", "libx264", "-crf", "28", "-preset", "veryfast",
+                     "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart"]
+        },
+        'thumbnails': {
+            # One still every {period} frames of the clip, named by its number k (pts = k). {first} is
+            # where this input starts in the clip, so segments number clip-relative and never overlap;
+            # frame 0 is always picked, so even a clip shorter than the interval gets its still.
+            'folder': 'thumbs', 'suffix': '_%05d.jpg', 'audio': False, 'joinable': False,
+            'filter': "select=not(mod(n+{first}\\,{period})),setpts=N+{index}",
+            'args': ["-fps_mode", "passthrough", "-q:v", "3", "-frame_pts", "1"]
+        },
+    }
+
+    def __init__(self, root_dir, config=None, log=print, progress=None, job_progress=None, throughput=None,
+                 stage=None):
+        self.log = log
+        self.progress = progress or (lambda percent: None)
+        self.job_progress = job_progress or (lambda label, percent: None)  # job label, percent
+        self.throughput = throughput or (lambda fps, eta: None)            # combined encode fps, ETA seconds (-1 = unknown)
+        self.stage = stage or (lambda name: None)                          # phase name (timing hooks, e.g. benchmarks)
+
+        self.root_dir = root_dir.rstrip(os.sep) 
+        self.is_running = True
+        self.start_time = None
+        self.max_jobs = self.resolve_job_count(config.get("converter_max_jobs") if config else 0)
+
+        # Segment mode: long clips are cut at frame boundaries and the pieces encoded in parallel
+        self.segment_seconds = 0
+        if config and config.get("segment_encoding"):
+            self.segment_seconds = int(config.get("segment_seconds") or 0)
+
+        # Output profiles: the master MP4 is always produced, extras come from config
+        requested = config.get("output_profiles") if config else None
+        self.output_profiles = ['master'] + [p for p in (requested or []) if p in self.OUTPUT_PROFILES and p != 'master']
+        self.thumbnail_interval = int(config.get("thumbnail_interval") or 10) if config else 10
+
+        # Per-clip MP4s are kept by default; turning this off encodes each date group directly
+        self.keep_clip_files = config.get("keep_clip_files") if config else True
+        if self.keep_clip_files is None: self.keep_clip_files = True
+
+        # Blank/silent trimming works off the DV frame index, so it quietly needs NumPy
+        self.trim_blank = bool(config.get("trim_blank")) if config else False
+        self.blank_min_seconds = float(config.get("blank_min_seconds") or 3) if config else 3.0
+
+        self.checksum_algorithm = (config.get("checksum_algorithm") if config else None) or "md5"
+        if self.checksum_algorithm not in self.CHECKSUM_SIDECARS: self.checksum_algorithm = "md5"
+        self.hash_pool = None
+        self.checksums = {}
+        self.manifest = None
+        self.archive_root = config.get("root_archive_path") if config else None
+        # Throttles encodes while a deck is recording (created per run)
+        self.config = config
+        self.governor = None
+        # Shared spool: other stations may take encodes off this conversion (created per run)
+        self.spool_dir = config.get("spool_dir") if config else None
+        self.spool = None
+        self.local_slots = None
+
+        # Progress is tracked in DV input bytes: DV is constant bitrate, so bytes map exactly to time
+        self.progress_lock = threading.Lock()
+        self.phase = {'lo': 0, 'hi': 80, 'total': 1, 'done': 0, 'start_done': 0, 'started': time.time()}
+        self.active_jobs = {}
+
+    @staticmethod
+    def output_paths(root_dir):
+        """(mp4 tape folder, transfer report path) a dv_format tape folder converts into."""
+        root_dir = root_dir.rstrip(os.sep)
+        tape_dv_folder = os.path.basename(root_dir)
+        client_dir = os.path.dirname(os.path.dirname(root_dir))
+        mp4_tape_name = tape_dv_folder.replace("_dv-", "_mp4-") if "_dv-" in tape_dv_folder else f"{tape_dv_folder}_mp4"
+        dest_base = os.path.join(client_dir, "mp4_format", mp4_tape_name)
+        # Report name format: quivey_lara_mdv_t01_transfer_report.txt
+        return dest_base, os.path.join(dest_base, f"{tape_dv_folder}_transfer_report.txt")
+
+    def stop(self):
+        """Lets running encodes finish and starts nothing new."""
+        self.is_running = False
+
+    @staticmethod
+    def resolve_job_count(configured):
+        """
+        Number of ffmpeg encodes to run at once.
+        0 (or anything invalid) means auto: libx264 already threads internally,
+        so one encode per 4 cores keeps the box busy without thrashing.
+        """
+        try:
+            configured = int(configured)
+        except (TypeError, ValueError):
+            configured = 0
+        if configured > 0:
+            return configured
+        return max(1, (os.cpu_count() or 1) // 4)
+
+    def generate_checksum(self, filename, algorithm="md5"):
+        # Large buffer + readinto keeps this a handful of syscalls per GB instead of millions
+        digest = hashlib.new(algorithm)
+        buf = bytearray(self.HASH_BUFFER_SIZE)
+        view = memoryview(buf)
+        with open(filename, "rb", buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                digest.update(view[:n])
+        return digest.hexdigest()
+
+    def checksum_with_sidecar(self, filename):
+        """
+        Returns the digest of filename and writes the matching sidecar (e.g. clip.mp4.md5)
+        in the standard '<hex>  <name>' format. A sidecar newer than the file is reused.
+        """
+        algorithm = self.checksum_algorithm
+        sidecar = f"{filename}.{self.CHECKSUM_SIDECARS[algorithm]}"
+        name = os.path.basename(filename)
+
+        if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(filename):
+            with open(sidecar) as f:
+                parts = f.read().split()
+            if len(parts) == 2 and parts[1] == name:
+                return parts[0]
+
+        hexdigest = self.generate_checksum(filename, algorithm)
+        with open(sidecar, "w") as f:
+            f.write(f"{hexdigest}  {name}\n")
+        if self.manifest:
+            self.manifest.set_digest(filename, algorithm, hexdigest)
+        return hexdigest
+
+    def queue_checksum(self, filename):
+        """Hashes filename on the background hash thread so it overlaps the next encode/stitch."""
+        if filename not in self.checksums:
+            self.checksums[filename] = self.hash_pool.submit(self.checksum_with_sidecar, filename)
+
+    def update_catalog(self, dest_base):
+        """Re-indexes the new mp4 tape folder so the session dialog sees it without a rescan."""
+        if not self.archive_root:
+            return
+        try:
+            ArchiveCatalog(self.archive_root).record_path(dest_base)
+        except (OSError, sqlite3.Error) as e:
+            self.log(f"Catalog update skipped: {e}")
+
+    def extract_file_info(self, filename):
+        # Extract customer info and date-group from filename
+        pattern = r"(.+)-(\d{4}\.\d{2}\.\d{2}_\d{2}-\d{2}-\d{2})\.dv"
+        match = re.search(pattern, filename)
+        if match:
+            group_base = match.group(1) # e.g., quivey_lara_mdv_t01
+            raw_ts = match.group(2)
+            dt_object = datetime.datetime.strptime(raw_ts, "%Y.%m.%d_%H-%M-%S")
+            iso_ts = raw_ts.replace(".", "-").replace("_", "T").replace("-", ":", 2)
+            return group_base, dt_object, iso_ts
+        return os.path.splitext(filename)[0], None, None
+
+    # --- PROGRESS TRACKING ---
+    def begin_phase(self, lo, hi, total_bytes, done_bytes=0):
+        """Maps byte progress inside a phase onto the lo..hi span of the progress bar."""
+        with self.progress_lock:
+            self.phase = {'lo': lo, 'hi': hi, 'total': max(total_bytes, 1), 'done': done_bytes,
+                          'start_done': done_bytes, 'started': time.time()}
+            self.active_jobs = {}
+        self.emit_overall()
+
+    def run_ffmpeg(self, cmd, label, weight_bytes=0, duration=0):
+        """
+        Runs ffmpeg with its machine-readable progress stream on stdout and feeds the tracker.
+        weight_bytes is the DV input this job accounts for, duration its length in seconds.
+        """
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + cmd[1:]
+        with self.progress_lock:
+            self.active_jobs[label] = {'bytes': weight_bytes, 'duration': duration, 'fraction': 0.0, 'fps': 0.0}
+
+        # Waits here while a recording has the job limit lowered
+        if not self.governor.acquire(lambda: self.is_running):
+            with self.progress_lock:
+                self.active_jobs.pop(label, None)
+            raise subprocess.CalledProcessError(-1, cmd) # stopped before it could start
+        proc = None
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+            self.governor.register(proc.pid)
+            block = {}
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                block[key] = value
+                # Each report is a run of key=value lines closed by progress=continue|end
+                if key == "progress":
+                    self.on_ffmpeg_progress(label, block)
+                    block = {}
+            returncode = proc.wait()
+        finally:
+            if proc:
+                self.governor.unregister(proc.pid)
+            self.governor.release()
+
+        with self.progress_lock:
+            job = self.active_jobs.pop(label, None)
+            if job and returncode == 0:
+                self.phase['done'] += job['bytes']
+        self.emit_overall()
+
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+    def on_ffmpeg_progress(self, label, block):
+        try:
+            seconds = int(block.get("out_time_us") or block.get("out_time_ms") or 0) / 1_000_000
+        except ValueError:
+            seconds = 0.0 # "N/A" before the first packet is muxed
+        try:
+            fps = float(block.get("fps") or 0)
+        except ValueError:
+            fps = 0.0
+
+        with self.progress_lock:
+            job = self.active_jobs.get(label)
+            if job is None:
+                return
+            if block.get("progress") == "end":
+                job['fraction'] = 1.0
+            elif job['duration']:
+                job['fraction'] = max(0.0, min(1.0, seconds / job['duration']))
+            job['fps'] = fps
+            percent = int(job['fraction'] * 100)
+
+        self.job_progress(label, percent)
+        self.emit_overall()
+
+    def emit_overall(self):
+        with self.progress_lock:
+            phase = self.phase
+            done = phase['done'] + sum(j['bytes'] * j['fraction'] for j in self.active_jobs.values())
+            fps = sum(j['fps'] for j in self.active_jobs.values())
+            elapsed = time.time() - phase['started']
+            rate = (done - phase['start_done']) / elapsed if elapsed > 0 else 0
+            eta = int((phase['total'] - done) / rate) if rate > 0 else -1
+            percent = phase['lo'] + (phase['hi'] - phase['lo']) * min(1.0, done / phase['total'])
+
+        self.progress(int(percent))
+        self.throughput(fps, eta)
+
+    def recorded_datetime(self, dv_path):
+        """First camera date/time in the DV frames, or None (also when NumPy is missing)."""
+        if not dv_index.available():
+            return None
+        try:
+            return dv_index.read_recording_datetime(dv_path)
+        except (OSError, ValueError):
+            return None
+
+    def keep_byte_ranges(self, dv_path, standard):
+        """
+        Frame-aligned (start, end) byte ranges of dv_path worth encoding, with blank/silent
+        runs cut out, plus the seconds dropped. [] means the whole clip is blank.
+        Without trimming (or NumPy) that is simply the whole file.
+        """
+        size = os.path.getsize(dv_path)
+        if not self.trim_blank or not dv_index.available():
+            return [(0, size)], 0.0
+        try:
+            index = dv_index.load_index(dv_path)
+        except (OSError, ValueError):
+            return [(0, size)], 0.0
+        if index.size == 0:
+            return [(0, size)], 0.0
+
+        frame_size = dv_format.FRAME_SIZE[standard]
+        min_frames = max(1, int(self.blank_min_seconds * dv_format.FRAME_RATE[standard]))
+        frames = dv_index.keep_ranges(index, min_frames)
+        ranges = [(first * frame_size, end * frame_size) for first, end in frames]
+        if ranges and frames[-1][1] == index.size:
+            ranges[-1] = (ranges[-1][0], size) # keep any trailing partial frame, as before
+        kept = sum(end - start for start, end in ranges)
+        return ranges, dv_format.bytes_to_seconds(size - kept, standard)
+
+    def input_spec(self, ranges):
+        """
+        ffmpeg input (spec, format) for a list of (path, start, end) byte ranges.
+        Whole files go in as-is; trimmed pieces are read in place with the subfile protocol.
+        Raw DV frames are self-contained, so any run of them concatenates into a valid stream.
+        """
+        whole = all(start == 0 and end == os.path.getsize(path) for path, start, end in ranges)
+        if whole:
+            paths = [path for path, _, _ in ranges]
+            if len(paths) == 1:
+                return paths[0], None
+            return "concat:" + "|".join(paths), "dv"
+        parts = [f"subfile,,start,{start},end,{end},,:{path}" for path, start, end in ranges]
+        if len(parts) == 1:
+            return parts[0], "dv"
+        return "concat:" + "|".join(parts), "dv"
+
+    @staticmethod
+    def format_seconds(seconds):
+        return str(datetime.timedelta(seconds=int(round(seconds)))) # H:M:S like the report duration
+
+    @staticmethod
+    def trim_extra(entries):
+        """Manifest 'extra' for an output built from trimmed clips (None when nothing was cut)."""
+        if not any(e['trimmed'] for e in entries):
+            return None
+        return {'keep': [[os.path.basename(e['input']), start, end] for e in entries for start, end in e['ranges']]}
+
+    @staticmethod
+    def split_audio_args(args):
+        """A profile's flag/value args as (video and container args, audio encoder args)."""
+        pairs = list(zip(args[::2], args[1::2]))
+        return ([x for flag, value in pairs if flag not in AUDIO_ARGS for x in (flag, value)],
+                [x for flag, value in pairs if flag in AUDIO_ARGS for x in (flag, value)])
+
+    def thumbnail_period(self, standard):
+        """Frames between thumbnails: thumbnail_interval seconds, in whole frames."""
+        return max(1, int(round(self.thumbnail_interval * dv_format.FRAME_RATE[standard])))
+
+    def has_thumbnail(self, first_frame, frame_count, standard):
+        """True if frames [first_frame, first_frame + frame_count) of a clip include a thumbnail frame."""
+        period = self.thumbnail_period(standard)
+        return -(-first_frame // period) * period < first_frame + frame_count
+
+    def build_encode_command(self, input_spec, outputs, meta, standard, input_format=None, first_frame=0, frames=None,
+                             audio=True):
+        """
+        One decode + yadif pass feeding every requested output profile.
+        outputs maps profile name -> output path; first_frame is where this input starts in the clip.
+        frames=(first, end) keeps only those frames after yadif (end None = to the end); audio=False
+        leaves the sound out. Segments use both, see plan_segments.
+        """
+        # After trim the encoder no longer learns the frame rate and would guess 25 fps
+        rate = ["-r", dv_format.FRAME_RATE_ARG[standard]] if frames else []
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+        if input_format: cmd += ["-f", input_format]
+        cmd += ["-i", input_spec]
+
+        deinterlace = "yadif"
+        if frames:
+            first, end = frames
+            bounds = f"start_frame={first}" + (f":end_frame={end}" if end is not None else "")
+            deinterlace += f",trim={bounds},setpts=PTS-STARTPTS"
+
+        if list(outputs) == ['master']:
+            # Plain archival encode, same command as always
+            cmd += ["-c:v", "libx264", "-crf", "20", "-preset", "medium", "-vf", f"{deinterlace},format=yuv420p"] + rate
+            cmd += ["-c:a", "aac", "-b:a", "192k"] if audio else ["-an"]
+            cmd += ["-movflags", "+faststart"]
+            if meta: cmd += ["-metadata", f"creation_time={meta}"]
+            cmd.append(outputs['master'])
+            return cmd
+
+        # Deinterlace once, then split the frames out to each encoder
+        names = list(outputs)
+        graph = [f"[0:v]{deinterlace},format=yuv420p,split={len(names)}" + "".join(f"[s{i}]" for i in range(len(names)))]
+        for i, name in enumerate(names):
+            flt = self.OUTPUT_PROFILES[name]['filter'] or "null"
+            period = self.thumbnail_period(standard)
+            graph.append(f"[s{i}]{flt.format(first=first_frame, period=period, index=-(-first_frame // period))}[o{i}]")
+        cmd += ["-filter_complex", ";".join(graph)]
+
+        for i, name in enumerate(names):
+            profile = self.OUTPUT_PROFILES[name]
+            cmd += ["-map", f"[o{i}]"]
+            if profile['audio'] and audio:
+                cmd += ["-map", "0:a?"] + profile['args']
+            else:
+                cmd += self.split_audio_args(profile['args'])[0]
+            if profile['joinable']: cmd += rate
+            if meta and profile['audio']: cmd += ["-metadata", f"creation_time={meta}"]
+            cmd.append(outputs[name])
+        return cmd
+
+    def plan_outputs(self, master_path):
+        """Output path for every enabled profile of one clip. Extras go in sub-folders next to the master."""
+        group_dir, clip_file = os.path.split(master_path)
+        clip_base = os.path.splitext(clip_file)[0]
+        outputs = {}
+        for name in self.output_profiles:
+            profile = self.OUTPUT_PROFILES[name]
+            if profile['folder'] is None:
+                outputs[name] = master_path
+                continue
+            folder = os.path.join(group_dir, profile['folder'])
+            os.makedirs(folder, exist_ok=True)
+            outputs[name] = os.path.join(folder, clip_base + profile['suffix'])
+        return outputs
+
+    def write_concat_list(self, list_path, paths):
+        # ffmpeg concat demuxer syntax; single quotes inside paths must be escaped
+        with open(list_path, "w") as f:
+            for p in paths:
+                escaped = p.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+    # --- RESUME / MANIFEST ---
+    def outputs_complete(self, outputs, inputs, extra=None):
+        """True if every video output is recorded as finished in the manifest for these exact inputs."""
+        return all(self.manifest.is_complete(path, inputs, extra) for name, path in outputs.items()
+                   if self.OUTPUT_PROFILES[name]['joinable'])
+
+    def stage_outputs(self, outputs, inputs, extra=None):
+        """
+        Points the video outputs at .part files and marks them as running in the manifest.
+        Stills keep their final names; they come from the same ffmpeg run as the video.
+        """
+        staged = {}
+        for name, path in outputs.items():
+            if self.OUTPUT_PROFILES[name]['joinable']:
+                staged[name] = partial_path(path)
+                self.manifest.mark_started(path, inputs, extra)
+            else:
+                staged[name] = path
+        return staged
+
+    def commit_outputs(self, outputs, inputs, extra=None):
+        """Renames the finished .part files into place and records them as done."""
+        for name, path in outputs.items():
+            if self.OUTPUT_PROFILES[name]['joinable']:
+                self.manifest.commit(partial_path(path), path, inputs, extra)
+
+    def plan_segments(self, job):
+        """
+        Cuts a long job into frame-aligned byte ranges when segment encoding is on.
+        A direct group job spans several .dv files; each file is chunked on its own.
+        Returns [] for jobs that should go to a single ffmpeg process.
+
+        Segments are video only, and each one also decodes SEGMENT_OVERLAP frames on either side
+        so yadif sees the real neighbouring fields at the cuts; the trim after yadif drops them
+        again. The audio is encoded once over the whole clip at the join, so the joins stay seamless.
+        """
+        if not self.segment_seconds:
+            return []
+        ranges = [(path, start, end) for path, span_start, span_end in job['ranges']
+                  for start, end in dv_format.chunk_byte_ranges(path, self.segment_seconds, job['standard'],
+                                                                span_start, span_end)]
+        if len(ranges) < 2:
+            return []
+
+        seg_dir = os.path.join(os.path.dirname(job['path']), f".segments_{os.path.splitext(job['orig'])[0]}")
+        os.makedirs(seg_dir, exist_ok=True)
+
+        frame_size = dv_format.FRAME_SIZE[job['standard']]
+        overlap = self.SEGMENT_OVERLAP * frame_size
+        segments = []
+        first_frame = 0
+        for n, (path, start, end) in enumerate(ranges):
+            pieces = [(path, start, end)]
+            lead = 0
+            if n > 0:
+                prev_path, prev_start, prev_end = ranges[n - 1]
+                lead_start = max(prev_start, prev_end - overlap)
+                pieces.insert(0, (prev_path, lead_start, prev_end))
+                lead = (prev_end - lead_start) // frame_size
+            frames = (lead, None)
+            if n + 1 < len(ranges):
+                next_path, next_start, next_end = ranges[n + 1]
+                pieces.append((next_path, next_start, min(next_end, next_start + overlap)))
+                frames = (lead, lead + (end - start) // frame_size)
+            # Video profiles get a part file to join later; stills go straight to their final names.
+            # A segment too short to hold a thumbnail frame leaves that output out: an image output
+            # that gets no frames fails the whole ffmpeg run.
+            frame_count = (end - start) // frame_size
+            outputs = {}
+            for name, final_path in job['outputs'].items():
+                if self.OUTPUT_PROFILES[name]['joinable']:
+                    outputs[name] = os.path.join(seg_dir, f"part{n:03d}_{name}.mp4")
+                elif self.has_thumbnail(first_frame, frame_count, job['standard']):
+                    outputs[name] = final_path
+            segments.append({'input': path, 'start': start, 'end': end, 'outputs': outputs, 'seg_dir': seg_dir,
+                             'pieces': pieces, 'frames': frames,
+                             'inputs': sorted({piece[0] for piece in pieces}),
+                             'extra': {'range': [start, end], 'overlap': self.SEGMENT_OVERLAP, 'audio': False},
+                             'first_frame': first_frame, 'standard': job['standard'],
+                             'label': f"{job['orig']} [{n + 1}/{len(ranges)}]"})
+            first_frame += frame_count
+        return segments
+
+    def clip_command(self, job):
+        """Stages the clip's outputs and returns (ffmpeg command, staged outputs)."""
+        staged = self.stage_outputs(job['outputs'], job['inputs'], job['extra'])
+        # A direct group (or a trimmed clip) is several DV pieces fed in as one stream
+        spec, input_format = self.input_spec(job['ranges'])
+        return self.build_encode_command(spec, staged, job['meta'], job['standard'], input_format=input_format), staged
+
+    def segment_command(self, segment):
+        staged = self.stage_outputs(segment['outputs'], segment['inputs'], segment['extra'])
+        input_spec, input_format = self.input_spec(segment['pieces'])
+        return self.build_encode_command(input_spec, staged, None, segment['standard'], input_format=input_format,
+                                         first_frame=segment['first_frame'], frames=segment['frames'],
+                                         audio=False), staged
+
+    def encode_clip(self, job):
+        """Runs a single ffmpeg encode. Called from the pool threads."""
+        if not self.is_running:
+            return job
+        self.log(f"Converting ({job['index']}/{job['total']}): {job['orig']}")
+        cmd, staged = job.get('command') or self.clip_command(job)
+        self.encode(job, cmd, staged,
+                    job['orig'], job['bytes'], dv_format.bytes_to_seconds(job['bytes'], job['standard']))
+        self.commit_outputs(job['outputs'], job['inputs'], job['extra'])
+        return job
+
+    def encode_segment(self, job, segment):
+        """Encodes one frame-aligned byte range of a .dv file (read in place via ffmpeg's subfile protocol)."""
+        if not self.is_running:
+            return job
+        seg_bytes = segment['end'] - segment['start']
+        inputs = segment['inputs']
+        if self.outputs_complete(segment['outputs'], inputs, segment['extra']):
+            # Finished by an earlier, interrupted run
+            self.log(f"Reusing segment: {segment['label']}")
+            with self.progress_lock:
+                self.phase['done'] += seg_bytes
+            self.emit_overall()
+            return job
+
+        cmd, staged = segment.get('command') or self.segment_command(segment)
+        self.encode(segment, cmd, staged,
+                    segment['label'], seg_bytes, dv_format.bytes_to_seconds(seg_bytes, job['standard']))
+        self.commit_outputs(segment['outputs'], inputs, segment['extra'])
+        return job
+
+    # --- SHARED SPOOL ---
+    def encode(self, unit, cmd, staged, label, weight_bytes, duration):
+        """Runs one clip / segment encode: here, or on whichever station claimed it from the spool."""
+        if unit.get('spool_id') is None:
+            self.run_ffmpeg(cmd, label, weight_bytes, duration)
+        else:
+            self.run_shared(unit['spool_id'], cmd, staged, label, weight_bytes, duration)
+
+    def publish_jobs(self, pending):
+        """
+        Puts every encode of this run in the spool up front, so idle stations can start on it
+        right away. Each unit keeps its command; encode() then either claims it here or waits
+        for the other station's result. Returns the number of jobs published.
+        """
+        units = []
+        for job in pending:
+            if not job['segments']:
+                units.append((job, self.clip_command(job), job['orig'], job['bytes'], job['standard']))
+                continue
+            for seg in job['segments']:
+                if self.outputs_complete(seg['outputs'], seg['inputs'], seg['extra']):
+                    continue # encode_segment reuses it
+                units.append((seg, self.segment_command(seg), seg['label'], seg['end'] - seg['start'], job['standard']))
+
+        for unit, (cmd, staged), label, weight_bytes, standard in units:
+            parts = [path for name, path in staged.items() if self.OUTPUT_PROFILES[name]['joinable']]
+            unit['command'] = (cmd, staged)
+            unit['spool_id'] = self.spool.publish(cmd, parts, label, self.archive_root, weight_bytes,
+                                                  dv_format.bytes_to_seconds(weight_bytes, standard))
+        self.local_slots = threading.Semaphore(self.max_jobs)
+        return len(units)
+
+    def run_shared(self, job_id, cmd, staged, label, weight_bytes, duration):
+        """
+        Encodes a published job here if nobody has claimed it; otherwise waits for the station
+        that did. Its .part files are then in place for commit_outputs like a local encode's.
+        A job that failed elsewhere is retried here.
+        """
+        parts = [path for name, path in staged.items() if self.OUTPUT_PROFILES[name]['joinable']]
+        waiting = False
+        while self.is_running:
+            result = self.spool.result(job_id)
+            if result is not None:
+                if result.get('ok') and all(os.path.exists(p) for p in parts):
+                    self.log(f"Encoded on {result.get('owner')}: {label}")
+                    with self.progress_lock:
+                        self.phase['done'] += weight_bytes
+                    self.emit_overall()
+                    self.gather(job_id, parts)
+                    return
+                self.log(f"{label} failed on {result.get('owner')} ({result.get('error')}), retrying here")
+                self.spool.retry(job_id)
+
+            # Only claim with a local encode slot free, or we would sit on jobs others could run
+            lease = None
+            if self.local_slots.acquire(timeout=self.spool.POLL_INTERVAL):
+                try:
+                    lease = self.spool.claim(job_id)
+                    if lease is not None:
+                        try:
+                            self.run_ffmpeg(cmd, label, weight_bytes, duration)
+                        finally:
+                            lease.release()
+                finally:
+                    self.local_slots.release()
+            if lease is not None:
+                if not lease.lost:
+                    self.gather(job_id, parts)
+                    return
+                continue # Stalled past our lease: the station that took over delivers the result
+
+            if not waiting and os.path.exists(self.spool.claim_path(job_id)):
+                self.log(f"Running on another station: {label}")
+                waiting = True
+            time.sleep(self.spool.POLL_INTERVAL)
+        raise subprocess.CalledProcessError(-1, cmd) # stopped while waiting
+
+    def gather(self, job_id, parts):
+        """Job delivered: clear it out of the spool, with anything a crashed worker left behind."""
+        self.spool.remove(job_id)
+        for part in parts:
+            clear_attempts(part)
+
+    def join_segments(self, job):
+        """
+        Stream-copies the encoded segments of a clip into its final .mp4 (and proxy, if enabled)
+        and encodes the clip's audio in one piece alongside, so there is no gap at the joins.
+        """
+        if not self.is_running:
+            return job
+        seg_dir = job['segments'][0]['seg_dir']
+        staged = self.stage_outputs(job['outputs'], job['inputs'], job['extra'])
+        audio_spec, audio_format = self.input_spec(job['ranges'])
+        for name, final_path in job['outputs'].items():
+            profile = self.OUTPUT_PROFILES[name]
+            if not profile['joinable']:
+                continue
+            list_txt = os.path.join(seg_dir, f"list_{name}.txt")
+            self.write_concat_list(list_txt, [seg['outputs'][name] for seg in job['segments']])
+
+            cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_txt]
+            if profile['audio']:
+                if audio_format: cmd += ["-f", audio_format]
+                cmd += ["-i", audio_spec, "-map", "0:v", "-map", "1:a?", "-c:v", "copy"]
+                cmd += self.split_audio_args(profile['args'])[1]
+            else:
+                cmd += ["-c", "copy"]
+            cmd += ["-movflags", "+faststart"]
+            if job['meta']: cmd += ["-metadata", f"creation_time={job['meta']}"]
+            cmd.append(staged[name])
+            # The encode phase already counted these bytes; the join only shows up as a job
+            self.run_ffmpeg(cmd, f"{job['orig']} [join {name}]", 0, dv_format.bytes_to_seconds(job['bytes'], job['standard']))
+        self.commit_outputs(job['outputs'], job['inputs'], job['extra'])
+        self.manifest.forget([path for seg in job['segments'] for name, path in seg['outputs'].items()
+                              if self.OUTPUT_PROFILES[name]['joinable']])
+        shutil.rmtree(seg_dir, ignore_errors=True)
+        return job
+
+    def stitch_group(self, dest_base, group_name, entries, count_bytes=True):
+        """
+        Builds <group>.mp4 from the group's clip MP4s (classic layout) unless the manifest already
+        has it, then queues its checksum. count_bytes=False while the encode phase owns the progress bar.
+        """
+        merged_path = os.path.join(dest_base, f"{group_name}.mp4")
+        inputs = [e['path'] for e in entries]
+        if not self.manifest.is_complete(merged_path, inputs):
+            partial = partial_path(merged_path)
+            self.manifest.mark_started(merged_path, inputs)
+            if len(entries) > 1:
+                # One list per group: groups can be stitching side by side in the encode pool
+                list_txt = os.path.join(dest_base, f"list_{group_name}.txt")
+                self.write_concat_list(list_txt, inputs)
+                group_bytes = sum(e['bytes'] for e in entries) if count_bytes else 0
+                group_seconds = sum(dv_format.bytes_to_seconds(e['bytes'], e['standard']) for e in entries)
+                self.run_ffmpeg(["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_txt, "-c", "copy", "-y", partial],
+                                group_name, group_bytes, group_seconds)
+                os.remove(list_txt)
+            else:
+                # Same bytes as the clip MP4: share them instead of writing a second copy
+                if os.path.exists(partial): os.remove(partial)
+                try:
+                    file_ops.clone_file(inputs[0], partial)
+                except OSError as e:
+                    # e.g. copy2 can't carry the timestamps over on some shares; the bytes are what count
+                    self.log(f"Clone failed ({e}), copying {group_name}.mp4")
+                    shutil.copyfile(inputs[0], partial)
+            self.manifest.commit(partial, merged_path, inputs)
+        self.queue_checksum(merged_path)
+        return merged_path
+
+    def run(self):
+        self.start_time = time.time()
+        
+        # --- PATH MAPPING ---
+        tape_dv_folder = os.path.basename(self.root_dir)
+        client_dir = os.path.dirname(os.path.dirname(self.root_dir))
+        
+        # Customer Name and Format for Report
+        customer_name = os.path.basename(client_dir)
+        media_format = os.path.basename(os.path.dirname(os.path.dirname(client_dir)))
+
+        # Pivot to mp4_format
+        dest_base, _ = self.output_paths(self.root_dir)
+
+        dv_files = sorted([os.path.join(self.root_dir, f) for f in os.listdir(self.root_dir) if f.lower().endswith(".dv")])
+        if not dv_files:
+            self.log("ERROR: No .dv files found.")
+            return False
+
+        files_by_group = {}
+        stats = {"converted": 0, "skipped": 0, "blank_clips": []}
+        # Where the results went, for callers that report on them (CLI / daemon)
+        self.dest_base = dest_base
+        self.stats = stats
+
+        # One hashing thread is plenty: it is disk bound and only needs to keep up with the encoders
+        self.hash_pool = ThreadPoolExecutor(max_workers=1)
+        self.checksums = {}
+        # What finished last time (and from which inputs); never trust a file just because it exists
+        self.manifest = ConversionManifest(dest_base)
+        self.governor = ResourceGovernor(self.config, self.max_jobs, self.log).start()
+        self.spool = self.open_spool()
+        try:
+            self.convert_and_report(dv_files, files_by_group, stats, dest_base, tape_dv_folder, customer_name, media_format)
+        finally:
+            if self.spool:
+                self.spool.withdraw()
+                self.spool.stop()
+            self.governor.stop()
+            self.hash_pool.shutdown(wait=True, cancel_futures=not self.is_running)
+
+        self.update_catalog(dest_base)
+        self.progress(100)
+        return True
+
+    def open_spool(self):
+        if not self.spool_dir:
+            return None
+        try:
+            return EncodeSpool(self.spool_dir, self.config.get("spool_lease_seconds"), self.log).start()
+        except OSError as e:
+            self.log(f"Spool unavailable, encoding locally: {e}")
+            return None
+
+    def convert_and_report(self, dv_files, files_by_group, stats, dest_base, tape_dv_folder, customer_name, media_format):
+        """Plan, encode, stitch and write the report. Runs while the hash thread is alive."""
+        MAX_GAP = datetime.timedelta(hours=2)
+        current_group_name = None
+        last_dt = None
+
+        # 1. PLANNING
+        self.stage("plan")
+        # Grouping has to walk the clips in order (the gap logic depends on the
+        # previous clip), so the plan is built up front and only the encodes run in parallel.
+        for input_path in dv_files:
+            filename_raw = os.path.basename(input_path)
+            tape_prefix, dt_object, iso_metadata = self.extract_file_info(filename_raw)
+            if dt_object is None:
+                # Name has no date (e.g. a numbered scene); the frames themselves may still carry one
+                dt_object = self.recorded_datetime(input_path)
+                if dt_object: iso_metadata = dt_object.strftime("%Y-%m-%dT%H:%M:%S")
+
+            if dt_object:
+                if last_dt is None or (dt_object - last_dt) > MAX_GAP:
+                    date_str = dt_object.strftime("%Y-%m-%d")
+                    current_group_name = f"{tape_prefix}-{date_str}"
+
+                last_dt = dt_object
+            else:
+                current_group_name = tape_prefix
+            
+            output_dir = os.path.join(dest_base, current_group_name)
+            output_path = os.path.join(output_dir, os.path.splitext(filename_raw)[0] + ".mp4")
+
+            # Blank / silent stretches (unrecorded gaps, lens cap) are left out of the encode
+            standard = dv_format.detect_standard(input_path)
+            ranges, trimmed = self.keep_byte_ranges(input_path, standard)
+            if not ranges:
+                self.log(f"Blank clip left out: {filename_raw}")
+                stats["blank_clips"].append((filename_raw, trimmed))
+                continue
+            if trimmed:
+                self.log(f"Trimming {self.format_seconds(trimmed)} of blank tape from {filename_raw}")
+
+            if current_group_name not in files_by_group: files_by_group[current_group_name] = []
+            files_by_group[current_group_name].append({'input': input_path, 'path': output_path, 'meta': iso_metadata,
+                                                       'orig': filename_raw, 'standard': standard,
+                                                       'bytes': sum(end - start for start, end in ranges),
+                                                       'ranges': ranges, 'trimmed': trimmed})
+
+        pending = []
+        skipped_bytes = 0
+        if self.keep_clip_files:
+            # Classic layout: every clip gets its own MP4, groups are stitched afterwards
+            for i, (group_name, entry) in enumerate((g, e) for g, entries in files_by_group.items() for e in entries):
+                os.makedirs(os.path.dirname(entry['path']), exist_ok=True)
+                outputs = self.plan_outputs(entry['path'])
+                extra = self.trim_extra([entry])
+                if self.outputs_complete(outputs, [entry['input']], extra):
+                    self.log(f"Skipping: {entry['orig']}")
+                    stats["skipped"] += 1
+                    skipped_bytes += entry['bytes']
+                    continue
+                pending.append({'inputs': [entry['input']], 'path': entry['path'], 'meta': entry['meta'],
+                                'orig': entry['orig'], 'index': i + 1, 'total': len(dv_files), 'group': group_name,
+                                'bytes': entry['bytes'], 'standard': entry['standard'], 'clips': 1,
+                                'outputs': outputs, 'extra': extra,
+                                'ranges': [(entry['input'], start, end) for start, end in entry['ranges']]})
+        else:
+            # Direct mode: each date group is encoded straight into its merged MP4
+            os.makedirs(dest_base, exist_ok=True)
+            for i, (group_name, entries) in enumerate(files_by_group.items()):
+                merged_path = os.path.join(dest_base, f"{group_name}.mp4")
+                group_bytes = sum(e['bytes'] for e in entries)
+                inputs = [e['input'] for e in entries]
+                outputs = self.plan_outputs(merged_path)
+                extra = self.trim_extra(entries)
+                if self.outputs_complete(outputs, inputs, extra):
+                    self.log(f"Skipping: {group_name}.mp4")
+                    stats["skipped"] += len(entries)
+                    skipped_bytes += group_bytes
+                    continue
+                pending.append({'inputs': inputs, 'path': merged_path, 'meta': entries[0]['meta'],
+                                'orig': f"{group_name}.mp4", 'index': i + 1, 'total': len(files_by_group),
+                                'bytes': group_bytes, 'standard': entries[0]['standard'], 'clips': len(entries),
+                                'outputs': outputs, 'extra': extra,
+                                'ranges': [(e['input'], start, end) for e in entries for start, end in e['ranges']]})
+
+        # 2. CONVERSION (bounded pool)
+        self.stage("encode")
+        total_bytes = skipped_bytes + sum(job['bytes'] for job in pending)
+        self.begin_phase(0, 80, total_bytes, skipped_bytes)
+
+        # Classic layout: a group is stitched (and hashed) as soon as its last clip is encoded
+        stitched = set()
+        clips_left = {}
+        for job in pending:
+            if self.keep_clip_files:
+                clips_left[job['group']] = clips_left.get(job['group'], 0) + 1
+
+        if pending and self.is_running:
+            unit = "clip(s)" if self.keep_clip_files else "group(s)"
+            self.log(f"Encoding {len(pending)} {unit}, {min(self.max_jobs, len(pending))} at a time...")
+            for job in pending:
+                job['segments'] = self.plan_segments(job)
+            workers = self.max_jobs
+            if self.spool:
+                # Jobs waiting on another station hold a pool thread but no encode slot
+                workers += min(self.publish_jobs(pending), self.SPOOL_WAITERS)
+            pool = ThreadPoolExecutor(max_workers=workers)
+            # Stitches get their own thread so they don't queue behind the encodes still waiting in the pool
+            stitch_pool = ThreadPoolExecutor(max_workers=1)
+            try:
+                # Futures map to (kind, job). Segmented clips queue their join once the last piece lands,
+                # finished groups their stitch.
+                futures = {}
+                for job in pending:
+                    if job['segments']:
+                        self.log(f"Converting ({job['index']}/{job['total']}): {job['orig']} "
+                                              f"in {len(job['segments'])} segments")
+                        job['remaining'] = len(job['segments'])
+                        for seg in job['segments']:
+                            futures[pool.submit(self.encode_segment, job, seg)] = ("segment", job)
+                    else:
+                        futures[pool.submit(self.encode_clip, job)] = ("clip", job)
+
+                while futures and self.is_running:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        kind, job = futures.pop(future)
+                        future.result()
+                        if not self.is_running:
+                            break
+                        if kind == "segment":
+                            job['remaining'] -= 1
+                            if job['remaining'] == 0:
+                                futures[pool.submit(self.join_segments, job)] = ("join", job)
+                            continue
+                        if kind == "stitch":
+                            stitched.add(job['group'])
+                            continue
+
+                        stats["converted"] += job['clips']
+                        self.log(f"Finished: {job['orig']}")
+                        if not self.keep_clip_files:
+                            # Direct mode writes the final group MP4 right here, so hash it now
+                            self.queue_checksum(job['path'])
+                            continue
+                        clips_left[job['group']] -= 1
+                        if clips_left[job['group']] == 0:
+                            # Stitch and hash this group while the other groups are still encoding
+                            futures[stitch_pool.submit(self.stitch_group, dest_base, job['group'],
+                                                       files_by_group[job['group']], False)] = ("stitch", job)
+            finally:
+                # Drop anything still queued if we were stopped; running encodes finish on their own
+                pool.shutdown(wait=True, cancel_futures=True)
+                stitch_pool.shutdown(wait=True, cancel_futures=True)
+
+        # 3. STITCHING & DETAILED REPORT
+        if self.is_running:
+            self.stage("concat")
+            # Report name format: quivey_lara_mdv_t01_transfer_report.txt
+            report_filename = f"{tape_dv_folder}_transfer_report.txt"
+            report_path = os.path.join(dest_base, report_filename)
+            
+            total_duration = str(datetime.timedelta(seconds=int(time.time() - self.start_time)))
+
+            group_names = sorted(files_by_group.keys())
+
+            # Groups with nothing to encode this run (every clip skipped) are stitched here
+            remaining = [g for g in group_names if self.keep_clip_files and g not in stitched]
+
+            def needs_stitch(group):
+                merged = os.path.join(dest_base, f"{group}.mp4")
+                return not self.manifest.is_complete(merged, [e['path'] for e in files_by_group[group]])
+
+            stitch_bytes = sum(e['bytes'] for g in remaining for e in files_by_group[g]
+                               if len(files_by_group[g]) > 1 and needs_stitch(g))
+            self.begin_phase(80, 95, stitch_bytes)
+
+            for current_group_name in remaining:
+                self.stitch_group(dest_base, current_group_name, files_by_group[current_group_name])
+            for current_group_name in group_names:
+                # No-op for groups already hashing (direct mode, early stitches)
+                self.queue_checksum(os.path.join(dest_base, f"{current_group_name}.mp4"))
+
+            self.stage("report")
+            with open(report_path, "w") as report:
+                report.write("==========================================\n")
+                report.write("      RETROREEL DIGITIZATION REPORT       \n")
+                report.write("==========================================\n\n")
+                report.write(f"CUSTOMER: {customer_name.replace('_', ' ').title()}\n")
+                report.write(f"FORMAT:   {media_format.upper()}\n")
+                report.write(f"TAPE ID:  {tape_dv_folder}\n")
+                report.write(f"DATE:     {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+                report.write(f"DURATION: {total_duration} (H:M:S)\n\n")
+                report.write(f"STATS: {stats['converted']} Converted, {stats['skipped']} Skipped\n")
+                trimmed_total = sum(e['trimmed'] for g in group_names for e in files_by_group[g])
+                trimmed_total += sum(seconds for _, seconds in stats['blank_clips'])
+                if trimmed_total:
+                    report.write(f"TRIMMED:  {self.format_seconds(trimmed_total)} of blank/silent tape left out\n")
+                report.write("-" * 42 + "\n\n")
+
+                hash_label = self.checksum_algorithm.upper() if self.checksum_algorithm != "blake2b" else "BLAKE2b"
+                for n, current_group_name in enumerate(group_names):
+                    merged_path = os.path.join(dest_base, f"{current_group_name}.mp4")
+                    report.write(f"OUTPUT FILE: {current_group_name}.mp4\n")
+                    report.write(f"  - {hash_label} Hash: {self.checksums[merged_path].result()}\n")
+                    report.write(f"  - Clips Combined: {len(files_by_group[current_group_name])}\n")
+                    group_trimmed = sum(e['trimmed'] for e in files_by_group[current_group_name])
+                    if group_trimmed:
+                        report.write(f"  - Blank/Silent Trimmed: {self.format_seconds(group_trimmed)}\n")
+                    report.write("-" * 20 + "\n")
+                    self.progress(95 + int(((n + 1) / len(group_names)) * 5))
+
+                if stats['blank_clips']:
+                    report.write("\nBLANK CLIPS (not converted):\n")
+                    for name, seconds in stats['blank_clips']:
+                        report.write(f"  - {name} ({self.format_seconds(seconds)})\n")
+
+            self.log(f"SUCCESS: Report saved as {report_filename}")
+        self.stage(None)
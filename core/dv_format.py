@@ -0,0 +1,124 @@
+# core/dv_format.py
+import os
+import datetime
+
+# DV is a fixed-size, intra-frame format: every frame is a run of 80-byte DIF
+# blocks grouped into 12000-byte sequences (10 per NTSC frame, 12 per PAL frame).
+DIF_BLOCK_SIZE = 80
+DIF_SEQUENCE_SIZE = 150 * DIF_BLOCK_SIZE
+
+FRAME_SIZE = {"NTSC": 120000, "PAL": 144000}
+FRAME_RATE = {"NTSC": 30000 / 1001, "PAL": 25.0}
+FRAME_RATE_ARG = {"NTSC": "30000/1001", "PAL": "25"} # the same, exact, for ffmpeg's -r
+
+
+def detect_standard(path):
+    """
+    Reads the first DIF header block and returns "NTSC" or "PAL".
+    Falls back to NTSC if the file is too short or doesn't start on a header block.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(DIF_BLOCK_SIZE)
+    except OSError:
+        return "NTSC"
+
+    # Section type lives in the top 3 bits of byte 0 (0 = header block).
+    # The DSF flag (bit 7 of byte 3) is set for 625/50 (PAL) streams.
+    if len(header) < 4 or (header[0] >> 5) != 0:
+        return "NTSC"
+    return "PAL" if header[3] & 0x80 else "NTSC"
+
+
+def frame_count(path, standard=None):
+    """Number of complete frames in a raw .dv file."""
+    standard = standard or detect_standard(path)
+    return os.path.getsize(path) // FRAME_SIZE[standard]
+
+
+def chunk_byte_ranges(path, chunk_seconds, standard=None, start=0, end=None):
+    """
+    Splits a .dv file (or its frame-aligned [start, end) byte span) into (start, end) byte
+    ranges of roughly chunk_seconds each. Every cut lands exactly on a frame boundary, so
+    each range is a valid DV stream. The last range runs to the end of the span.
+    """
+    standard = standard or detect_standard(path)
+    frame_size = FRAME_SIZE[standard]
+    size = os.path.getsize(path) if end is None else end
+
+    frames_per_chunk = max(1, int(round(chunk_seconds * FRAME_RATE[standard])))
+    chunk_bytes = frames_per_chunk * frame_size
+
+    ranges = []
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        # Don't leave a runt chunk of less than a second at the end
+        if size - end < frame_size * FRAME_RATE[standard]:
+            end = size
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def bytes_to_seconds(nbytes, standard):
+    """Duration of nbytes of DV. Exact, since DV is constant bitrate."""
+    return (nbytes / FRAME_SIZE[standard]) / FRAME_RATE[standard]
+
+
+# --- PER-FRAME METADATA ---
+# VAUX packs are 5 bytes (1 id + 4 data). Blocks 3-5 of each DIF sequence carry 15 packs each.
+PACK_REC_DATE = 0x62
+PACK_REC_TIME = 0x63
+VAUX_PACK_OFFSETS = [seq * DIF_SEQUENCE_SIZE + block * DIF_BLOCK_SIZE + 3 + n * 5
+                     for seq in (0, 1) for block in (3, 4, 5) for n in range(15)]
+
+
+def _bcd(value):
+    return (value >> 4) * 10 + (value & 0x0F)
+
+
+def frame_standard(frame):
+    """"PAL" or "NTSC" from a frame's own header block."""
+    return "PAL" if frame[3] & 0x80 else "NTSC"
+
+
+def find_pack(frame, pack_id):
+    """Returns the 5-byte VAUX pack with the given id, or None if the frame doesn't carry it."""
+    for offset in VAUX_PACK_OFFSETS:
+        if frame[offset] == pack_id:
+            return frame[offset:offset + 5]
+    return None
+
+
+def decode_recording_datetime(date_pack, time_pack):
+    """Turns a rec date (0x62) + rec time (0x63) pack pair into a datetime, or None if blank."""
+    if date_pack is None or time_pack is None:
+        return None
+    if 0xFF in date_pack[2:] or 0xFF in time_pack[2:]:
+        return None # Camera clock was never set / unrecorded area
+
+    year = _bcd(date_pack[4])
+    year += 2000 if year < 25 else 1900
+    try:
+        return datetime.datetime(year, _bcd(date_pack[3] & 0x1F), _bcd(date_pack[2] & 0x3F),
+                                 _bcd(time_pack[4] & 0x3F), _bcd(time_pack[3] & 0x7F), _bcd(time_pack[2] & 0x7F))
+    except ValueError:
+        return None
+
+
+def frame_recording_datetime(frame):
+    """Recording date/time the camera stamped on this frame, or None."""
+    return decode_recording_datetime(find_pack(frame, PACK_REC_DATE), find_pack(frame, PACK_REC_TIME))
+
+
+# Subcode timecode pack (first SSYB of the first subcode block)
+PACK_TIMECODE = 0x13
+TIMECODE_OFFSET = DIF_BLOCK_SIZE + 3 + 3
+
+
+def frame_timecode(frame):
+    """(hours, minutes, seconds, frames) from the subcode, or None on unrecorded tape."""
+    pack = frame[TIMECODE_OFFSET:TIMECODE_OFFSET + 5]
+    if len(pack) < 5 or pack[0] != PACK_TIMECODE or all(b == 0xFF for b in pack[1:]):
+        return None
+    return _bcd(pack[4] & 0x3F), _bcd(pack[3] & 0x7F), _bcd(pack[2] & 0x7F), _bcd(pack[1] & 0x3F)
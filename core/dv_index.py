@@ -0,0 +1,328 @@
+# core/dv_index.py
+import os
+import mmap
+import datetime
+
+from core import dv_format
+
+# NumPy is optional: without it callers fall back to filename parsing / dvgrab
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INDEX_SUFFIX = ".dvidx"
+NO_VALUE = -1
+# Camera clocks have no timezone; rec_time is "wall clock seconds since 1970"
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# AAUX source pack (audio mode). Position alternates between even/odd DIF sequences.
+PACK_AUDIO_SOURCE = 0x50
+AUDIO_SOURCE_OFFSETS = [6 * 80 + 16 * 80 * 3 + 3, dv_format.DIF_SEQUENCE_SIZE + 6 * 80 + 3]
+PACK_TIMECODE = dv_format.PACK_TIMECODE
+TIMECODE_OFFSET = dv_format.TIMECODE_OFFSET
+
+AUDIO_RATES = {0: 48000, 1: 44100, 2: 32000}
+AUDIO_BITS = {0: 16, 1: 12}
+
+# Content analysis thresholds (see blank_mask)
+BLANK_DC_STD = 3.0     # spread of the luma DC coefficients below which a frame is one flat colour
+SILENT_PEAK = 64       # peak sample (16-bit scale, about -54 dBFS) below which audio counts as silent
+
+
+def available():
+    return np is not None
+
+
+def index_path_for(dv_path):
+    return os.path.splitext(dv_path)[0] + INDEX_SUFFIX
+
+
+def _index_dtype():
+    return np.dtype([
+        ('rec_time', '<i8'),    # camera wall-clock date/time as seconds since 1970 (NO_VALUE if blank)
+        ('timecode', '<i4'),    # HHMMSSFF as a decimal number (NO_VALUE if missing)
+        ('audio_mode', 'u1'),   # (sample-rate code << 3) | quantization code, 0xFF if missing
+        ('pal', 'u1'),          # 1 for 625/50 frames
+        ('luma_dc_std', '<f4'), # spread of the luma DC coefficients (0 = perfectly flat picture)
+        ('audio_peak', '<u2'),  # loudest audio sample in the frame, 16-bit scale
+    ])
+
+
+def _bcd(values):
+    return (values >> 4) * 10 + (values & 0x0F)
+
+
+def _gather_pack(frames, offsets, pack_id):
+    """
+    For every frame, finds the first of the candidate offsets carrying pack_id.
+    Returns (found mask, n x 4 array of the pack's data bytes).
+    """
+    offsets = np.asarray(offsets)
+    ids = frames[:, offsets]
+    hits = ids == pack_id
+    found = hits.any(axis=1)
+    base = offsets[hits.argmax(axis=1)]
+    rows = np.arange(frames.shape[0])[:, None]
+    data = frames[rows, base[:, None] + np.arange(1, 5)]
+    return found, data
+
+
+def _decode_rec_time(frames):
+    date_found, date = _gather_pack(frames, dv_format.VAUX_PACK_OFFSETS, dv_format.PACK_REC_DATE)
+    time_found, tm = _gather_pack(frames, dv_format.VAUX_PACK_OFFSETS, dv_format.PACK_REC_TIME)
+    date = date.astype(np.int64)
+    tm = tm.astype(np.int64)
+
+    year = _bcd(date[:, 3])
+    year += np.where(year < 25, 2000, 1900)
+    month = _bcd(date[:, 2] & 0x1F)
+    day = _bcd(date[:, 1] & 0x3F)
+    hour = _bcd(tm[:, 3] & 0x3F)
+    minute = _bcd(tm[:, 2] & 0x7F)
+    second = _bcd(tm[:, 1] & 0x7F)
+
+    valid = (date_found & time_found
+             & (date[:, 1:] != 0xFF).all(axis=1) & (tm[:, 1:] != 0xFF).all(axis=1)
+             & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+             & (hour < 24) & (minute < 60) & (second < 60))
+
+    # Calendar math via datetime64 so it stays vectorized
+    month = np.clip(month, 1, 12)
+    day = np.clip(day, 1, 31)
+    days = ((year - 1970).astype('M8[Y]') + (month - 1).astype('m8[M]')).astype('M8[D]') + (day - 1).astype('m8[D]')
+    seconds = days.astype(np.int64) * 86400 + hour * 3600 + minute * 60 + second
+    return np.where(valid, seconds, NO_VALUE)
+
+
+def _decode_timecode(frames):
+    data = frames[:, TIMECODE_OFFSET:TIMECODE_OFFSET + 5].astype(np.int32)
+    valid = (data[:, 0] == PACK_TIMECODE) & (data[:, 1:] != 0xFF).all(axis=1)
+    tc = (_bcd(data[:, 4] & 0x3F) * 1000000 + _bcd(data[:, 3] & 0x7F) * 10000
+          + _bcd(data[:, 2] & 0x7F) * 100 + _bcd(data[:, 1] & 0x3F))
+    return np.where(valid, tc, NO_VALUE)
+
+
+def _decode_audio_mode(frames):
+    found, data = _gather_pack(frames, AUDIO_SOURCE_OFFSETS, PACK_AUDIO_SOURCE)
+    mode = ((data[:, 3] >> 3) & 0x07) << 3 | (data[:, 3] & 0x07)
+    return np.where(found, mode, 0xFF).astype(np.uint8)
+
+
+# --- CONTENT ANALYSIS (no decode) ---
+# Each DIF sequence: header, 2 subcode, 3 VAUX, then 9 x (1 audio + 15 video) blocks.
+_layout_cache = {}
+
+
+def _block_layout(frame_size):
+    """Byte offsets of the luma DC words and of the audio sample bytes for one frame size."""
+    if frame_size not in _layout_cache:
+        seqs = frame_size // dv_format.DIF_SEQUENCE_SIZE
+        dc, audio = [], []
+        for seq in range(seqs):
+            for i in range(9):
+                block = seq * 150 + 6 + i * 16
+                base = block * dv_format.DIF_BLOCK_SIZE
+                audio.extend(range(base + 8, base + dv_format.DIF_BLOCK_SIZE))
+                for v in range(1, 16):
+                    vbase = base + v * dv_format.DIF_BLOCK_SIZE
+                    # The first 14-byte luma DCT block follows the 3-byte ID and the STA/QNO byte
+                    # and starts with a 9-bit two's complement DC coefficient. One luma block
+                    # per macroblock is plenty to tell a flat picture from a real one.
+                    dc.append(vbase + 4)
+        _layout_cache[frame_size] = (np.asarray(dc), np.asarray(audio))
+    return _layout_cache[frame_size]
+
+
+def _decode_luma_dc_std(frames, dc_offsets):
+    hi = frames[:, dc_offsets].astype(np.int16)
+    lo = frames[:, dc_offsets + 1].astype(np.int16)
+    dc = (hi << 1) | (lo >> 7)
+    dc = np.where(dc >= 256, dc - 512, dc)
+    return dc.std(axis=1, dtype=np.float32)
+
+
+def _decode_audio_peak(frames, audio_offsets, audio_mode):
+    data = np.ascontiguousarray(frames[:, audio_offsets])
+    # 16-bit: big-endian pairs. 0x8000 marks "no sample".
+    s16 = data.view('>i2')
+    s16 = np.where(s16 == -0x8000, 0, s16)
+    peak = np.maximum(s16.max(axis=1).astype(np.int32), -s16.min(axis=1).astype(np.int32))
+
+    twelve_bit = (audio_mode != 0xFF) & ((audio_mode & 0x07) == 1)
+    if twelve_bit.any():
+        # 12-bit nonlinear: 3 bytes hold 2 samples, 0x800 marks "no sample". Small values are
+        # linear and match the 16-bit scale, which is all the silence test needs.
+        triples = data[twelve_bit].astype(np.int32).reshape(int(twelve_bit.sum()), -1, 3)
+        a = (triples[:, :, 0] << 4) | (triples[:, :, 2] >> 4)
+        b = (triples[:, :, 1] << 4) | (triples[:, :, 2] & 0x0F)
+        s12 = np.concatenate((a, b), axis=1)
+        s12 = np.where(s12 == 0x800, 0, np.where(s12 >= 0x800, s12 - 0x1000, s12))
+        peak[twelve_bit] = np.abs(s12).max(axis=1)
+    return np.minimum(peak, 0xFFFF).astype(np.uint16)
+
+
+def build_index(dv_path, frames_per_batch=1024):
+    """
+    Memory-maps a raw .dv file and extracts per-frame metadata in large vectorized batches.
+    Returns a structured NumPy array with one record per complete frame.
+    """
+    standard = dv_format.detect_standard(dv_path)
+    frame_size = dv_format.FRAME_SIZE[standard]
+    total = os.path.getsize(dv_path) // frame_size
+    index = np.zeros(total, dtype=_index_dtype())
+    if total == 0:
+        return index
+
+    dc_offsets, audio_offsets = _block_layout(frame_size)
+    with open(dv_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = np.frombuffer(mm, dtype=np.uint8, count=total * frame_size).reshape(total, frame_size)
+        frames = None
+        try:
+            for start in range(0, total, frames_per_batch):
+                frames = data[start:start + frames_per_batch]
+                chunk = index[start:start + frames_per_batch]
+                chunk['rec_time'] = _decode_rec_time(frames)
+                chunk['timecode'] = _decode_timecode(frames)
+                chunk['audio_mode'] = _decode_audio_mode(frames)
+                chunk['pal'] = (frames[:, 3] & 0x80) != 0
+                chunk['luma_dc_std'] = _decode_luma_dc_std(frames, dc_offsets)
+                chunk['audio_peak'] = _decode_audio_peak(frames, audio_offsets, chunk['audio_mode'])
+        finally:
+            del data, frames # release the buffer before the mmap closes
+    return index
+
+
+def save_index(index, index_path):
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, index, allow_pickle=False)
+    os.replace(tmp_path, index_path)
+
+
+def load_index(dv_path, rebuild=False):
+    """
+    Returns the frame index for dv_path, reading the .dvidx next to it when it is up to date
+    and building (and caching) it otherwise. Returns None when NumPy isn't installed.
+    """
+    if np is None:
+        return None
+
+    index_path = index_path_for(dv_path)
+    if not rebuild and os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(dv_path):
+        try:
+            with open(index_path, "rb") as f:
+                index = np.load(f, allow_pickle=False)
+            if index.dtype == _index_dtype():
+                return index
+            # Written by an older version with fewer fields: rebuild below
+        except (OSError, ValueError):
+            pass # Corrupt cache: rebuild below
+
+    index = build_index(dv_path)
+    try:
+        save_index(index, index_path)
+    except OSError:
+        pass # Read-only archive: still usable in memory
+    return index
+
+
+def read_recording_datetime(dv_path, frames_per_batch=64):
+    """
+    First camera date/time in dv_path without indexing the whole clip: uses the .dvidx when
+    it is up to date, otherwise decodes leading frames only until one carries a date.
+    Returns None when no frame does (or NumPy isn't installed).
+    """
+    if np is None:
+        return None
+    index_path = index_path_for(dv_path)
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(dv_path):
+        return first_recording_datetime(load_index(dv_path))
+
+    frame_size = dv_format.FRAME_SIZE[dv_format.detect_standard(dv_path)]
+    total = os.path.getsize(dv_path) // frame_size
+    if total == 0:
+        return None
+    with open(dv_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = np.frombuffer(mm, dtype=np.uint8, count=total * frame_size).reshape(total, frame_size)
+        frames = None
+        try:
+            for start in range(0, total, frames_per_batch):
+                frames = data[start:start + frames_per_batch]
+                stamped = _decode_rec_time(frames)
+                stamped = stamped[stamped != NO_VALUE]
+                if stamped.size:
+                    return EPOCH + datetime.timedelta(seconds=int(stamped[0]))
+        finally:
+            del data, frames # release the buffer before the mmap closes
+    return None
+
+
+# --- QUERIES ---
+def first_recording_datetime(index):
+    """The first valid camera date/time in the index, or None."""
+    stamped = index['rec_time'][index['rec_time'] != NO_VALUE]
+    if stamped.size == 0:
+        return None
+    return EPOCH + datetime.timedelta(seconds=int(stamped[0]))
+
+
+def audio_description(index):
+    """Human-readable audio mode of the first frame that carries one, e.g. '48000 Hz / 16-bit'."""
+    modes = index['audio_mode'][index['audio_mode'] != 0xFF]
+    if modes.size == 0:
+        return None
+    mode = int(modes[0])
+    return f"{AUDIO_RATES.get(mode >> 3, '?')} Hz / {AUDIO_BITS.get(mode & 0x07, '?')}-bit"
+
+
+def scene_ranges(index, max_gap_seconds=1):
+    """
+    Splits the index into (first_frame, end_frame) scenes wherever the recording time jumps
+    backwards or forward by more than max_gap_seconds (the dvgrab --autosplit rule).
+    Frames without a stamp stay in the running scene.
+    """
+    if index.size == 0:
+        return []
+    frames = np.flatnonzero(index['rec_time'] != NO_VALUE)
+    times = index['rec_time'][frames]
+    jumps = np.diff(times)
+    breaks = frames[1:][(jumps < 0) | (jumps > max_gap_seconds)]
+
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [index.size]))
+    return [(int(s), int(e)) for s, e in zip(starts, ends)]
+
+
+def blank_mask(index):
+    """
+    Frames that carry nothing worth encoding: unrecorded tape (no date, no timecode), or a
+    flat picture (lens cap, blue screen) that is also silent. A flat picture with sound is kept.
+    """
+    unrecorded = (index['rec_time'] == NO_VALUE) & (index['timecode'] == NO_VALUE)
+    flat_and_silent = (index['luma_dc_std'] < BLANK_DC_STD) & (index['audio_peak'] < SILENT_PEAK)
+    return unrecorded | flat_and_silent
+
+
+def keep_ranges(index, min_blank_frames):
+    """
+    (first_frame, end_frame) ranges left after dropping blank runs of at least
+    min_blank_frames (shorter runs, like fades, stay in).
+    """
+    if index.size == 0:
+        return []
+    blank = np.concatenate(([False], blank_mask(index), [False])).astype(np.int8)
+    edges = np.diff(blank)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long_runs = (ends - starts) >= min_blank_frames
+
+    keep = []
+    position = 0
+    for start, end in zip(starts[long_runs], ends[long_runs]):
+        if start > position:
+            keep.append((position, int(start)))
+        position = int(end)
+    if position < index.size:
+        keep.append((position, index.size))
+    return keep
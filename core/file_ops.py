@@ -0,0 +1,101 @@
+# core/file_ops.py
+import os
+import shutil
+import fcntl
+import ctypes
+import ctypes.util
+
+# ioctl number for FICLONE (_IOW(0x94, 9, int)): shares extents on btrfs/xfs/bcachefs
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """Copy-on-write clone of src into dst. Raises OSError where the filesystem can't do it."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def clone_file(src, dst):
+    """
+    Makes dst have the same content as src without rewriting the bytes if at all possible.
+    Tries a hardlink, then a reflink, then falls back to a normal copy.
+    Returns the method used ("hardlink", "reflink" or "copy").
+    """
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+
+    try:
+        reflink(src, dst)
+        return "reflink"
+    except OSError:
+        pass
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def copy_range(src_fd, dst_fd, offset, length):
+    """
+    Appends length bytes of src_fd (starting at offset) to dst_fd's current position.
+    Uses copy_file_range so the kernel moves (or on btrfs/xfs, shares) the data without it
+    passing through userspace, and falls back to large-buffer reads where that isn't supported.
+    """
+    remaining = length
+    if hasattr(os, "copy_file_range"):
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src_fd, dst_fd, remaining, offset)
+                if copied == 0:
+                    break # Source is shorter than expected
+                offset += copied
+                remaining -= copied
+            return length - remaining
+        except OSError:
+            pass # e.g. EXDEV on older kernels or ENOSYS: finish with plain copies
+
+    buf = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buf)
+    while remaining > 0:
+        n = os.preadv(src_fd, [view[:min(remaining, COPY_BUFFER_SIZE)]], offset)
+        if n == 0:
+            break
+        written = 0
+        while written < n:
+            written += os.write(dst_fd, view[written:n])
+        offset += n
+        remaining -= n
+    return length - remaining
+
+
+# fallocate(2) mode: reserve blocks without changing the file size
+FALLOC_FL_KEEP_SIZE = 0x01
+_libc = None
+
+
+def preallocate(fd, offset, length):
+    """
+    Reserves disk blocks for [offset, offset + length) without growing the file, so a long
+    capture lands in a few large extents. Returns False where the filesystem can't do it.
+    Blocks past EOF that end up unused are released by truncating to the final size.
+    """
+    global _libc
+    if _libc is None:
+        name = ctypes.util.find_library("c")
+        _libc = ctypes.CDLL(name, use_errno=True) if name else False
+        if _libc:
+            _libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    if not _libc or not hasattr(_libc, "fallocate"):
+        return False
+    return _libc.fallocate(fd, FALLOC_FL_KEEP_SIZE, offset, length) == 0
@@ -0,0 +1,87 @@
+# core/firewire.py
+import os
+import glob
+
+SYSFS_DEVICES = "/sys/bus/firewire/devices"
+
+# Unit directory specifier of AV/C devices (camcorders, decks) in the config ROM
+AVC_SPECIFIER_ID = 0x00a02d
+
+# Isochronous bandwidth an IEEE 1394 bus hands out per 125us cycle, in allocation units
+# (one unit = the time of one quadlet at S1600)
+BANDWIDTH_AVAILABLE = 4915
+SPEED_FACTOR = {100: 16, 200: 8, 400: 4, 800: 2}  # units per quadlet at each speed
+DV_PACKET_QUADLETS = (480 + 8) // 4  # 6 DIF blocks + CIP header, NTSC and PAL alike
+PACKET_OVERHEAD_UNITS = 512          # IEC 61883-1 overhead_ID 0
+
+
+def read_attr(node_dir, name):
+    try:
+        with open(os.path.join(node_dir, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def format_guid(guid):
+    """16 hex digits, no 0x: the form dvgrab and dvcont accept."""
+    return f"{int(guid, 16):016x}"
+
+
+def is_avc(node_dir):
+    """True if one of the node's units is AV/C (or the units can't be read at all)."""
+    units = glob.glob(node_dir + ".*")
+    if not units:
+        return True
+    for unit in units:
+        spec = read_attr(unit, "specifier_id")
+        if spec is None or int(spec, 16) == AVC_SPECIFIER_ID:
+            return True
+    return False
+
+
+def list_nodes(sysfs_root=SYSFS_DEVICES, device_root="/dev"):
+    """
+    Every FireWire node the kernel knows about, as dicts:
+    node ('fw1'), dev_path, guid, name, local (our own card), bus (local node of its card).
+    Returns None when there is no sysfs view to go on (non-Linux, old stack).
+    """
+    if not os.path.isdir(sysfs_root):
+        return None
+    nodes = []
+    for node_dir in sorted(glob.glob(os.path.join(sysfs_root, "fw*"))):
+        node = os.path.basename(node_dir)
+        if "." in node:
+            continue  # unit directory (fw1.0), not a node
+        guid = read_attr(node_dir, "guid")
+        vendor = read_attr(node_dir, "vendor_name") or ""
+        model = read_attr(node_dir, "model_name") or ""
+        nodes.append({
+            'node': node,
+            'dev_path': os.path.join(device_root, node),
+            'guid': format_guid(guid) if guid else None,
+            'name': f"{vendor} {model}".strip() or node,
+            'local': read_attr(node_dir, "is_local") == "1",
+            # Nodes hang off the card that sees them, so the sysfs parent identifies the bus
+            'card': os.path.dirname(os.path.realpath(node_dir)),
+            'avc': is_avc(node_dir),
+        })
+
+    # Name each bus after its card's own node (fw0, fw1, ...), which is what users see in /dev
+    local_names = {n['card']: n['node'] for n in nodes if n['local']}
+    for n in nodes:
+        n['bus'] = local_names.get(n['card'], n['card'])
+    return nodes
+
+
+def list_decks(sysfs_root=SYSFS_DEVICES, device_root="/dev"):
+    """Remote AV/C nodes with a GUID (i.e. something we can capture from), or None without sysfs."""
+    nodes = list_nodes(sysfs_root, device_root)
+    if nodes is None:
+        return None
+    return [n for n in nodes if not n['local'] and n['avc'] and n['guid']]
+
+
+def dv_bandwidth_units(speed=100):
+    """Isochronous units one DV stream takes (one CIP packet per cycle at the deck's speed)."""
+    return PACKET_OVERHEAD_UNITS + (DV_PACKET_QUADLETS + 3) * SPEED_FACTOR.get(speed, SPEED_FACTOR[100])
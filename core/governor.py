@@ -0,0 +1,234 @@
+# core/governor.py
+import os
+import glob
+import ctypes
+import threading
+from pathlib import Path
+
+# ioprio_set(2): who = process, classes from <linux/ioprio.h>
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_BE = 2
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+SYS_IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}
+
+_libc = None
+
+
+def task_ids(pid):
+    """Thread ids of a process (from /proc), or just the pid where they can't be listed."""
+    try:
+        return [int(tid) for tid in os.listdir(f"/proc/{pid}/task")] or [pid]
+    except (OSError, ValueError):
+        return [pid]
+
+
+def default_state_dir():
+    return os.path.join(Path.home(), ".config", "RetroReel", "capturing")
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# --- CAPTURE REGISTRY ---
+# Recordings leave a <pid>-<n> marker here while they run, so conversions in this
+# process or any other (e.g. a second app window) can see that a deck is busy.
+_marker_lock = threading.Lock()
+_marker_count = 0
+
+
+def capture_started(state_dir=None):
+    """Registers a running recording; returns the token for capture_stopped()."""
+    global _marker_count
+    state_dir = state_dir or default_state_dir()
+    with _marker_lock:
+        _marker_count += 1
+        token = os.path.join(state_dir, f"{os.getpid()}-{_marker_count}")
+    try:
+        os.makedirs(state_dir, exist_ok=True)
+        open(token, "w").close()
+    except OSError as e:
+        print(f"Capture marker not written: {e}")
+        return None
+    return token
+
+
+def capture_stopped(token):
+    if token:
+        try:
+            os.remove(token)
+        except OSError:
+            pass
+
+
+def active_captures(state_dir=None):
+    """Number of recordings running right now. Markers left by a crashed process are cleared."""
+    count = 0
+    for marker in glob.glob(os.path.join(state_dir or default_state_dir(), "*-*")):
+        try:
+            pid = int(os.path.basename(marker).split("-")[0])
+        except ValueError:
+            continue
+        if pid_alive(pid):
+            count += 1
+        else:
+            capture_stopped(marker)
+    return count
+
+
+# --- PROCESS KNOBS ---
+def set_io_priority(pid, io_class, level=0):
+    """ioprio_set via syscall (no Python binding). Returns False where unsupported."""
+    global _libc
+    number = SYS_IOPRIO_SET.get(os.uname().machine)
+    if number is None:
+        return False
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    return _libc.syscall(number, IOPRIO_WHO_PROCESS, pid, (io_class << IOPRIO_CLASS_SHIFT) | level) == 0
+
+
+class ResourceGovernor:
+    """
+    Keeps conversions out of a recording's way.
+
+    While any deck records, encodes are limited to fewer parallel jobs, run at a higher nice
+    level and idle I/O class, and are kept off the cores reserved for capture. Encodes that
+    are already running are re-prioritised on the spot; the next encode after the last
+    recording stops gets full throughput again. Every change of mode is logged.
+
+    Each encode calls acquire() before it starts and release() when it ends, to respect the
+    job limit, and register(pid) / unregister(pid) around its process so it follows mode changes.
+    """
+    POLL_INTERVAL = 1.0 # seconds between registry checks
+
+    def __init__(self, config, max_jobs, log=print, state_dir=None):
+        self.enabled = bool(config.get("governor")) if config else False
+        self.max_jobs = max_jobs
+        self.capture_jobs = max(1, min(max_jobs, int(config.get("capture_max_jobs") or 1))) if config else 1
+        # 0 is a valid setting (throttle by jobs / cores / I/O only), so only a missing value means 10
+        nice = config.get("capture_nice") if config else None
+        self.capture_nice = 10 if nice is None else int(nice)
+        reserved = int(config.get("capture_reserved_cores") or 0) if config else 0
+        self.log = log
+        self.state_dir = state_dir
+
+        # Conversions give up the first `reserved` cores they are allowed on (as long as one is left)
+        self.all_cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self.convert_cores = set(self.all_cores[reserved:]) or set(self.all_cores)
+
+        self.cond = threading.Condition()
+        self.running = 0
+        self.pids = set()
+        self.throttled = False
+        self.thread = None
+        self.stopped = threading.Event()
+
+    # --- LIFECYCLE ---
+    def start(self):
+        if self.enabled:
+            self.update()
+            self.thread = threading.Thread(target=self.watch, name="resource-governor", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        with self.cond:
+            self.cond.notify_all()
+
+    def watch(self):
+        while not self.stopped.wait(self.POLL_INTERVAL):
+            self.update()
+
+    def update(self):
+        throttle = active_captures(self.state_dir) > 0
+        with self.cond:
+            if throttle == self.throttled:
+                return
+            self.throttled = throttle
+            pids = list(self.pids)
+            # A higher limit may let waiting encodes start right away
+            self.cond.notify_all()
+
+        if throttle:
+            self.log(f"Governor: recording in progress, limiting conversion to {self.capture_jobs} job(s), "
+                     f"nice {self.capture_nice}, idle I/O, cores {self.format_cores(self.convert_cores)}")
+        else:
+            self.log(f"Governor: no recording, back to {self.max_jobs} job(s) on all cores")
+        for pid in pids:
+            self.apply(pid, running=True)
+
+    @staticmethod
+    def format_cores(cores):
+        return ",".join(str(c) for c in sorted(cores))
+
+    # --- JOB SLOTS ---
+    @property
+    def limit(self):
+        return self.capture_jobs if self.throttled else self.max_jobs
+
+    def acquire(self, should_continue=None):
+        """Blocks until the current job limit allows one more encode. False if we were stopped while waiting."""
+        with self.cond:
+            while self.running >= self.limit:
+                if self.stopped.is_set() or (should_continue and not should_continue()):
+                    return False
+                self.cond.wait(self.POLL_INTERVAL)
+            self.running += 1
+        return True
+
+    def release(self):
+        with self.cond:
+            self.running -= 1
+            self.cond.notify_all()
+
+    # --- PER-PROCESS SETTINGS ---
+    def register(self, pid):
+        with self.cond:
+            self.pids.add(pid)
+        if self.enabled:
+            self.apply(pid)
+
+    def unregister(self, pid):
+        with self.cond:
+            self.pids.discard(pid)
+
+    def apply(self, pid, running=False):
+        """
+        Sets nice / I/O class / affinity of one encode for the current mode. On Linux these
+        are per thread, so every thread of the process (x264 / decoder workers) gets them.
+        """
+        throttled = self.throttled
+        kept_nice = False
+        for tid in task_ids(pid):
+            try:
+                if throttled:
+                    os.setpriority(os.PRIO_PROCESS, tid, self.capture_nice)
+                    set_io_priority(tid, IOPRIO_CLASS_IDLE)
+                    os.sched_setaffinity(tid, self.convert_cores)
+                else:
+                    set_io_priority(tid, IOPRIO_CLASS_BE, 4)
+                    os.sched_setaffinity(tid, self.all_cores)
+                    if running:
+                        # Lowering nice again needs CAP_SYS_NICE; without it the encode keeps its level
+                        try:
+                            os.setpriority(os.PRIO_PROCESS, tid, 0)
+                        except PermissionError:
+                            kept_nice = True
+            except ProcessLookupError:
+                pass # Thread (or the whole encode) finished in the meantime
+            except (AttributeError, OSError) as e:
+                self.log(f"Governor: could not adjust pid {pid}: {e}")
+                return
+        if kept_nice:
+            self.log(f"Governor: pid {pid} stays at nice {self.capture_nice} (not allowed to lower it)")
@@ -0,0 +1,372 @@
+# core/ingest.py
+import os
+import glob
+import time
+import json
+import socket
+import select
+import sqlite3
+import hashlib
+from pathlib import Path
+
+from core import inotify
+from core.converter import TapeConverter
+from core.governor import pid_alive
+from core.scene_splitter import SceneSplitter
+
+# Queue priorities: higher runs first, equal priorities in arrival order
+PRIORITY_WATCH = 0     # found by the archive watcher
+PRIORITY_SESSION = 10  # a capture just finished on this station
+PRIORITY_MANUAL = 20   # picked by hand in the converter tab
+
+
+def default_db_path():
+    return os.path.join(Path.home(), ".config", "RetroReel", "ingest.db")
+
+
+def owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def dv_entries(tape_dir):
+    """Sorted (name, size, mtime_ns) of the .dv files directly in a folder."""
+    entries = []
+    for entry in os.scandir(tape_dir):
+        if entry.name.lower().endswith(".dv") and entry.is_file():
+            st = entry.stat()
+            entries.append((entry.name, st.st_size, st.st_mtime_ns))
+    entries.sort()
+    return entries
+
+
+def entries_signature(entries):
+    """Short digest of the .dv files' names/sizes/mtimes: changes whenever the tape's content does."""
+    return hashlib.sha1(json.dumps(entries).encode()).hexdigest()
+
+
+def folder_signature(tape_dir):
+    return entries_signature(dv_entries(tape_dir))
+
+
+def has_scenes(entries):
+    """Scene files present (a lone _MASTER.dv still has to go through autosplit)."""
+    return any(not name.endswith("_MASTER.dv") for name, _, _ in entries)
+
+
+def capture_in_progress(tape_dir):
+    """
+    A live-split capture is still writing scenes here: its _MASTER.capturing marker is present
+    and the _MASTER.index.json that completes it isn't. (Quiet files alone don't prove it is
+    done; a paused deck writes nothing for as long as it is paused.)
+    """
+    for marker in glob.glob(os.path.join(glob.escape(tape_dir), "*_MASTER.capturing")):
+        master = marker[:-len("_MASTER.capturing")] + "_MASTER.dv"
+        if not os.path.exists(SceneSplitter.index_path_for(master)):
+            return True
+    return False
+
+
+def already_converted(tape_dir, entries):
+    """A transfer report newer than every .dv file means the last conversion covered this content."""
+    _, report_path = TapeConverter.output_paths(tape_dir)
+    try:
+        report_time = os.stat(report_path).st_mtime_ns
+    except OSError:
+        return False
+    return all(mtime <= report_time for _, _, mtime in entries)
+
+
+class IngestQueue:
+    """
+    Persistent, prioritised queue of tape folders waiting for conversion (SQLite, like the
+    catalog). Survives restarts; a tape whose files change after it was converted is queued
+    again. claim() is atomic, so the GUI and a headless daemon can drain the same queue.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS queue (
+            path TEXT PRIMARY KEY,
+            priority INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL,          -- pending, running, done, failed
+            signature TEXT,
+            enqueued REAL,
+            started REAL,
+            finished REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS queue_order ON queue (state, priority DESC, enqueued);
+        CREATE TABLE IF NOT EXISTS seeded (
+            root TEXT PRIMARY KEY,
+            finished REAL
+        );
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self.connect() as db:
+            db.executescript(self.SCHEMA)
+
+    def connect(self):
+        """One short-lived connection per call (UI thread, watcher thread and other processes)."""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def enqueue(self, path, priority=PRIORITY_WATCH, signature=None):
+        """
+        Queues a tape folder. Already pending: the priority can only go up. Already converted
+        (or failed) with the same signature: ignored. Returns True if it is now pending.
+        """
+        path = os.path.abspath(path)
+        signature = signature or folder_signature(path)
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT state, signature, priority FROM queue WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                db.execute("INSERT INTO queue (path, priority, state, signature, enqueued) VALUES (?, ?, 'pending', ?, ?)",
+                           (path, priority, signature, time.time()))
+                return True
+            state, old_signature, old_priority = row
+            if state in ("pending", "running"):
+                if priority > old_priority:
+                    db.execute("UPDATE queue SET priority = ? WHERE path = ?", (priority, path))
+                return state == "pending"
+            if old_signature == signature and priority <= PRIORITY_WATCH:
+                return False # Nothing new; only a person (or a fresh capture) asks for a re-run
+            db.execute("""UPDATE queue SET state = 'pending', priority = ?, signature = ?, enqueued = ?,
+                          started = NULL, finished = NULL, error = NULL WHERE path = ?""",
+                       (priority, signature, time.time(), path))
+            return True
+
+    def is_seeded(self, root):
+        with self.connect() as db:
+            return db.execute("SELECT 1 FROM seeded WHERE root = ?", (os.path.abspath(root),)).fetchone() is not None
+
+    def mark_seeded(self, root):
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO seeded (root, finished) VALUES (?, ?)", (os.path.abspath(root), time.time()))
+
+    def record_existing(self, path, signature):
+        """Notes a tape folder as converted without queuing it (unless the queue already knows it)."""
+        with self.connect() as db:
+            db.execute("INSERT OR IGNORE INTO queue (path, priority, state, signature, enqueued, finished) "
+                       "VALUES (?, ?, 'done', ?, ?, ?)", (os.path.abspath(path), PRIORITY_WATCH, signature,
+                                                          time.time(), time.time()))
+
+    def claim(self):
+        """Takes the next tape (highest priority, then oldest). Returns its path or None."""
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("""SELECT path FROM queue WHERE state = 'pending'
+                                ORDER BY priority DESC, enqueued LIMIT 1""").fetchone()
+            if row is None:
+                return None
+            db.execute("""UPDATE queue SET state = 'running', started = ?, owner = ?, attempts = attempts + 1
+                          WHERE path = ?""", (time.time(), owner_id(), row[0]))
+            return row[0]
+
+    def finish(self, path, ok, error=None):
+        with self.connect() as db:
+            db.execute("UPDATE queue SET state = ?, finished = ?, error = ?, owner = NULL WHERE path = ?",
+                       ("done" if ok else "failed", time.time(), error, os.path.abspath(path)))
+
+    def release(self, path):
+        """Puts a claimed tape back (stopped before it finished)."""
+        with self.connect() as db:
+            db.execute("UPDATE queue SET state = 'pending', owner = NULL WHERE path = ?", (os.path.abspath(path),))
+
+    def recover(self):
+        """Re-queues tapes claimed by processes on this host that no longer exist (crash, kill -9)."""
+        host = socket.gethostname()
+        with self.connect() as db:
+            rows = db.execute("SELECT path, owner FROM queue WHERE state = 'running'").fetchall()
+            stale = [path for path, owner in rows
+                     if owner and owner.rpartition(":")[0] == host and not pid_alive(int(owner.rpartition(":")[2]))]
+            db.executemany("UPDATE queue SET state = 'pending', owner = NULL WHERE path = ?", [(p,) for p in stale])
+        return stale
+
+    def entries(self, states=("pending", "running")):
+        marks = ",".join("?" * len(states))
+        with self.connect() as db:
+            return db.execute(f"""SELECT path, state, priority, attempts FROM queue WHERE state IN ({marks})
+                                  ORDER BY state = 'running' DESC, priority DESC, enqueued""", states).fetchall()
+
+
+class ArchiveWatcher:
+    """
+    Finds tape folders under the archive roots that are ready to convert and queues them.
+
+    A tape is ready once it has scene files, none of its .dv files (the _MASTER.dv
+    included) changed for settle_seconds and no live-split capture is still writing to it.
+    With seed_existing, the first run over a root records the tapes already there as
+    converted instead of queuing the whole back catalogue. inotify tells us which folders to look at; a
+    periodic full walk runs anyway, because writes from other stations on a network share
+    never raise inotify events here (and as the only mechanism where inotify is missing).
+    """
+    TICK = 5.0               # seconds between readiness checks
+    RESCAN_INTERVAL = 300.0  # full walk even with inotify
+    POLL_INTERVAL = 30.0     # full walk without inotify
+
+    def __init__(self, roots, queue, settle_seconds=120, log=print, on_queued=None, seed_existing=False):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.seed_existing = seed_existing
+        self.queue = queue
+        self.settle_seconds = settle_seconds
+        self.log = log
+        self.on_queued = on_queued or (lambda path: None)
+        self.candidates = {}  # tape folder -> (signature, unchanged since)
+        self.known = {}       # tape folder -> signature already queued / converted
+        self.watch = None
+        self.watched = {}     # wd -> directory
+
+    # --- DISCOVERY ---
+    @staticmethod
+    def walk(root):
+        """Every folder under root, skipping our own outputs and hidden folders."""
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d != "mp4_format")
+            yield dirpath
+
+    def scan(self):
+        for root in self.roots:
+            for folder in self.walk(root):
+                self.check(folder)
+
+    def seed(self):
+        """First run over a root: what is already in the archive counts as converted."""
+        for root in self.roots:
+            if self.queue.is_seeded(root):
+                continue
+            count = 0
+            for folder in self.walk(root):
+                try:
+                    entries = dv_entries(folder)
+                except OSError:
+                    continue
+                if entries and has_scenes(entries) and not capture_in_progress(folder):
+                    signature = entries_signature(entries)
+                    self.queue.record_existing(folder, signature)
+                    self.known[folder] = signature
+                    count += 1
+            self.queue.mark_seeded(root)
+            if count:
+                self.log(f"Archive watcher: {count} tape folder(s) already in {root} left as they are "
+                         "(queue them by hand to convert)")
+
+    def check(self, folder):
+        """Notes a folder's current content; the settle timer restarts whenever it changes."""
+        try:
+            entries = dv_entries(folder)
+        except OSError:
+            entries = []
+        if not entries or not has_scenes(entries) or capture_in_progress(folder):
+            self.candidates.pop(folder, None)
+            return
+        signature = entries_signature(entries)
+        if self.known.get(folder) == signature:
+            return
+        if folder not in self.candidates or self.candidates[folder][0] != signature:
+            self.candidates[folder] = (signature, time.time())
+
+    def settle(self):
+        now = time.time()
+        for folder, (signature, since) in list(self.candidates.items()):
+            if now - since < self.settle_seconds:
+                continue
+            try:
+                entries = dv_entries(folder)
+            except OSError:
+                del self.candidates[folder]
+                continue
+            if entries_signature(entries) != signature or capture_in_progress(folder):
+                # Changed since we last looked (no event for it, e.g. a network share), or still recording
+                self.check(folder)
+                continue
+            del self.candidates[folder]
+            self.known[folder] = signature
+            if already_converted(folder, entries):
+                continue
+            try:
+                if self.queue.enqueue(folder, PRIORITY_WATCH, signature):
+                    self.log(f"Queued for conversion: {folder}")
+                    self.on_queued(folder)
+            except sqlite3.Error as e:
+                self.log(f"Ingest queue unavailable: {e}")
+                del self.known[folder]
+
+    # --- INOTIFY ---
+    def open_watch(self):
+        try:
+            self.watch = inotify.Inotify()
+        except OSError:
+            self.watch = None
+            return
+        self.watched = {}
+        for root in self.roots:
+            self.add_tree(root)
+
+    def add_tree(self, top):
+        for folder in self.walk(top):
+            try:
+                self.watched[self.watch.add_watch(folder, inotify.CONTENT_CHANGES)] = folder
+            except OSError as e:
+                # Usually the per-user watch limit; the periodic walk still covers everything
+                self.log(f"Archive watcher: inotify unavailable for {folder} ({e}), polling instead")
+                self.watch.close()
+                self.watch = None
+                return
+
+    def handle_events(self):
+        """Returns False if the watch has to be rebuilt."""
+        dirty = set()
+        for wd, mask, name in self.watch.read_events():
+            if mask & inotify.IN_Q_OVERFLOW:
+                return False
+            folder = self.watched.get(wd)
+            if folder is None:
+                continue
+            if mask & inotify.IN_IGNORED:
+                del self.watched[wd] # folder deleted
+                continue
+            if mask & inotify.IN_ISDIR and mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+                path = os.path.join(folder, name)
+                if not name.startswith(".") and name != "mp4_format":
+                    self.add_tree(path)
+                    if self.watch is None:
+                        return True
+                    dirty.update(self.walk(path))
+            dirty.add(folder)
+        for folder in dirty:
+            self.check(folder)
+        return True
+
+    # --- MAIN LOOP ---
+    def run(self, should_continue, wake_fd=None):
+        """Blocks until should_continue() is False. wake_fd (a pipe) can interrupt the wait."""
+        if self.seed_existing:
+            try:
+                self.seed()
+            except sqlite3.Error as e:
+                self.log(f"Ingest queue unavailable: {e}")
+        self.open_watch()
+        last_scan = 0
+        try:
+            while should_continue():
+                interval = self.RESCAN_INTERVAL if self.watch else self.POLL_INTERVAL
+                if time.time() - last_scan >= interval:
+                    self.scan()
+                    last_scan = time.time()
+                self.settle()
+
+                fds = ([self.watch] if self.watch else []) + ([wake_fd] if wake_fd is not None else [])
+                readable, _, _ = select.select(fds, [], [], self.TICK)
+                if self.watch and self.watch in readable and not self.handle_events():
+                    # Missed events: start over with a fresh watch and a full walk
+                    self.watch.close()
+                    self.open_watch()
+                    last_scan = 0
+        finally:
+            if self.watch:
+                self.watch.close()
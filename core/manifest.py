@@ -0,0 +1,105 @@
+# core/manifest.py
+import os
+import json
+import threading
+
+
+def partial_path(path):
+    """Temp name an output is written under until it is complete (keeps the extension for ffmpeg)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{ext}"
+
+
+class ConversionManifest:
+    """
+    Per-tape record of finished conversion outputs, stored as JSON in the tape's mp4 folder.
+
+    An output only counts as done if the manifest says so AND its inputs still have the
+    size/mtime they had when it was produced AND the file on disk has the recorded size.
+    Outputs are written under a .part name and renamed into place before being marked,
+    so a killed ffmpeg can never leave something that looks finished.
+    """
+    FILENAME = ".retroreel_manifest.json"
+    VERSION = 1
+
+    def __init__(self, dest_base):
+        self.base = dest_base
+        self.path = os.path.join(dest_base, self.FILENAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data.get('outputs', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Atomic rewrite (temp file + rename). Caller must hold the lock."""
+        os.makedirs(self.base, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'version': self.VERSION, 'outputs': self.entries}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def key(self, output_path):
+        return os.path.relpath(output_path, self.base)
+
+    @staticmethod
+    def describe_inputs(input_paths, extra=None):
+        inputs = []
+        for path in input_paths:
+            st = os.stat(path)
+            inputs.append({'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns})
+        return {'files': inputs, 'extra': extra}
+
+    def is_complete(self, output_path, input_paths, extra=None):
+        with self.lock:
+            entry = self.entries.get(self.key(output_path))
+        if not entry or entry.get('state') != 'done':
+            return False
+        try:
+            if os.path.getsize(output_path) != entry.get('output_size'):
+                return False
+            return entry.get('inputs') == self.describe_inputs(input_paths, extra)
+        except OSError:
+            return False
+
+    def mark_started(self, output_path, input_paths, extra=None):
+        with self.lock:
+            self.entries[self.key(output_path)] = {
+                'state': 'running',
+                'inputs': self.describe_inputs(input_paths, extra),
+            }
+            self.save()
+
+    def commit(self, partial, output_path, input_paths, extra=None):
+        """Moves a finished .part file into place and records it as done."""
+        os.replace(partial, output_path)
+        with self.lock:
+            # Fresh entry: a digest recorded for an earlier version of the file no longer applies
+            self.entries[self.key(output_path)] = {
+                'state': 'done',
+                'inputs': self.describe_inputs(input_paths, extra),
+                'output_size': os.path.getsize(output_path),
+            }
+            self.save()
+
+    def set_digest(self, output_path, algorithm, digest):
+        with self.lock:
+            entry = self.entries.get(self.key(output_path))
+            if entry is not None:
+                entry.setdefault('digests', {})[algorithm] = digest
+                self.save()
+
+    def forget(self, output_paths):
+        with self.lock:
+            for path in output_paths:
+                self.entries.pop(self.key(path), None)
+            self.save()
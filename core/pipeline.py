@@ -0,0 +1,77 @@
+# core/pipeline.py
+import os
+import signal
+import subprocess
+
+
+def stage(name, argv, env=None, critical=True):
+    """
+    One member of a capture pipeline.
+    critical=False marks stages the recording survives without (e.g. a preview fed by a
+    splitter that tolerates a broken pipe).
+    """
+    return {'name': name, 'argv': argv, 'env': env, 'critical': critical}
+
+
+class Pipeline:
+    """
+    Runs stages as `a | b | c` without a shell, so every member is a direct child we can
+    supervise on its own. All stages share one process group: stop() signals them together.
+    """
+    def __init__(self, stages, stdin=None, stdout=None):
+        self.stages = stages
+        self.stdin = stdin      # for the first stage (e.g. subprocess.PIPE to feed it ourselves)
+        self.stdout = stdout    # for the last stage
+        self.processes = []
+        self.pgid = None
+
+    def start(self):
+        previous = None
+        for i, st in enumerate(self.stages):
+            env = dict(os.environ, **st['env']) if st['env'] else None
+            last = i == len(self.stages) - 1
+            # The first stage leads a new process group and the rest join it. (A new session
+            # would not work: processes can't join a group in another session.)
+            pgid = self.pgid or 0
+            group = {'preexec_fn': lambda: os.setpgid(0, pgid)}
+            proc = subprocess.Popen(st['argv'], env=env,
+                                    stdin=previous.stdout if previous else self.stdin,
+                                    stdout=self.stdout if last else subprocess.PIPE,
+                                    **group)
+            if previous:
+                # Only the child should hold the read end, so a dying reader gives the writer SIGPIPE
+                previous.stdout.close()
+            if self.pgid is None:
+                self.pgid = proc.pid
+            self.processes.append(proc)
+            previous = proc
+        return self
+
+    @property
+    def first(self):
+        return self.processes[0]
+
+    @property
+    def last(self):
+        return self.processes[-1]
+
+    @property
+    def pid(self):
+        return self.pgid
+
+    def members(self):
+        """(stage, Popen) pairs."""
+        return list(zip(self.stages, self.processes))
+
+    def poll(self):
+        """None while any stage is still running, else the last stage's exit status (like a shell)."""
+        codes = [p.poll() for p in self.processes]
+        return None if None in codes else codes[-1]
+
+    def stop(self, sig=signal.SIGTERM):
+        if self.pgid is None:
+            return
+        try:
+            os.killpg(self.pgid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
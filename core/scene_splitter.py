@@ -0,0 +1,137 @@
+# core/scene_splitter.py
+import os
+import json
+import datetime
+
+from core import dv_format
+
+
+def dated_scene_name(base_name, dt):
+    """dvgrab --autosplit --timestamp naming: <base>-YYYY.MM.DD_HH-MM-SS.dv"""
+    return f"{base_name}{dt.strftime('%Y.%m.%d_%H-%M-%S')}.dv"
+
+
+def numbered_scene_name(base_name, number):
+    """dvgrab naming when the camera clock is missing: <base>-001.dv"""
+    return f"{base_name}{number:03d}.dv"
+
+
+class SceneSplitter:
+    """
+    Splits a raw DV stream into per-scene files while it is being captured.
+
+    A new scene starts whenever the camera's recording date/time jumps (backwards, or
+    forward by more than max_gap_seconds), which is the same rule dvgrab --autosplit uses.
+    Files follow the dvgrab naming contract that find_split_files / batch_rename_files expect:
+        <base>-YYYY.MM.DD_HH-MM-SS.dv   (timestamped scenes)
+        <base>-001.dv                   (camera clock missing)
+    Instead of a full _MASTER.dv copy, a small _MASTER.index.json lists the scenes.
+    A _MASTER.capturing marker sits next to them until the index is written, so the
+    archive watcher (core/ingest.py) knows the folder is still being recorded into.
+    """
+    WRITE_BUFFER = 4 * 1024 * 1024
+
+    def __init__(self, master_file, max_gap_seconds=1):
+        self.folder = os.path.dirname(master_file)
+        self.base_name = os.path.basename(master_file).replace("_MASTER.dv", "-")
+        self.index_path = self.index_path_for(master_file)
+        self.marker_path = self.marker_path_for(master_file)
+        open(self.marker_path, "w").close()
+        self.max_gap = datetime.timedelta(seconds=max_gap_seconds)
+
+        self.pending = bytearray()
+        self.frame_size = None
+        self.standard = None
+        self.frame_number = 0
+        self.last_dt = None
+        self.current = None
+        self.scenes = []
+        self.undated_count = 0
+
+    @staticmethod
+    def index_path_for(master_file):
+        return master_file.replace("_MASTER.dv", "_MASTER.index.json")
+
+    @staticmethod
+    def marker_path_for(master_file):
+        return master_file.replace("_MASTER.dv", "_MASTER.capturing")
+
+    def scene_filename(self, dt):
+        if dt is not None:
+            name = dated_scene_name(self.base_name, dt)
+            if not os.path.exists(os.path.join(self.folder, name)):
+                return name
+        # No clock (or a same-second collision): fall back to dvgrab's numbered names
+        self.undated_count += 1
+        return numbered_scene_name(self.base_name, self.undated_count)
+
+    def start_scene(self, dt):
+        self.close_scene()
+        filename = self.scene_filename(dt)
+        self.current = open(os.path.join(self.folder, filename), "wb", buffering=self.WRITE_BUFFER)
+        self.scenes.append({
+            'file': filename,
+            'first_frame': self.frame_number,
+            'frames': 0,
+            'recorded': dt.isoformat() if dt else None,
+        })
+
+    def close_scene(self):
+        if self.current:
+            self.current.close()
+            self.current = None
+
+    def is_new_scene(self, dt):
+        if self.current is None:
+            return True
+        if dt is None or self.last_dt is None:
+            # Dropouts without a stamp stay in the running scene
+            return False
+        delta = dt - self.last_dt
+        return delta < datetime.timedelta(0) or delta > self.max_gap
+
+    def feed(self, data):
+        """Accepts any amount of raw stream bytes; whole frames are written out as they complete."""
+        self.pending += data
+        if self.frame_size is None:
+            if len(self.pending) < dv_format.DIF_BLOCK_SIZE:
+                return
+            self.standard = dv_format.frame_standard(self.pending)
+            self.frame_size = dv_format.FRAME_SIZE[self.standard]
+
+        offset = 0
+        while len(self.pending) - offset >= self.frame_size:
+            frame = memoryview(self.pending)[offset:offset + self.frame_size]
+            dt = dv_format.frame_recording_datetime(frame)
+            if self.is_new_scene(dt):
+                self.start_scene(dt)
+            self.current.write(frame)
+            frame.release()
+
+            self.scenes[-1]['frames'] += 1
+            if dt is not None:
+                self.last_dt = dt
+            self.frame_number += 1
+            offset += self.frame_size
+        del self.pending[:offset]
+
+    def close(self):
+        """Flushes the last scene and writes the master index. Any partial trailing frame is dropped."""
+        self.close_scene()
+        index = {
+            'standard': self.standard,
+            'frame_size': self.frame_size,
+            'total_frames': self.frame_number,
+            'scenes': self.scenes,
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        # The index appearing is the signal that every scene file is complete
+        os.replace(tmp_path, self.index_path)
+        try:
+            os.remove(self.marker_path)
+        except OSError:
+            pass
+        return index
+
@@ -0,0 +1,492 @@
+# core/spool.py
+# Encode jobs shared between stations through a spool folder on the archive share:
+#
+#   jobs/<id>.json      what to run (an ffmpeg command), published by the converting station
+#   claims/<id>.claim   who runs it; created with O_EXCL, kept fresh by touching it (the lease)
+#   results/<id>.json   how it went, written by the station that ran it
+#
+# Plain files and atomic renames only, so it works on any share that honours O_EXCL
+# (local disks, NFSv3+, SMB) and needs no server. Lease ages are measured with the share's
+# own clock (mtime of a file we just touched), so stations with skewed clocks still agree.
+import os
+import re
+import glob
+import json
+import time
+import uuid
+import socket
+import hashlib
+import threading
+import subprocess
+
+from core import tools
+from core.governor import ResourceGovernor
+
+
+# What a published job may ask for: exactly the options and filters TapeConverter's encode
+# commands use. Anyone who can write to the share can publish, so nothing else is run.
+FFMPEG_FLAGS = {"-hide_banner", "-y", "-nostats", "-an"}
+FFMPEG_OPTIONS = {"-loglevel", "-f", "-i", "-c:v", "-crf", "-preset", "-vf", "-filter_complex", "-map",
+                  "-c:a", "-b:a", "-movflags", "-metadata", "-q:v", "-frame_pts", "-fps_mode", "-r"}
+INPUT_FORMATS = {"dv"}
+FILTERS = {"yadif", "trim", "format", "split", "null", "scale", "setpts", "fps", "select"}
+
+
+def inside(path, root):
+    """True if path (resolving links) is root or below it."""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def input_paths(spec):
+    """Files behind an ffmpeg input spec: a path, concat:a|b, or subfile,,start,..,,:path pieces."""
+    parts = spec[len("concat:"):].split("|") if spec.startswith("concat:") else [spec]
+    return [part.partition(",,:")[2] if part.startswith("subfile,") else part for part in parts]
+
+
+def check_command(argv, outputs, root):
+    """Raises ValueError unless argv is one of our ffmpeg encodes reading and writing only under root."""
+    if not root:
+        raise ValueError("no local archive root to check paths against")
+    if not argv or os.path.basename(argv[0]) != "ffmpeg":
+        raise ValueError(f"not an ffmpeg command: {argv[:1]}")
+    paths = list(outputs)
+    args = iter(argv[1:])
+    for arg in args:
+        if arg in FFMPEG_FLAGS:
+            continue
+        if arg not in FFMPEG_OPTIONS:
+            if arg.startswith("-"):
+                raise ValueError(f"option {arg} is not allowed")
+            paths.append(arg) # an output file
+            continue
+        value = next(args, None)
+        if value is None:
+            raise ValueError(f"{arg} without a value")
+        if arg == "-i":
+            paths += input_paths(value)
+        elif arg == "-f" and value not in INPUT_FORMATS:
+            raise ValueError(f"input format {value} is not allowed")
+        elif arg in ("-vf", "-filter_complex"):
+            # A backslash-escaped comma is part of an expression, not a filter separator
+            for chain in re.split(r"(?<!\\)[;,]", re.sub(r"\[[^\]]*\]", "", value)):
+                name = chain.partition("=")[0].strip()
+                if name and name not in FILTERS:
+                    raise ValueError(f"filter {name} is not allowed")
+    for path in paths:
+        if not os.path.isabs(path) or not inside(path, root):
+            raise ValueError(f"{path} is outside the archive")
+
+
+def attempt_path(part):
+    """Private name a worker encodes to before moving it onto the job's .part file."""
+    root, ext = os.path.splitext(part)
+    return f"{root}.{uuid.uuid4().hex[:8]}{ext}"
+
+
+def clear_attempts(part):
+    """Removes what crashed workers left of their attempts at a .part file."""
+    root, ext = os.path.splitext(part)
+    for path in glob.glob(f"{glob.escape(root)}.{'[0-9a-f]' * 8}{ext}"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class Lease:
+    """A claim we hold on one job. The spool's heartbeat thread keeps it fresh until release()."""
+    def __init__(self, spool, job_id, token):
+        self.spool = spool
+        self.job_id = job_id
+        self.token = token
+        self.lost = False
+        self.on_lost = None # called from the heartbeat thread if another station took the job over
+
+    @property
+    def path(self):
+        return self.spool.claim_path(self.job_id)
+
+    def held(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f).get('token') == self.token
+        except (OSError, ValueError):
+            return False
+
+    def release(self):
+        self.spool.drop_lease(self)
+        if self.held():
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class EncodeSpool:
+    """
+    Job protocol for farming encodes out to other stations.
+
+    A job is claimed by creating its claim file exclusively. The claimer touches the file
+    every LEASE_SECONDS / 3; a claim older than LEASE_SECONDS belongs to a station that
+    crashed or dropped off the network, and the job may be claimed again. The publisher
+    touches its job files the same way; jobs nobody touched for ABANDON_LEASES leases are
+    cleared out.
+    """
+    LEASE_SECONDS = 60.0
+    ABANDON_LEASES = 10
+    POLL_INTERVAL = 2.0
+
+    def __init__(self, spool_dir, lease_seconds=None, log=print):
+        self.dir = os.path.abspath(spool_dir)
+        self.lease_seconds = float(lease_seconds or self.LEASE_SECONDS)
+        self.log = log
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        for sub in ("jobs", "claims", "results", "tmp"):
+            os.makedirs(os.path.join(self.dir, sub), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.leases = {}     # job id -> Lease we hold
+        self.published = set()
+        self.clock_offset = 0.0
+        self.thread = None
+        self.stopped = threading.Event()
+
+    # --- PATHS ---
+    def job_path(self, job_id):
+        return os.path.join(self.dir, "jobs", f"{job_id}.json")
+
+    def claim_path(self, job_id):
+        return os.path.join(self.dir, "claims", f"{job_id}.claim")
+
+    def result_path(self, job_id):
+        return os.path.join(self.dir, "results", f"{job_id}.json")
+
+    def write_atomic(self, path, data):
+        tmp = os.path.join(self.dir, "tmp", f"{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # --- CLOCK ---
+    def sync_clock(self):
+        """Measures how far the share's clock is from ours."""
+        probe = os.path.join(self.dir, "tmp", f"clock-{uuid.uuid4().hex[:8]}")
+        before = time.time()
+        with open(probe, "w"):
+            pass
+        try:
+            self.clock_offset = os.stat(probe).st_mtime - before
+        finally:
+            os.remove(probe)
+
+    def age(self, path):
+        """Seconds since path was last touched, by the share's clock (None if it is gone)."""
+        try:
+            return time.time() + self.clock_offset - os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    # --- HEARTBEAT ---
+    def start(self):
+        self.sync_clock()
+        self.thread = threading.Thread(target=self.heartbeat, name="spool-heartbeat", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def heartbeat(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            with self.lock:
+                leases = list(self.leases.values())
+                published = list(self.published)
+            for lease in leases:
+                if lease.held():
+                    self.touch(lease.path)
+                    continue
+                lease.lost = True
+                self.drop_lease(lease)
+                self.log(f"Spool: lost the claim on job {lease.job_id} to another station")
+                if lease.on_lost:
+                    lease.on_lost()
+            for job_id in published:
+                self.touch(self.job_path(job_id))
+
+    @staticmethod
+    def touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def drop_lease(self, lease):
+        with self.lock:
+            if self.leases.get(lease.job_id) is lease:
+                del self.leases[lease.job_id]
+
+    # --- PUBLISHING SIDE ---
+    @staticmethod
+    def job_id(argv):
+        """Same command, same id: a restarted conversion finds the jobs (and results) it published before."""
+        return hashlib.sha1(json.dumps(argv).encode()).hexdigest()[:20]
+
+    def publish(self, argv, outputs, label, root=None, weight_bytes=0, duration=0):
+        """
+        Offers one ffmpeg run to the other stations. outputs are the .part files the command
+        writes (workers encode to a private name and move it there when done); root is this
+        station's archive root, which workers swap for their own.
+        """
+        job_id = self.job_id(argv)
+        path = self.job_path(job_id)
+        if os.path.exists(path):
+            self.touch(path)
+        else:
+            self.write_atomic(path, {'argv': argv, 'outputs': outputs, 'label': label, 'root': root,
+                                     'bytes': weight_bytes, 'duration': duration, 'publisher': self.owner})
+        with self.lock:
+            self.published.add(job_id)
+        return job_id
+
+    def result(self, job_id):
+        return self.read_json(self.result_path(job_id))
+
+    def retry(self, job_id):
+        """Clears a failed result so the job can be claimed again."""
+        try:
+            os.remove(self.result_path(job_id))
+        except OSError:
+            pass
+
+    def remove(self, job_id):
+        """Job done and gathered (or withdrawn): nothing of it stays in the spool."""
+        with self.lock:
+            self.published.discard(job_id)
+        for path in (self.job_path(job_id), self.result_path(job_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def withdraw(self):
+        """Takes back every published job no one is running (conversion stopped or finished)."""
+        with self.lock:
+            job_ids = list(self.published)
+        for job_id in job_ids:
+            if not os.path.exists(self.claim_path(job_id)):
+                self.remove(job_id)
+
+    # --- CLAIMING ---
+    def claim(self, job_id):
+        """Returns a Lease if we now own the job, None if someone else does (or it is finished)."""
+        if os.path.exists(self.result_path(job_id)):
+            return None
+        path = self.claim_path(job_id)
+        token = uuid.uuid4().hex
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self.break_stale(path):
+                    return None
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({'token': token, 'owner': self.owner}, f)
+            lease = Lease(self, job_id, token)
+            with self.lock:
+                self.leases[job_id] = lease
+            return lease
+        return None
+
+    def break_stale(self, path):
+        """Clears a claim whose lease ran out. True if the claim file is out of the way."""
+        age = self.age(path)
+        if age is None:
+            return True
+        if age < self.lease_seconds:
+            return False
+        stale = f"{path}.stale-{uuid.uuid4().hex[:8]}"
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return True # another station broke it first
+        # Someone may have broken and re-claimed it between our stat and rename: give a fresh claim back
+        if (self.age(stale) or 0) < self.lease_seconds:
+            try:
+                os.link(stale, path)
+            except OSError:
+                pass
+            os.remove(stale)
+            return False
+        owner = (self.read_json(stale) or {}).get('owner', "unknown")
+        os.remove(stale)
+        self.log(f"Spool: claim of {owner} on {os.path.basename(path)} expired, job back in the pool")
+        return True
+
+    def claim_next(self):
+        """Claims the oldest open job. Returns (lease, job) or None."""
+        jobs = []
+        for name in os.listdir(os.path.join(self.dir, "jobs")):
+            job_id, ext = os.path.splitext(name)
+            if ext == ".json":
+                try:
+                    jobs.append((os.stat(os.path.join(self.dir, "jobs", name)).st_ctime, job_id))
+                except OSError:
+                    continue
+        for _, job_id in sorted(jobs):
+            lease = self.claim(job_id)
+            if lease is None:
+                continue
+            job = self.read_json(self.job_path(job_id))
+            if job is None:
+                lease.release() # withdrawn in the meantime
+                continue
+            return lease, job
+        return None
+
+    def post_result(self, lease, ok, error=None):
+        """Records the outcome and gives up the claim. Nothing is written if the lease was lost."""
+        if not lease.held():
+            lease.release()
+            return False
+        self.write_atomic(self.result_path(lease.job_id), {'ok': ok, 'error': error, 'owner': self.owner})
+        lease.release()
+        return True
+
+    # --- HOUSEKEEPING ---
+    def sweep(self):
+        """Clears out jobs whose publisher is gone, with their results and leftover claims."""
+        self.sync_clock()
+        limit = self.lease_seconds * self.ABANDON_LEASES
+        with self.lock:
+            ours = set(self.published)
+        for name in os.listdir(os.path.join(self.dir, "jobs")):
+            job_id = os.path.splitext(name)[0]
+            age = self.age(self.job_path(job_id))
+            if job_id in ours or age is None or age < limit:
+                continue
+            claim_age = self.age(self.claim_path(job_id))
+            if claim_age is not None and claim_age < self.lease_seconds:
+                continue # still being worked on
+            self.log(f"Spool: removing abandoned job {job_id}")
+            for path in (self.job_path(job_id), self.result_path(job_id), self.claim_path(job_id)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class SpoolWorker:
+    """
+    Runs encodes published by other stations: claims jobs, runs ffmpeg under the resource
+    governor (so a recording here still has priority) and posts the result. The .part files
+    are left for the publishing station, which commits them into its manifest.
+    """
+    def __init__(self, spool, config=None, max_jobs=1, log=print):
+        self.spool = spool
+        self.config = config
+        self.max_jobs = max(1, int(max_jobs or 1))
+        self.log = log
+        self.local_root = config.get("root_archive_path") if config else None
+        self.is_running = True
+        self.procs = {}
+
+    def stop(self):
+        self.is_running = False
+
+    def localize(self, job):
+        """The job's argv with the publisher's archive root swapped for ours."""
+        argv = list(job['argv'])
+        root = job.get('root')
+        if root and self.local_root and os.path.normpath(root) != os.path.normpath(self.local_root):
+            old, new = os.path.normpath(root) + os.sep, os.path.normpath(self.local_root) + os.sep
+            argv = [arg.replace(old, new) for arg in argv]
+            outputs = [path.replace(old, new) for path in job['outputs']]
+        else:
+            outputs = list(job['outputs'])
+        return argv, outputs
+
+    def execute(self, lease, job):
+        argv, outputs = self.localize(job)
+        try:
+            check_command(argv, outputs, self.local_root)
+        except ValueError as e:
+            self.log(f"Spool: refusing job {lease.job_id} from {job.get('publisher')}: {e}")
+            self.spool.post_result(lease, False, f"refused by {self.spool.owner}: {e}")
+            return
+        argv = [tools.command("ffmpeg", self.config)] + argv[1:]
+        attempts = {part: attempt_path(part) for part in outputs}
+        argv = [attempts.get(arg, arg) for arg in argv]
+        self.log(f"Spool: encoding {job.get('label')} for {job.get('publisher')}")
+
+        ok, error = False, None
+        if not self.governor.acquire(lambda: self.is_running):
+            lease.release() # stopped while waiting for a slot: someone else can have it
+            return
+        proc = None
+        try:
+            proc = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            self.governor.register(proc.pid)
+            lease.on_lost = proc.terminate
+            _, stderr = proc.communicate()
+            if proc.returncode == 0:
+                ok = True
+            else:
+                error = (stderr or "").strip()[-500:] or f"ffmpeg exited with {proc.returncode}"
+        except OSError as e:
+            error = str(e)
+        finally:
+            if proc:
+                self.governor.unregister(proc.pid)
+            self.governor.release()
+
+        if ok and lease.held():
+            for part, attempt in attempts.items():
+                os.replace(attempt, part)
+        else:
+            for attempt in attempts.values():
+                try:
+                    os.remove(attempt)
+                except OSError:
+                    pass
+        if self.spool.post_result(lease, ok, error):
+            self.log(f"Spool: {job.get('label')} {'done' if ok else 'FAILED: ' + error}")
+
+    def run(self, should_continue=None):
+        """Blocks until stop() (or should_continue() is False)."""
+        should_continue = should_continue or (lambda: True)
+        alive = lambda: self.is_running and should_continue()
+        self.governor = ResourceGovernor(self.config, self.max_jobs, self.log).start()
+        self.spool.start()
+        threads = []
+        last_sweep = 0
+        try:
+            while alive():
+                threads = [t for t in threads if t.is_alive()]
+                if time.time() - last_sweep >= self.spool.lease_seconds:
+                    self.spool.sweep()
+                    last_sweep = time.time()
+                claimed = self.spool.claim_next() if len(threads) < self.max_jobs else None
+                if claimed is None:
+                    time.sleep(self.spool.POLL_INTERVAL)
+                    continue
+                t = threading.Thread(target=self.execute, args=claimed, daemon=True)
+                t.start()
+                threads.append(t)
+        finally:
+            # Running encodes finish and report; nothing new is claimed
+            for t in threads:
+                t.join()
+            self.spool.stop()
+            self.governor.stop()
@@ -0,0 +1,64 @@
+# core/tools.py
+# Where the external programs and the FireWire device nodes are. Everything that shells out
+# (dvgrab, dvcont, mpv, ffmpeg, lsmod, groups) or probes /dev/fw* asks here, so a test box
+# can point the app at stand-ins (benchmarks/fakehw.py) instead of a camera.
+#
+# Each setting comes from the config if set there, else from the environment, else the default:
+#     tool_dir         RETROREEL_TOOL_DIR          folder searched before PATH
+#     device_root      RETROREEL_DEVICE_ROOT       /dev
+#     firewire_sysfs   RETROREEL_FIREWIRE_SYSFS    /sys/bus/firewire/devices
+import os
+import glob
+import shlex
+import shutil
+
+from core import firewire
+
+ENVIRONMENT = {
+    'tool_dir': "RETROREEL_TOOL_DIR",
+    'device_root': "RETROREEL_DEVICE_ROOT",
+    'firewire_sysfs': "RETROREEL_FIREWIRE_SYSFS",
+}
+DEFAULTS = {'tool_dir': "", 'device_root': "/dev", 'firewire_sysfs': firewire.SYSFS_DEVICES}
+
+
+def setting(key, config=None):
+    value = config.get(key) if config else None
+    return value or os.environ.get(ENVIRONMENT[key]) or DEFAULTS[key]
+
+
+def which(name, config=None):
+    """Full path of a program (tool_dir first, then PATH), or None if it isn't installed."""
+    tool_dir = setting('tool_dir', config)
+    if tool_dir:
+        path = os.path.join(tool_dir, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return shutil.which(name)
+
+
+def command(name, config=None):
+    """argv[0] for a program: the resolved path, or the bare name (so a missing tool fails as before)."""
+    return which(name, config) or name
+
+
+def shell_command(name, config=None):
+    """command() quoted for a shell command line."""
+    return shlex.quote(command(name, config))
+
+
+def device_root(config=None):
+    return setting('device_root', config)
+
+
+def sysfs_root(config=None):
+    return setting('firewire_sysfs', config)
+
+
+def fw_devices(config=None):
+    """FireWire character devices (fw0, fw1, ...) under the device root."""
+    return sorted(glob.glob(os.path.join(device_root(config), "fw*")))
+
+
+def list_decks(config=None):
+    return firewire.list_decks(sysfs_root(config), device_root(config))
@@ -1,14 +1,40 @@
 # core/workers.py
-import shutil
 import subprocess
 import os
-import re 
-import datetime
 import glob
-import time
-import hashlib
+import sqlite3
+import select
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
 
+from core import firewire, inotify, tools
+from core.catalog import ArchiveCatalog
+from core.converter import TapeConverter
+from core.ingest import IngestQueue, ArchiveWatcher
+from core.spool import EncodeSpool, SpoolWorker
+
+class WakePipe:
+    """
+    Self-pipe another thread uses to wake a worker out of select(). The worker closes it
+    when run() ends; a wake() after that (e.g. a stop from a Qt slot) does nothing instead
+    of writing to a closed, or by now reused, descriptor.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.r, self.w = os.pipe()
+
+    def wake(self):
+        with self.lock:
+            if self.w >= 0:
+                os.write(self.w, b"x")
+
+    def close(self):
+        with self.lock:
+            for fd in (self.r, self.w):
+                if fd >= 0:
+                    os.close(fd)
+            self.r = self.w = -1
+
 # --- DIAGNOSTICS WORKER ---
 class DiagnosticWorker(QThread):
     status_update = pyqtSignal(str)
@@ -26,9 +52,10 @@ class DiagnosticWorker(QThread):
         'software': ['dvgrab', 'dvcont', 'ffmpeg', 'mpv', 'ffprobe']
     }
 
-    def __init__(self, mode='all'):
+    def __init__(self, mode='all', config=None):
         super().__init__()
         self.mode = mode
+        self.config = config
 
     def run(self):
         missing_items = []
@@ -38,15 +65,15 @@ class DiagnosticWorker(QThread):
             self.status_update.emit(f"Checking: {item}...")
             found = False
             if item == 'firewire_ohci (Driver)':
-                res = subprocess.run(['lsmod'], capture_output=True, text=True)
+                res = subprocess.run([tools.command('lsmod', self.config)], capture_output=True, text=True)
                 found = 'firewire_ohci' in res.stdout
             elif item == 'video_group_permission':
-                res = subprocess.run(['groups'], capture_output=True, text=True)
+                res = subprocess.run([tools.command('groups', self.config)], capture_output=True, text=True)
                 found = 'video' in res.stdout
             elif item == 'FireWire Hardware':
-                found = len(glob.glob('/dev/fw*')) > 0
+                found = len(tools.fw_devices(self.config)) > 0
             else:
-                found = shutil.which(item) is not None
+                found = tools.which(item, self.config) is not None
             
             if not found: missing_items.append(item)
             self.progress_update.emit(int(((i + 1) / len(to_check)) * 100))
@@ -55,161 +82,114 @@ class DiagnosticWorker(QThread):
 
 # --- CONVERTER WORKER ---
 class ConverterWorker(QThread):
+    """Runs a TapeConverter (core/converter.py) off the UI thread and relays its progress as signals."""
     log_message = pyqtSignal(str)
     progress_update = pyqtSignal(int)
+    job_progress = pyqtSignal(str, int)          # job label, percent
+    throughput_update = pyqtSignal(float, int)   # combined encode fps, ETA seconds (-1 = unknown)
     finished = pyqtSignal(bool)
 
-    def __init__(self, root_dir):
+    def __init__(self, root_dir, config=None):
         super().__init__()
-        self.root_dir = root_dir.rstrip(os.sep) 
-        self.is_running = True
-        self.start_time = None
-
-    def generate_checksum(self, filename):
-        hash_md5 = hashlib.md5()
-        with open(filename, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-
-    def extract_file_info(self, filename):
-        # Extract customer info and date-group from filename
-        pattern = r"(.+)-(\d{4}\.\d{2}\.\d{2}_\d{2}-\d{2}-\d{2})\.dv"
-        match = re.search(pattern, filename)
-        if match:
-            group_base = match.group(1) # e.g., quivey_lara_mdv_t01
-            raw_ts = match.group(2)
-            dt_object = datetime.datetime.strptime(raw_ts, "%Y.%m.%d_%H-%M-%S")
-            iso_ts = raw_ts.replace(".", "-").replace("_", "T").replace("-", ":", 2)
-            return group_base, dt_object, iso_ts
-        return os.path.splitext(filename)[0], None, None
-
-    def run(self):
-        self.start_time = time.time()
-        
-        # --- PATH MAPPING ---
-        tape_dv_folder = os.path.basename(self.root_dir)
-        dv_format_dir = os.path.dirname(self.root_dir)
-        client_dir = os.path.dirname(dv_format_dir)
-        
-        # Customer Name and Format for Report
-        customer_name = os.path.basename(client_dir)
-        media_format = os.path.basename(os.path.dirname(os.path.dirname(client_dir)))
-
-        # Pivot to mp4_format
-        mp4_tape_name = tape_dv_folder.replace("_dv-", "_mp4-") if "_dv-" in tape_dv_folder else f"{tape_dv_folder}_mp4"
-        dest_base = os.path.join(client_dir, "mp4_format", mp4_tape_name)
-
-        dv_files = sorted([os.path.join(self.root_dir, f) for f in os.listdir(self.root_dir) if f.lower().endswith(".dv")])
-        if not dv_files:
-            self.log_message.emit("ERROR: No .dv files found.")
-            return
+        self.converter = TapeConverter(root_dir, config,
+                                       log=self.log_message.emit,
+                                       progress=self.progress_update.emit,
+                                       job_progress=self.job_progress.emit,
+                                       throughput=self.throughput_update.emit)
 
-        files_by_group = {}
-        stats = {"converted": 0, "skipped": 0}
+    def stop(self):
+        self.converter.stop()
 
-        MAX_GAP = datetime.timedelta(hours=2)
-        current_group_name = None
-        last_dt = None
-
-        # 1. CONVERSION
-        for i, input_path in enumerate(dv_files):
-            if not self.is_running: break
-            
-            filename_raw = os.path.basename(input_path)
-            tape_prefix, dt_object, iso_metadata = self.extract_file_info(filename_raw)
-
-            if dt_object:
-                if last_dt is None or (dt_object - last_dt) > MAX_GAP:
-                    date_str = dt_object.strftime("%Y-%m-%d")
-                    current_group_name = f"{tape_prefix}-{date_str}"
-
-                last_dt = dt_object
-            else:
-                current_group_name = tape_prefix
-            
-            output_dir = os.path.join(dest_base, current_group_name)
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, os.path.splitext(filename_raw)[0] + ".mp4")
-
-            if current_group_name not in files_by_group: files_by_group[current_group_name] = []
-            files_by_group[current_group_name].append({'path': output_path, 'meta': iso_metadata, 'orig': filename_raw})
-
-            if os.path.exists(output_path):
-                self.log_message.emit(f"Skipping: {filename_raw}")
-                stats["skipped"] += 1
-            else:
-                self.log_message.emit(f"Converting ({i+1}/{len(dv_files)}): {filename_raw}")
-                cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", input_path, 
-                       "-c:v", "libx264", "-crf", "20", "-preset", "medium", "-vf", "yadif,format=yuv420p",
-                       "-c:a", "aac", "-b:a", "192k", "-movflags", "+faststart"]
-                if iso_metadata: cmd += ["-metadata", f"creation_time={iso_metadata}"]
-                cmd.append(output_path)
-                subprocess.run(cmd, check=True)
-                stats["converted"] += 1
-            
-            self.progress_update.emit(int(((i + 1) / len(dv_files)) * 80))
-
-        # 2. STITCHING & DETAILED REPORT
-        if self.is_running:
-            # Report name format: quivey_lara_mdv_t01_transfer_report.txt
-            report_filename = f"{tape_dv_folder}_transfer_report.txt"
-            report_path = os.path.join(dest_base, report_filename)
-            
-            total_duration = str(datetime.timedelta(seconds=int(time.time() - self.start_time)))
-
-            with open(report_path, "w") as report:
-                report.write("==========================================\n")
-                report.write("      RETROREEL DIGITIZATION REPORT       \n")
-                report.write("==========================================\n\n")
-                report.write(f"CUSTOMER: {customer_name.replace('_', ' ').title()}\n")
-                report.write(f"FORMAT:   {media_format.upper()}\n")
-                report.write(f"TAPE ID:  {tape_dv_folder}\n")
-                report.write(f"DATE:     {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-                report.write(f"DURATION: {total_duration} (H:M:S)\n\n")
-                report.write(f"STATS: {stats['converted']} Converted, {stats['skipped']} Skipped\n")
-                report.write("-" * 42 + "\n\n")
-                
-                for current_group_name in sorted(files_by_group.keys()):
-                    merged_path = os.path.join(dest_base, f"{current_group_name}.mp4")
-                    
-                    if not os.path.exists(merged_path):
-                        entries = files_by_group[current_group_name]
-                        if len(entries) > 1:
-                            list_txt = os.path.join(dest_base, "list.txt")
-                            with open(list_txt, "w") as f:
-                                for e in entries: f.write(f"file '{e['path']}'\n")
-                            subprocess.run(["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_txt, "-c", "copy", "-y", merged_path], check=True)
-                            os.remove(list_txt)
-                        else:
-                            shutil.copy2(entries[0]['path'], merged_path)
-
-                    report.write(f"OUTPUT FILE: {current_group_name}.mp4\n")
-                    report.write(f"  - MD5 Hash: {self.generate_checksum(merged_path)}\n")
-                    report.write(f"  - Clips Combined: {len(files_by_group[current_group_name])}\n")
-                    report.write("-" * 20 + "\n")
-
-            self.log_message.emit(f"SUCCESS: Report saved as {report_filename}")
-        
-        self.progress_update.emit(100)
-        self.finished.emit(True)
+    def run(self):
+        try:
+            ok = self.converter.run()
+        except Exception as e:
+            # Still report back, or the conversion queue would wait on us forever
+            self.log_message.emit(f"ERROR: {e}")
+            ok = False
+        self.finished.emit(bool(ok))
 
 # --- MONITOR & INSTALLER ---
 class ConnectionMonitorWorker(QThread):
+    """
+    Watches the device directory for fw* nodes coming and going (inotify), so camera
+    plug/unplug shows up immediately. A slow re-check still runs as a safety net, and
+    without inotify it falls back to the old 1 second polling.
+    Each deck is identified by its GUID (from sysfs), so several can be told apart.
+    device_root / sysfs_root can point at fake directories for testing (by default they come
+    from the config / environment, see core/tools.py).
+    """
     status_update = pyqtSignal(str)
-    def __init__(self):
+    decks_changed = pyqtSignal(list) # deck dicts from firewire.list_decks()
+    POLL_INTERVAL = 1.0       # seconds, when inotify is unavailable
+    FALLBACK_INTERVAL = 10.0  # seconds, re-check even with inotify (missed events, remounted /dev)
+
+    def __init__(self, device_root=None, sysfs_root=None, config=None):
         super().__init__()
+        self.device_root = device_root or tools.device_root(config)
+        self.sysfs_root = sysfs_root or tools.sysfs_root(config)
         self.is_running = True
-    def stop(self): self.is_running = False
+        # Self-pipe so stop() can wake the select() immediately
+        self.wake = WakePipe()
+
+    def stop(self):
+        self.is_running = False
+        self.wake.wake()
+
+    def current_state(self):
+        """(state, decks). Without sysfs we can only count nodes: one is the card, more means a camera."""
+        decks = firewire.list_decks(self.sysfs_root, self.device_root)
+        devices = glob.glob(os.path.join(self.device_root, 'fw*'))
+        if decks is None:
+            return ("CONNECTED" if len(devices) > 1 else "STANDBY" if len(devices) == 1 else "NO_CARD"), []
+        if decks:
+            return f"CONNECTED ({len(decks)} deck{'s' if len(decks) > 1 else ''})", decks
+        return ("STANDBY" if devices else "NO_CARD"), []
+
+    def open_watch(self):
+        try:
+            watch = inotify.Inotify()
+        except OSError:
+            return None
+        try:
+            watch.add_watch(self.device_root)
+        except OSError:
+            watch.close()
+            return None
+        return watch
+
     def run(self):
-        last_state = None
-        while self.is_running:
-            devices = glob.glob('/dev/fw*')
-            state = "CONNECTED" if len(devices) > 1 else "STANDBY" if len(devices) == 1 else "NO_CARD"
-            if state != last_state:
-                self.status_update.emit(f"Status: {state}")
-                last_state = state
-            time.sleep(1)
+        last_state = last_decks = None
+        watch = self.open_watch()
+        try:
+            while self.is_running:
+                state, decks = self.current_state()
+                if state != last_state:
+                    self.status_update.emit(f"Status: {state}")
+                    last_state = state
+                if decks != last_decks:
+                    self.decks_changed.emit(decks)
+                    last_decks = decks
+
+                fds = [self.wake.r] + ([watch] if watch else [])
+                timeout = self.FALLBACK_INTERVAL if watch else self.POLL_INTERVAL
+                # Wait for a fw* node to change (or the fallback timeout / stop)
+                while self.is_running:
+                    readable, _, _ = select.select(fds, [], [], timeout)
+                    if not readable or not watch or watch not in readable:
+                        break
+                    events = watch.read_events()
+                    if any(mask & (inotify.IN_Q_OVERFLOW | inotify.IN_IGNORED) for _, mask, _ in events):
+                        # Queue overflowed or /dev went away: re-arm the watch
+                        watch.close()
+                        watch = self.open_watch()
+                        break
+                    if any(name.startswith("fw") for _, _, name in events):
+                        break
+        finally:
+            if watch:
+                watch.close()
+            self.wake.close()
 
 class InstallerWorker(QThread):
     finished = pyqtSignal(bool, str)
@@ -226,25 +206,190 @@ class InstallerWorker(QThread):
 # --- NEW ADDITIONS (MOVED FROM CAPTURE TAB) ---
 
 class RecordingWatchdog(QThread):
-    """Monitors the recording process. Emits crash_detected if it dies."""
-    crash_detected = pyqtSignal()
-    
-    def __init__(self, process):
+    """
+    Supervises every stage of a capture Pipeline. Waits on one pidfd per process, so a
+    dying stage is reported the moment it exits, with its name and exit status.
+    """
+    crash_detected = pyqtSignal(str, int)  # stage name, exit status (negative = killed by that signal)
+    stage_exited = pyqtSignal(str, int)    # a non-critical stage (e.g. the preview) went away
+    POLL_INTERVAL = 0.1 # seconds, only used where pidfds aren't available
+
+    def __init__(self, pipeline):
         super().__init__()
-        self.process = process
+        self.pipeline = pipeline
         self.is_active = True
-        
+        self.wake = WakePipe()
+
+    def open_pidfds(self):
+        pidfds = {}
+        try:
+            for st, proc in self.pipeline.members():
+                pidfds[os.pidfd_open(proc.pid)] = (st, proc)
+        except (AttributeError, OSError):
+            # Old kernel / Python < 3.9: fall back to polling
+            for fd in pidfds:
+                os.close(fd)
+            return None
+        return pidfds
+
+    def report(self, st, proc, code):
+        """Returns True if supervision should stop."""
+        if not self.is_active:
+            return True
+        if proc in getattr(self.pipeline, "retired", ()):
+            return False # Stopped on purpose (e.g. preview restarted with another policy)
+        if st['critical']:
+            self.crash_detected.emit(st['name'], code)
+            return True
+        self.stage_exited.emit(st['name'], code)
+        return False
+
     def run(self):
-        while self.is_active:
-            # If the process stops running (returns a code), emit crash signal
-            if self.process.poll() is not None:
-                if self.is_active: 
-                    self.crash_detected.emit()
+        pidfds = self.open_pidfds()
+        try:
+            if pidfds is None:
+                self.poll_members()
                 return
-            self.msleep(500)
-            
+            while self.is_active and pidfds:
+                readable, _, _ = select.select(list(pidfds) + [self.wake.r], [], [])
+                for fd in readable:
+                    if fd == self.wake.r:
+                        return
+                    st, proc = pidfds.pop(fd)
+                    os.close(fd)
+                    if self.report(st, proc, proc.wait()):
+                        return
+        finally:
+            for fd in pidfds or []:
+                os.close(fd)
+            self.wake.close()
+
+    def poll_members(self):
+        running = self.pipeline.members()
+        while self.is_active and running:
+            for st, proc in list(running):
+                code = proc.poll()
+                if code is not None:
+                    running.remove((st, proc))
+                    if self.report(st, proc, code):
+                        return
+            select.select([self.wake.r], [], [], self.POLL_INTERVAL)
+
     def stop_monitoring(self):
         self.is_active = False
+        self.wake.wake()
+
+class SceneSplitWorker(QThread):
+    """Native replacement for AutosplitWorker: byte-range scene extraction via the frame index."""
+    status_update = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, master_file, manager):
+        super().__init__()
+        self.master_file = master_file
+        self.manager = manager
+        self.is_running = True
+
+    def run(self):
+        self.status_update.emit("Indexing master file...")
+        try:
+            self.manager.split_master(
+                self.master_file,
+                progress=lambda n, total, name: self.status_update.emit(f"Scene {n}/{total}: {name}"),
+                should_continue=lambda: self.is_running)
+        except (OSError, ValueError) as e:
+            self.status_update.emit(f"Split error: {e}")
+        self.finished.emit()
+
+    def cancel(self):
+        self.is_running = False
+
+class CatalogRescanWorker(QThread):
+    """Brings the archive catalog up to date in the background (only changed clients are re-walked)."""
+    status_update = pyqtSignal(str)
+    finished = pyqtSignal(bool)
+
+    def __init__(self, root_path, full=False):
+        super().__init__()
+        self.root_path = root_path
+        self.full = full
+        self.is_running = True
+
+    def run(self):
+        try:
+            done = ArchiveCatalog(self.root_path).rescan(
+                full=self.full,
+                progress=lambda n, total: self.status_update.emit(f"Indexed {n}/{total} clients"),
+                should_continue=lambda: self.is_running)
+        except (OSError, sqlite3.Error) as e:
+            self.status_update.emit(f"Catalog error: {e}")
+            done = False
+        self.finished.emit(done)
+
+    def cancel(self):
+        self.is_running = False
+
+class IngestWatchWorker(QThread):
+    """
+    Runs the ArchiveWatcher over the archive root: tape folders that finished capturing
+    (here or on another station) land in the persistent conversion queue.
+    """
+    queue_changed = pyqtSignal()
+    status_update = pyqtSignal(str)
+
+    def __init__(self, root_path, settle_seconds=120):
+        super().__init__()
+        self.root_path = root_path
+        self.settle_seconds = settle_seconds
+        self.is_running = True
+        self.wake = WakePipe()
+
+    def stop(self):
+        self.is_running = False
+        self.wake.wake()
+
+    def run(self):
+        try:
+            try:
+                queue = IngestQueue()
+                # Tapes left "running" by a crashed session go back in line
+                if queue.recover():
+                    self.queue_changed.emit()
+            except (OSError, sqlite3.Error) as e:
+                self.status_update.emit(f"Ingest queue unavailable: {e}")
+                return
+            # Turning the watch on must not queue the whole existing archive
+            watcher = ArchiveWatcher([self.root_path], queue, self.settle_seconds, log=self.status_update.emit,
+                                     on_queued=lambda path: self.queue_changed.emit(), seed_existing=True)
+            watcher.run(lambda: self.is_running, self.wake.r)
+        finally:
+            self.wake.close()
+
+class SpoolWorkerThread(QThread):
+    """Lets this station encode jobs other stations put in the shared spool (core/spool.py)."""
+    status_update = pyqtSignal(str)
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.worker = None
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+        if self.worker:
+            self.worker.stop()
+
+    def run(self):
+        try:
+            spool = EncodeSpool(self.config.get("spool_dir"), self.config.get("spool_lease_seconds"),
+                                log=self.status_update.emit)
+        except OSError as e:
+            self.status_update.emit(f"Spool unavailable: {e}")
+            return
+        self.worker = SpoolWorker(spool, self.config, TapeConverter.resolve_job_count(self.config.get("converter_max_jobs")),
+                                  log=self.status_update.emit)
+        self.worker.run(lambda: self.is_running)
 
 class AutosplitWorker(QThread):
     """Handles the blocking dvgrab autosplit process."""
@@ -6,8 +6,8 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QTabWidget, QMessageBox)
 
 # --- IMPORT MODULES ---
 from core.config_manager import ConfigManager 
-from core.workers import DiagnosticWorker 
-from tabs.capture_tab import CaptureDeck
+from core.workers import DiagnosticWorker, CatalogRescanWorker, IngestWatchWorker, SpoolWorkerThread
+from tabs.capture_tab import CaptureBench
 from tabs.converter_tab import ConverterTab
 from tabs.diagnostics_tab import DiagnosticsTab
 from tabs.info_tabs import WelcomeTab, HelpTab, FeedbackTab
@@ -40,8 +40,8 @@ class RetroReelApp(QMainWindow):
 
         # Build Tabs
         self.welcome_tab = WelcomeTab()
-        self.diag_tab = DiagnosticsTab()
-        self.capture_tab = CaptureDeck(self.cfg) 
+        self.diag_tab = DiagnosticsTab(self.cfg)
+        self.capture_tab = CaptureBench(self.cfg) 
         self.converter_tab = ConverterTab(self.cfg) 
         self.help_tab = HelpTab(self) 
         self.feedback_tab = FeedbackTab()
@@ -56,6 +56,7 @@ class RetroReelApp(QMainWindow):
         # --- CONNECTIONS ---
         self.diag_tab.checks_finished.connect(self.handle_diagnostic_results)
         self.diag_tab.camera_online.connect(self.handle_camera_status)
+        self.diag_tab.decks_changed.connect(self.capture_tab.update_decks)
         
         # NEW: Connect Capture Tab finish signal to the Auto-Switcher
         self.capture_tab.session_finished.connect(self.on_capture_session_finished)
@@ -63,6 +64,26 @@ class RetroReelApp(QMainWindow):
         self.update_tab_locks()
         self.diag_tab.run_diagnostics('all')
 
+        # Pick up archive changes made outside the app (only changed clients are re-walked)
+        self.catalog_worker = CatalogRescanWorker(self.cfg.get("root_archive_path"))
+        self.catalog_worker.start()
+
+        # Tapes finished anywhere in the archive (other capture stations too) queue up for conversion
+        self.ingest_worker = None
+        if self.cfg.get("ingest_watch"):
+            self.ingest_worker = IngestWatchWorker(self.cfg.get("root_archive_path"),
+                                                   float(self.cfg.get("ingest_settle_seconds") or 120))
+            self.ingest_worker.queue_changed.connect(self.on_ingest_queue_changed)
+            self.ingest_worker.status_update.connect(print)
+            self.ingest_worker.start()
+
+        # Spare encode capacity for conversions running on other stations
+        self.spool_worker = None
+        if self.cfg.get("spool_worker") and self.cfg.get("spool_dir"):
+            self.spool_worker = SpoolWorkerThread(self.cfg)
+            self.spool_worker.status_update.connect(print)
+            self.spool_worker.start()
+
         if self.cfg.get("show_startup_tutorial"):
             QTimer.singleShot(2000, self.launch_active_tour)
 
@@ -109,6 +130,12 @@ class RetroReelApp(QMainWindow):
         self.software_ok = not any(item in missing_items for item in cat['converter'])
         
         self.update_tab_locks()
+        # Anything queued while we were closed can start now
+        self.on_ingest_queue_changed()
+
+    def on_ingest_queue_changed(self):
+        if self.software_ok:
+            self.converter_tab.drain()
 
     def handle_camera_status(self, is_connected):
         # Called by the Live Monitor in the Diagnostics tab
@@ -0,0 +1,228 @@
+# retroreel/__main__.py
+# Headless entry point (no Qt needed):
+#
+#     python -m retroreel convert TAPE_DIR [TAPE_DIR ...]
+#     python -m retroreel daemon ROOT [ROOT ...]
+#     python -m retroreel worker [SPOOL_DIR]
+#
+# convert and daemon run the same TapeConverter as the GUI; worker encodes jobs other
+# stations put in the shared spool. Progress goes to stdout as plain text,
+# or with --json as one JSON object per line.
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+
+from core.config_manager import ConfigManager
+from core.converter import TapeConverter
+from core.ingest import IngestQueue, ArchiveWatcher
+from core.spool import EncodeSpool, SpoolWorker
+
+
+class Reporter:
+    """Turns converter callbacks into stdout lines. Callbacks arrive from encode threads, hence the lock."""
+    def __init__(self, json_mode, stream=sys.stdout):
+        self.json_mode = json_mode
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.tape = None
+        self.last_percent = None
+        self.fps, self.eta = 0.0, -1
+
+    def emit(self, event, **fields):
+        with self.lock:
+            if self.json_mode:
+                record = {'event': event, 'time': round(time.time(), 3), 'tape': self.tape, **fields}
+                self.stream.write(json.dumps(record) + "\n")
+            else:
+                text = self.format_text(event, fields)
+                if text is None:
+                    return
+                self.stream.write(text + "\n")
+            self.stream.flush()
+
+    def format_text(self, event, fields):
+        if event == "log":
+            return fields['message']
+        if event == "progress":
+            eta = time.strftime("%H:%M:%S", time.gmtime(self.eta)) if self.eta >= 0 else "--:--:--"
+            return f"[{fields['percent']:3d}%] {self.fps:.1f} fps, ETA {eta}"
+        if event == "tape_started":
+            return f"=== {self.tape} ==="
+        if event == "tape_finished":
+            return f"=== {self.tape}: {'done' if fields['ok'] else 'FAILED'} ==="
+        if event == "error":
+            return f"ERROR: {fields['message']}"
+        return None # job / throughput detail is JSON only
+
+    # --- CONVERTER CALLBACKS ---
+    def log(self, message):
+        self.emit("log", message=message)
+
+    def progress(self, percent):
+        # One line per percent, not per ffmpeg progress block
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.emit("progress", percent=percent)
+
+    def job_progress(self, label, percent):
+        if self.json_mode:
+            self.emit("job", label=label, percent=percent)
+
+    def throughput(self, fps, eta):
+        self.fps, self.eta = fps, eta
+        if self.json_mode:
+            self.emit("throughput", fps=round(fps, 1), eta=eta)
+
+
+def convert_tape(tape_dir, config, reporter, current):
+    """Converts one tape folder; returns True on success. current[0] holds the running converter for signal handlers."""
+    reporter.tape = os.path.abspath(tape_dir)
+    reporter.last_percent = None
+    reporter.emit("tape_started")
+    converter = TapeConverter(tape_dir, config, log=reporter.log, progress=reporter.progress,
+                              job_progress=reporter.job_progress, throughput=reporter.throughput)
+    current[0] = converter
+    try:
+        ok = bool(converter.run()) and converter.is_running
+    except Exception as e:
+        reporter.emit("error", message=str(e))
+        ok = False
+    finally:
+        current[0] = None
+    stats = getattr(converter, "stats", None) or {}
+    reporter.emit("tape_finished", ok=ok, dest=getattr(converter, "dest_base", None),
+                  converted=stats.get("converted", 0), skipped=stats.get("skipped", 0))
+    reporter.tape = None
+    return ok
+
+
+# --- DAEMON ---
+def run_daemon(roots, config, reporter, interval, settle, current, stopping):
+    """
+    Watches the roots for finished tape folders (ArchiveWatcher) and drains the persistent
+    conversion queue, the same one the GUI uses, so both can run side by side.
+    Already finished outputs are skipped by the manifest, so restarting the daemon is cheap.
+    """
+    queue = IngestQueue()
+    for path in queue.recover():
+        reporter.log(f"Re-queued after an interrupted run: {path}")
+
+    watcher = ArchiveWatcher(roots, queue, settle, log=reporter.log)
+    watcher.RESCAN_INTERVAL = watcher.POLL_INTERVAL = interval
+    thread = threading.Thread(target=watcher.run, args=(lambda: not stopping.is_set(),),
+                              name="archive-watcher", daemon=True)
+    thread.start()
+    reporter.log(f"Daemon watching {', '.join(roots)} (rescan every {interval}s, settle {settle}s)")
+
+    failed = 0
+    while not stopping.is_set():
+        tape_dir = queue.claim()
+        if tape_dir is None:
+            stopping.wait(ArchiveWatcher.TICK)
+            continue
+        ok = convert_tape(tape_dir, config, reporter, current)
+        if stopping.is_set() and not ok:
+            queue.release(tape_dir) # interrupted, not broken: next run picks it up again
+        else:
+            queue.finish(tape_dir, ok)
+            failed += not ok
+    thread.join()
+    return failed == 0
+
+
+def run_worker(spool_dir, config, reporter, stopping):
+    """Encodes spool jobs until stopped; running encodes finish and report first."""
+    spool = EncodeSpool(spool_dir, config.get("spool_lease_seconds"), reporter.log)
+    worker = SpoolWorker(spool, config, TapeConverter.resolve_job_count(config.get("converter_max_jobs")),
+                         reporter.log)
+    reporter.log(f"Worker taking encodes from {spool.dir} ({worker.max_jobs} at a time)")
+    worker.run(lambda: not stopping.is_set())
+    return True
+
+
+def parse_overrides(pairs):
+    """--set key=value; values are read as JSON where possible (numbers, booleans, lists)."""
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="one JSON object per line on stdout")
+    common.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a config setting for this run (e.g. converter_max_jobs=4)")
+
+    parser = argparse.ArgumentParser(prog="python -m retroreel", description="RetroReel headless conversion")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", parents=[common], help="convert tape folders and exit")
+    convert.add_argument("tapes", nargs="+", metavar="TAPE_DIR")
+
+    daemon = sub.add_parser("daemon", parents=[common], help="keep converting finished tape folders under the given roots")
+    daemon.add_argument("roots", nargs="+", metavar="ROOT")
+    daemon.add_argument("--interval", type=float, default=60, help="seconds between full rescans (default 60)")
+    daemon.add_argument("--settle", type=float, default=None,
+                        help="only queue tapes whose .dv files haven't changed for this long "
+                             "(default: ingest_settle_seconds from the config)")
+
+    worker = sub.add_parser("worker", parents=[common], help="encode jobs other stations put in the shared spool")
+    worker.add_argument("spool", nargs="?", metavar="SPOOL_DIR", help="default: spool_dir from the config")
+
+    args = parser.parse_args(argv)
+
+    config = ConfigManager()
+    # Overrides only live for this run; the GUI's saved settings stay as they are
+    config.settings.update(parse_overrides(args.set))
+    reporter = Reporter(args.json)
+
+    # First SIGINT/SIGTERM: let running encodes finish, start nothing new
+    current = [None]
+    stopping = threading.Event()
+
+    def request_stop(signum, frame):
+        # Only flags here: the handler can interrupt the main thread inside reporter.emit
+        stopping.set()
+        if current[0]:
+            current[0].stop()
+
+    def announce_stop():
+        stopping.wait()
+        reporter.emit("log", message="Stopping after the running encodes...")
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    threading.Thread(target=announce_stop, name="stop-notice", daemon=True).start()
+
+    if args.command == "convert":
+        ok = True
+        for tape_dir in args.tapes:
+            if stopping.is_set():
+                break
+            if not os.path.isdir(tape_dir):
+                reporter.emit("error", message=f"Not a folder: {tape_dir}")
+                ok = False
+                continue
+            ok = convert_tape(tape_dir, config, reporter, current) and ok
+        ok = ok and not stopping.is_set()
+    elif args.command == "worker":
+        spool_dir = args.spool or config.get("spool_dir")
+        if not spool_dir:
+            parser.error("no SPOOL_DIR given and spool_dir is not set in the config")
+        ok = run_worker(spool_dir, config, reporter, stopping)
+    else:
+        settle = args.settle if args.settle is not None else float(config.get("ingest_settle_seconds") or 120)
+        ok = run_daemon(args.roots, config, reporter, args.interval, settle, current, stopping)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,33 @@
 # capture_tab.py
 import os
-import signal
+import time
 import subprocess
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QPushButton, 
                              QHBoxLayout, QGridLayout, QFrame, QMessageBox,
-                             QInputDialog, QLineEdit, QProgressDialog)
-from PyQt6.QtCore import Qt, pyqtSignal
+                             QInputDialog, QLineEdit, QProgressDialog, QComboBox,
+                             QTabWidget)
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 
 # --- IMPORTS ---
 from components.session_dialog import SessionDialog
+from core import tools
 from core.capture_manager import CaptureManager
-from core.workers import RecordingWatchdog, AutosplitWorker
+from core.pipeline import Pipeline
+from core.workers import RecordingWatchdog, AutosplitWorker, SceneSplitWorker
 
 class CaptureDeck(QWidget):
     # Signal emits the folder path when a session is fully complete
     session_finished = pyqtSignal(str) 
 
-    def __init__(self, config):
+    # Seconds to wait for the live splitter to flush after dvgrab stops
+    SCENE_INDEX_TIMEOUT = 15
+
+    def __init__(self, config, deck=None, peers=None):
         super().__init__()
-        # Use the new Manager for logic
-        self.manager = CaptureManager(config)
+        # Use the new Manager for logic (bound to one deck's GUID when several are connected)
+        self.manager = CaptureManager(config, deck)
+        # Returns the other decks on the bench, for load checks and shared disk accounting
+        self.peers = peers or (lambda: [])
         
         self.preview_process = None
         self.watchdog = None 
@@ -45,6 +53,16 @@ class CaptureDeck(QWidget):
         self.info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.info_label)
 
+        # Live capture counters (disk writes, preview drops, buffer headroom)
+        self.stats_label = QLabel("")
+        self.stats_label.setStyleSheet("color: #888; font-size: 9pt;")
+        self.stats_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.stats_label)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_capture_stats)
+        self.last_sample = None
+        self.write_rate = None
+
         # 3. CONTROLS
         controls_layout = QHBoxLayout()
         tape_controls = QWidget()
@@ -67,6 +85,16 @@ class CaptureDeck(QWidget):
         
         controls_layout.addWidget(tape_controls)
         controls_layout.addWidget(self.btn_record)
+
+        # Preview cost while recording; can be changed mid-capture (only mpv restarts)
+        self.preview_combo = QComboBox()
+        for key, label in CaptureManager.PREVIEW_POLICIES.items():
+            self.preview_combo.addItem(label, key)
+        current = self.preview_combo.findData(self.manager.config.get("preview_policy"))
+        self.preview_combo.setCurrentIndex(max(0, current))
+        self.preview_combo.setToolTip("Lighter previews leave more CPU for the disk writer and conversions.")
+        self.preview_combo.currentIndexChanged.connect(self.on_preview_policy_changed)
+        controls_layout.addWidget(self.preview_combo)
         
         layout.addLayout(controls_layout)
 
@@ -77,6 +105,32 @@ class CaptureDeck(QWidget):
         self.btn_ff.clicked.connect(lambda: self.manager.run_tape_control("ff"))
         self.btn_record.clicked.connect(self.toggle_record)
 
+    def title(self):
+        deck = self.manager.deck
+        return f"{deck['name']} [{deck['bus']}]" if deck else "Camera"
+
+    def is_recording(self):
+        return self.btn_record.isChecked()
+
+    def is_busy(self):
+        """Recording, previewing or still splitting scenes: the tab must stay even if the deck vanishes."""
+        splitter = getattr(self, "splitter", None)
+        return self.is_recording() or self.preview_process is not None or bool(splitter and splitter.isRunning())
+
+    def recording_peers(self):
+        return [d for d in self.peers() if d is not self and d.is_recording()]
+
+    def load_sample(self):
+        """This deck's share of the bench load (see CaptureManager.check_capture_load)."""
+        st = self.preview_process.stats() if hasattr(self.preview_process, "stats") else None
+        if self.is_recording() and self.current_recording_path:
+            path = os.path.dirname(self.current_recording_path)
+        else:
+            path = self.manager.config.get("root_archive_path")
+        return {'name': self.title(), 'bus': self.manager.deck['bus'] if self.manager.deck else None,
+                'path': path, 'rate': self.write_rate,
+                'buffer': st['buffer_fill'] / st['buffer_capacity'] if st else None}
+
     def update_session_display(self, fname, lname, tape, fmt, manual_label):
         self.session_data = (fname, lname, tape, fmt, manual_label)
         display_text = f"Recording: {fname} {lname} | Tape {tape} | {fmt}"
@@ -89,8 +143,8 @@ class CaptureDeck(QWidget):
         self.manager.run_tape_control("play")
         # Only start preview if not already running
         if self.preview_process is None:
-            cmd = self.manager.get_preview_command(int(self.video_frame.winId()))
-            self.start_process(cmd)
+            stages = self.manager.get_preview_stages(int(self.video_frame.winId()))
+            self.start_process(stages)
 
     def stop_tape(self):
         self.manager.run_tape_control("stop")
@@ -98,31 +152,101 @@ class CaptureDeck(QWidget):
         if not self.btn_record.isChecked():
             self.kill_process()
 
-    def start_process(self, cmd_str):
-        # Starts a process and attaches setsid so we can kill the whole group later
-        self.preview_process = subprocess.Popen(cmd_str, shell=True, preexec_fn=os.setsid)
+    def start_process(self, stages):
+        # Every stage runs in one new process group so we can kill the whole pipeline later
+        self.preview_process = Pipeline(stages).start()
+
+    def on_preview_policy_changed(self, _index):
+        policy = self.preview_combo.currentData()
+        self.manager.config.set("preview_policy", policy)
+        if hasattr(self.preview_process, "set_preview"):
+            stages, every = self.manager.get_recording_preview(int(self.video_frame.winId()), policy)
+            self.preview_process.set_preview(stages, every)
+
+    def update_capture_stats(self):
+        if not hasattr(self.preview_process, "stats"):
+            return
+        st = self.preview_process.stats()
+        text = (f"Written: {st['bytes_written'] / 2**30:.2f} GB ({st['frames_written']} frames) | "
+                f"Preview dropped: {st['preview_frames_dropped']} (skipped {st['preview_frames_skipped']}) | "
+                f"Buffer peak: {100 * st['buffer_high_water'] // st['buffer_capacity']}%")
+
+        # Disk projection from the measured write rate (smoothed over a few seconds)
+        now = time.time()
+        last_time, last_bytes = self.last_sample or (now, 0)
+        if now > last_time:
+            rate = (st['bytes_written'] - last_bytes) / (now - last_time)
+            self.write_rate = rate if self.write_rate is None else 0.8 * self.write_rate + 0.2 * rate
+        self.last_sample = (now, st['bytes_written'])
+        # Other decks writing to the same disk fill it up too
+        folder = os.path.dirname(self.current_recording_path)
+        disk = self.manager.filesystem_id(folder)
+        rate = (self.write_rate or 0) + sum(p.write_rate or 0 for p in self.recording_peers()
+                                            if self.manager.filesystem_id(p.load_sample()['path']) == disk)
+        try:
+            free, seconds, must_stop = self.manager.project_disk_space(folder, rate, st['reserved_unused'])
+        except OSError:
+            free, seconds, must_stop = None, None, False
+        if free is not None:
+            text += f" | Free: {free / 2**30:.1f} GB"
+            if seconds is not None:
+                text += f" (stop in {int(seconds // 3600)}h{int(seconds % 3600 // 60):02d}m)"
+
+        blank_limit = float(self.manager.config.get("blank_stop_seconds") or 0)
+        if st['empty_seconds'] >= 2:
+            text += f" | No content: {int(st['empty_seconds'])}s"
+
+        if st['error']:
+            text += f" | ERROR: {st['error']}"
+        self.stats_label.setText(text)
+
+        if must_stop:
+            self.auto_stop_recording("Disk almost full",
+                                     f"Free space fell to the {self.manager.config.get('stop_reserve_gb')} GB reserve.")
+        elif blank_limit and st['empty_seconds'] >= blank_limit:
+            # Usually the end of the recorded part, but a stretch without date packs looks the same
+            self.auto_stop_recording("End of tape content",
+                                     f"No recorded content (blank tape, no signal or no recording date) "
+                                     f"for {int(blank_limit)} seconds.")
+
+    def auto_stop_recording(self, title, reason):
+        """Stops the capture exactly like the STOP REC button (scenes still get finalized) and parks the deck."""
+        if not self.btn_record.isChecked():
+            return
+        self.btn_record.setChecked(False)
+        self.toggle_record()
+        self.manager.run_tape_control("stop")
+        self.stats_label.setText(f"{title}: {reason} Recording stopped automatically.")
+        QMessageBox.warning(self, title, f"{reason}\nRecording was stopped automatically.")
 
     def kill_process(self):
+        self.stats_timer.stop()
         if self.watchdog:
             self.watchdog.stop_monitoring()
             self.watchdog.wait()
             self.watchdog = None
 
         if self.preview_process:
-            try:
-                os.killpg(os.getpgid(self.preview_process.pid), signal.SIGTERM)
-            except:
-                pass
+            self.preview_process.stop()
             self.preview_process = None
             self.video_frame.setStyleSheet("background-color: black; border: 2px solid #333;")
 
-    def on_crash_detected(self):
+    def on_crash_detected(self, stage, code):
+        error = getattr(self.preview_process, "error", None)
         self.kill_process()
         self.btn_record.setChecked(False)
         self.btn_record.setText("🔴 REC")
         self.video_frame.setStyleSheet("border: 2px solid #333;")
         self.info_label.setText("Current Session: Waiting for Setup...")
-        QMessageBox.critical(self, "Capture Error", "Signal Lost! Recording stopped safely.")
+        status = f"killed by signal {-code}" if code < 0 else f"exit status {code}"
+        if error: status += f"; write error: {error}"
+        QMessageBox.critical(self, "Capture Error",
+                             f"Signal Lost! Recording stopped safely.\n\n{stage} stopped ({status}).")
+
+    def on_stage_exited(self, stage, code):
+        # Recording carries on without it (live split keeps writing scenes when the preview dies)
+        self.video_frame.setStyleSheet("border: 2px solid orange;")
+        print(f"Warning: {stage} exited ({code}); recording continues.")
 
     # --- RECORDING LOGIC ---
     def toggle_record(self):
@@ -133,6 +257,12 @@ class CaptureDeck(QWidget):
             self.info_label.setText("Current Session: Waiting for Setup...")
             self.kill_process()
 
+            # Live split: scenes are already on disk, just wait for the splitter to flush its index
+            if self.manager.is_live_split():
+                self.info_label.setText("Finalizing scene files...")
+                self.wait_for_scene_index(time.time() + self.SCENE_INDEX_TIMEOUT)
+                return
+
             # CHANGED: We now ALWAYS attempt to autosplit, regardless of format.
             if self.current_recording_path and os.path.exists(self.current_recording_path):
                 if os.path.getsize(self.current_recording_path) > 0:
@@ -144,7 +274,9 @@ class CaptureDeck(QWidget):
         # 2. STARTING RECORDING
         is_safe, free_gb = self.manager.check_disk_space()
         if not is_safe:
-            QMessageBox.warning(self, "Low Disk Space", f"⚠️ WARNING: Only {free_gb}GB free!\nRecording may stop abruptly.")
+            minutes = int(free_gb * 2**30 / self.manager.dv_hour_bytes() * 60)
+            QMessageBox.warning(self, "Low Disk Space", f"⚠️ WARNING: Only {free_gb}GB free (about {minutes} min of DV)!\n"
+                                                        "Recording will stop automatically before the disk fills.")
 
         dialog = SessionDialog(self.manager.config.get("root_archive_path"))
         if dialog.exec():
@@ -159,30 +291,60 @@ class CaptureDeck(QWidget):
         if not self.manager.check_firewire_permissions():
             password, ok = QInputDialog.getText(self, "Sudo Access", "Enter Password for FireWire Access:", QLineEdit.EchoMode.Password)
             if ok and password:
-                os.system(f"echo {password} | sudo -S chmod 666 /dev/fw*")
+                fw_nodes = tools.fw_devices(self.manager.config)
+                if fw_nodes:
+                    # argv list and password on stdin: nothing here goes through a shell
+                    try:
+                        subprocess.run(["sudo", "-S", "chmod", "666", *fw_nodes], input=password + "\n",
+                                       text=True, capture_output=True)
+                    except OSError as e:
+                        print(f"Could not run sudo: {e}")
             else:
                 self.btn_record.setChecked(False)
                 return
 
+        # --- BENCH LOAD CHECK ---
+        # Bus bandwidth and disk throughput with this deck added to the ones already recording
+        warnings = self.manager.check_capture_load([p.load_sample() for p in self.recording_peers()] + [self.load_sample()])
+        if warnings:
+            reply = QMessageBox.question(self, "Capture Load", "\n\n".join(warnings) + "\n\nStart recording anyway?",
+                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                         QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes:
+                self.btn_record.setChecked(False)
+                return
+
         # Setup Paths via Manager
         dir_path, full_path, filename = self.manager.generate_paths(self.session_data)
-        os.makedirs(dir_path, exist_ok=True)
+        busy = [p.title() for p in self.recording_peers() if p.current_recording_path == full_path]
+        if busy:
+            QMessageBox.warning(self, "Tape In Use", f"{filename} is already being recorded on {busy[0]}.\n"
+                                                     "Pick another tape number for this deck.")
+            self.btn_record.setChecked(False)
+            return
         self.current_recording_path = full_path
 
+        # A stale index from an earlier take would make us finalize too early
+        index_path = self.manager.get_scene_index_path(full_path)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
         # Update UI for Recording
         self.btn_record.setText("⏹ STOP REC")
         self.video_frame.setStyleSheet("border: 2px solid red;")
         self.kill_process() # Stop any existing preview
 
         # Start Recording Process
-        cmd = self.manager.get_capture_command(full_path, int(self.video_frame.winId()))
         self.info_label.setText(f"Recording: {filename}")
-        
-        self.start_process(cmd)
+        self.preview_process = self.manager.get_capture_engine(full_path, int(self.video_frame.winId())).start()
+        self.last_sample = None
+        self.write_rate = None
+        self.stats_timer.start(1000)
         
         # Start Watchdog
         self.watchdog = RecordingWatchdog(self.preview_process)
         self.watchdog.crash_detected.connect(self.on_crash_detected)
+        self.watchdog.stage_exited.connect(self.on_stage_exited)
         self.watchdog.start()
 
     # --- AUTOSPLIT LOGIC ---
@@ -193,25 +355,41 @@ class CaptureDeck(QWidget):
         # UI: Progress Dialog
         self.progress = QProgressDialog("Scanning tape for scenes...", "Abort", 0, 0, self)
         self.progress.setWindowTitle("Processing Scenes")
-        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        # Not modal: the other decks on the bench must stay usable while this one splits
+        self.progress.setWindowModality(Qt.WindowModality.NonModal)
         self.progress.setMinimumDuration(0)
         self.progress.setValue(0)
 
-        # Worker: Handles the blocking process
-        self.splitter = AutosplitWorker(master_file, cmd)
+        # Worker: Handles the blocking process (native byte-range split when the frame index is available)
+        if self.manager.use_native_autosplit():
+            self.splitter = SceneSplitWorker(master_file, self.manager)
+        else:
+            self.splitter = AutosplitWorker(master_file, cmd)
         self.splitter.status_update.connect(lambda msg: self.progress.setLabelText(f"Status: {msg}"))
         self.splitter.finished.connect(self.on_autosplit_finished)
         self.progress.canceled.connect(self.splitter.cancel)
         
         self.splitter.start()
 
+    def wait_for_scene_index(self, deadline):
+        """Polls (without blocking the UI) until the live splitter has written its master index."""
+        master_file = self.current_recording_path
+        if self.manager.load_scene_index(master_file) is None and time.time() < deadline:
+            QTimer.singleShot(250, lambda: self.wait_for_scene_index(deadline))
+            return
+        self.finalize_scenes(master_file, has_master=False)
+
     def on_autosplit_finished(self):
         self.progress.setValue(100)
-        master_file = self.current_recording_path
+        self.finalize_scenes(self.current_recording_path, has_master=True)
+
+    def finalize_scenes(self, master_file, has_master):
+        """Date check, optional master cleanup and hand-off to the converter."""
         split_files = self.manager.find_split_files(master_file)
 
         if not split_files:
-            QMessageBox.warning(self, "Error", "Autosplit failed to generate any scene files.")
+            error = "Autosplit failed to generate any scene files." if has_master else "No scene files were recorded."
+            QMessageBox.warning(self, "Error", error)
             return
 
         # Date Check
@@ -229,20 +407,101 @@ class CaptureDeck(QWidget):
                 final_status = "Session Complete. Files left undated."
 
         # Master Cleanup
-        reply = QMessageBox.question(self, 'Save Space?',
-                                        f"{final_status}\n\nDo you want to DELETE the original Master file?",
-                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                                        QMessageBox.StandardButton.No)
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            try:
-                os.remove(master_file)
-                self.info_label.setText("Master Deleted. " + final_status)
-            except OSError:
-                pass
+        if not has_master:
+            self.info_label.setText(final_status)
         else:
-            self.info_label.setText("Master Saved. " + final_status)
+            reply = QMessageBox.question(self, 'Save Space?',
+                                            f"{final_status}\n\nDo you want to DELETE the original Master file?",
+                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                            QMessageBox.StandardButton.No)
+            
+            if reply == QMessageBox.StandardButton.Yes:
+                try:
+                    os.remove(master_file)
+                    self.info_label.setText("Master Deleted. " + final_status)
+                except OSError:
+                    pass
+            else:
+                self.info_label.setText("Master Saved. " + final_status)
         
         # --- SIGNAL FINISHED ---
         # Emit the folder path so main.py can switch tabs
         self.session_finished.emit(os.path.dirname(master_file))
+
+
+class CaptureBench(QWidget):
+    """
+    The capture tab: one CaptureDeck per connected deck, keyed by FireWire GUID, each with its
+    own pipeline, watchdog, session and autosplit job. Without sysfs (or with nothing identified
+    yet) a single unbound deck drives whichever camera is plugged in, as before.
+    """
+    session_finished = pyqtSignal(str)
+    LOAD_CHECK_INTERVAL = 2000 # ms
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.manager = CaptureManager(config)
+        self.decks = {} # guid (None = unbound) -> CaptureDeck
+        self.present = []
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        # Combined bus / disk warnings for everything recording right now
+        self.load_label = QLabel("")
+        self.load_label.setStyleSheet("color: orange; font-weight: bold; padding: 5px;")
+        self.load_label.setWordWrap(True)
+        self.load_label.setVisible(False)
+        layout.addWidget(self.load_label)
+
+        self.deck_tabs = QTabWidget()
+        layout.addWidget(self.deck_tabs)
+
+        self.update_decks(tools.list_decks(config) or [])
+
+        self.load_timer = QTimer(self)
+        self.load_timer.timeout.connect(self.check_load)
+        self.load_timer.start(self.LOAD_CHECK_INTERVAL)
+
+    @property
+    def btn_record(self):
+        # The tour points at the deck in front
+        return self.deck_tabs.currentWidget().btn_record
+
+    def add_deck(self, guid, deck):
+        widget = CaptureDeck(self.config, deck, peers=lambda: list(self.decks.values()))
+        widget.session_finished.connect(self.session_finished.emit)
+        self.decks[guid] = widget
+        self.deck_tabs.addTab(widget, widget.title())
+
+    def remove_deck(self, guid):
+        widget = self.decks.pop(guid)
+        widget.kill_process()
+        self.deck_tabs.removeTab(self.deck_tabs.indexOf(widget))
+        widget.deleteLater()
+
+    def update_decks(self, decks):
+        """Called with firewire.list_decks() whenever the connection monitor sees a change."""
+        self.present = decks
+        present = {d['guid']: d for d in decks}
+        for guid, deck in present.items():
+            if guid not in self.decks:
+                self.add_deck(guid, deck)
+        for guid, widget in list(self.decks.items()):
+            if guid in present or widget.is_busy():
+                continue # A deck unplugged mid-recording stays until its watchdog has reported
+            if guid is None and not present:
+                continue
+            self.remove_deck(guid)
+        if not self.decks:
+            self.add_deck(None, None)
+
+    def check_load(self):
+        # Drop decks that went away while busy and have since stopped
+        self.update_decks(self.present)
+
+        streams = [d.load_sample() for d in self.decks.values() if d.is_recording()]
+        warnings = self.manager.check_capture_load(streams) if streams else []
+        self.load_label.setText("\n".join(f"⚠️ {w}" for w in warnings))
+        self.load_label.setVisible(bool(warnings))
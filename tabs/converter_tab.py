@@ -1,9 +1,12 @@
 # converter_tab.py
 import os
+import sqlite3
+import datetime
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QPushButton, 
                              QProgressBar, QTextEdit, QFileDialog)
 from PyQt6.QtCore import Qt
 from core.workers import ConverterWorker
+from core.ingest import IngestQueue, PRIORITY_SESSION, PRIORITY_MANUAL
 
 class ConverterTab(QWidget):
     # CHANGED: Added config argument to __init__
@@ -37,6 +40,17 @@ class ConverterTab(QWidget):
         self.progress.setValue(0)
         layout.addWidget(self.progress)
 
+        # Live Throughput (fps / ETA) and the jobs currently in flight
+        self.lbl_throughput = QLabel("")
+        self.lbl_throughput.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.lbl_throughput.setStyleSheet("color: #888;")
+        layout.addWidget(self.lbl_throughput)
+
+        self.lbl_jobs = QLabel("")
+        self.lbl_jobs.setStyleSheet("color: #888; font-family: Monospace; font-size: 9pt;")
+        self.lbl_jobs.setWordWrap(True)
+        layout.addWidget(self.lbl_jobs)
+
         # Log Window
         self.log_window = QTextEdit()
         self.log_window.setReadOnly(True)
@@ -45,29 +59,95 @@ class ConverterTab(QWidget):
 
         # Worker placeholder
         self.worker = None
+        self.active_jobs = {}
+        self.converting = False
+        self.current_folder = None
+
+        # Persistent conversion queue, shared with the archive watcher (and any headless daemon)
+        self.queue = None
+        self.queued_folders = [] # In-memory fallback when the queue database can't be opened
+        try:
+            self.queue = IngestQueue()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Conversion queue unavailable: {e}")
 
     def log(self, message):
         self.log_window.append(message)
 
+    def on_job_progress(self, label, percent):
+        if percent >= 100:
+            self.active_jobs.pop(label, None)
+        else:
+            self.active_jobs[label] = percent
+        self.lbl_jobs.setText("\n".join(f"{pct:3d}%  {name}" for name, pct in self.active_jobs.items()))
+
+    def on_throughput(self, fps, eta):
+        eta_text = str(datetime.timedelta(seconds=eta)) if eta >= 0 else "--:--:--"
+        self.lbl_throughput.setText(f"Encoding at {fps:.1f} fps  |  ETA {eta_text}")
+
     def select_folder(self):
         # CHANGED: Uses config path as start location
         start_path = self.config.get("root_archive_path")
         folder = QFileDialog.getExistingDirectory(self, "Select DV Tape Folder", start_path)
         
         if folder:
-            self.start_conversion(folder)
+            self.start_conversion(folder, PRIORITY_MANUAL)
+
+    def start_conversion(self, folder, priority=PRIORITY_SESSION):
+        """Queues a tape folder; it starts right away unless another tape is converting."""
+        try:
+            self.queue.enqueue(folder, priority)
+        except (AttributeError, OSError, sqlite3.Error):
+            self.queued_folders.append(folder)
+        if self.converting:
+            self.log(f"Queued (another tape is converting): {folder}")
+        self.drain()
+
+    def next_folder(self):
+        if self.queued_folders:
+            return self.queued_folders.pop(0)
+        try:
+            return self.queue.claim() if self.queue else None
+        except sqlite3.Error as e:
+            print(f"Conversion queue unavailable: {e}")
+            return None
+
+    def drain(self):
+        """Starts the next queued tape (highest priority first) if nothing is converting."""
+        if self.converting:
+            return
+        folder = self.next_folder()
+        if folder:
+            self.run_conversion(folder)
 
-    def start_conversion(self, folder):
+    def run_conversion(self, folder):
+        self.converting = True
+        self.current_folder = folder
         self.btn_select.setEnabled(False)
         self.log_window.clear()
+        self.active_jobs = {}
+        self.lbl_jobs.setText("")
         self.log(f"Process started for: {folder}")
         
-        self.worker = ConverterWorker(folder)
+        self.worker = ConverterWorker(folder, self.config)
         self.worker.log_message.connect(self.log)
         self.worker.progress_update.connect(self.progress.setValue)
+        self.worker.job_progress.connect(self.on_job_progress)
+        self.worker.throughput_update.connect(self.on_throughput)
         self.worker.finished.connect(self.on_finished)
         self.worker.start()
 
-    def on_finished(self):
+    def on_finished(self, ok):
         self.btn_select.setEnabled(True)
-        self.log("--- JOB COMPLETE ---")
\ No newline at end of file
+        self.active_jobs = {}
+        self.lbl_jobs.setText("")
+        self.lbl_throughput.setText("")
+        if self.queue:
+            try:
+                self.queue.finish(self.current_folder, ok)
+            except sqlite3.Error as e:
+                print(f"Conversion queue unavailable: {e}")
+        self.converting = False
+        self.current_folder = None
+        self.log("--- JOB COMPLETE ---")
+        self.drain()
\ No newline at end of file
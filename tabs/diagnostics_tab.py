@@ -12,9 +12,11 @@ class DiagnosticsTab(QWidget):
     # Signals to tell Main Window status
     checks_finished = pyqtSignal(list) 
     camera_online = pyqtSignal(bool) # <--- NEW SIGNAL
+    decks_changed = pyqtSignal(list) # Connected decks by GUID (for the capture bench)
 
-    def __init__(self):
+    def __init__(self, config=None):
         super().__init__()
+        self.cfg = config # tool_dir / device_root overrides (core/tools.py)
         layout = QVBoxLayout()
         
         self.title = QLabel("System Diagnostics & Connection Monitor")
@@ -118,7 +120,7 @@ class DiagnosticsTab(QWidget):
         self.progress.setValue(0)
         
         # Remove self.root_dir reference
-        self.worker = DiagnosticWorker(mode=mode)
+        self.worker = DiagnosticWorker(mode=mode, config=self.cfg)
         self.worker.progress_update.connect(self.progress.setValue)
         self.worker.status_update.connect(self.log)
         self.worker.finished.connect(self.on_diagnostics_finished)
@@ -127,9 +129,10 @@ class DiagnosticsTab(QWidget):
     def toggle_monitor(self):
         if self.monitor_worker is None:
             # START MONITOR
-            self.monitor_worker = ConnectionMonitorWorker()
+            self.monitor_worker = ConnectionMonitorWorker(config=self.cfg)
             # CHANGED: Connect to parser instead of direct log
             self.monitor_worker.status_update.connect(self.parse_monitor_status)
+            self.monitor_worker.decks_changed.connect(self.decks_changed.emit)
             self.monitor_worker.start()
             
             self.btn_monitor.setText("⏹ Stop Live Monitor")
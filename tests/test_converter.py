@@ -0,0 +1,144 @@
+# tests/test_converter.py
+# TapeConverter planning, plus end-to-end encodes of synthetic DV when a real ffmpeg is installed.
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+
+from core import dv_format
+from core.config_manager import ConfigManager
+from core.converter import TapeConverter
+from benchmarks import dv_synth
+
+
+def make_config(home, **settings):
+    with mock.patch.dict(os.environ, HOME=home):
+        config = ConfigManager()
+    config.settings.update({"governor": False, "converter_max_jobs": 2}, **settings)
+    return config
+
+
+def thumbnail_numbers(converter, segment, frame_count):
+    """File numbers the thumbnails filter of one segment writes (what select + setpts=N+index do)."""
+    first = segment['first_frame']
+    period = converter.thumbnail_period(segment['standard'])
+    picked = [n for n in range(frame_count) if (n + first) % period == 0]
+    index = -(-first // period)
+    return [index + i for i in range(len(picked))]
+
+
+class ThumbnailPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="retroreel-conv-")
+        self.clip = os.path.join(self.tmp, "clip.dv")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def plan(self, seconds, **settings):
+        frames = int(seconds * dv_format.FRAME_RATE["NTSC"])
+        with open(self.clip, "wb") as f:
+            f.truncate(frames * dv_format.FRAME_SIZE["NTSC"])
+        settings.setdefault("output_profiles", ["thumbnails"])
+        converter = TapeConverter(self.tmp, make_config(self.tmp, **settings))
+        size = os.path.getsize(self.clip)
+        job = {'ranges': [(self.clip, 0, size)], 'standard': "NTSC", 'orig': "clip.dv",
+               'path': os.path.join(self.tmp, "clip.mp4"),
+               'outputs': converter.plan_outputs(os.path.join(self.tmp, "clip.mp4"))}
+        return converter, job, frames
+
+    def test_short_clip_keeps_frame_zero(self):
+        converter, job, frames = self.plan(4)
+        cmd = converter.build_encode_command(self.clip, job['outputs'], None, "NTSC")
+        graph = cmd[cmd.index("-filter_complex") + 1]
+        self.assertIn("select=not(mod(n+0\\,300)),setpts=N+0", graph)
+        self.assertTrue(converter.has_thumbnail(0, frames, "NTSC"))
+
+    def test_segments_number_without_collisions(self):
+        # 4 s segments, a still every 10 s: some segments hold none and must not ask for any
+        converter, job, frames = self.plan(25.5, segment_encoding=True, segment_seconds=4)
+        segments = converter.plan_segments(job)
+        numbers = []
+        for seg in segments:
+            count = (seg['end'] - seg['start']) // dv_format.FRAME_SIZE["NTSC"]
+            seg_numbers = thumbnail_numbers(converter, seg, count)
+            self.assertEqual('thumbnails' in seg['outputs'], bool(seg_numbers), seg['label'])
+            numbers += seg_numbers
+        period = converter.thumbnail_period("NTSC")
+        self.assertEqual(numbers, list(range(-(-frames // period))))
+        self.assertIn(False, ['thumbnails' in seg['outputs'] for seg in segments])
+
+    def test_segments_keep_the_frame_rate(self):
+        converter, job, frames = self.plan(15, segment_encoding=True, segment_seconds=5,
+                                           output_profiles=["proxy_360p"])
+        converter.manifest = mock.Mock()
+        for seg in converter.plan_segments(job):
+            cmd, _ = converter.segment_command(seg)
+            # One -r per video output, with the exact NTSC rate
+            self.assertEqual([cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-r"], ["30000/1001"] * 2)
+
+
+def working_ffmpeg():
+    try:
+        return subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True,
+                              check=True).stdout.count("libx264") > 0
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def probe_video(path):
+    """(frame count, frame rate) of the first video stream."""
+    out = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0", "-count_frames",
+                          "-show_entries", "stream=nb_read_frames,r_frame_rate", "-of", "csv=p=0", path],
+                         capture_output=True, text=True, check=True).stdout.strip()
+    rate, count = out.split(",")
+    return int(count), rate
+
+
+@unittest.skipUnless(working_ffmpeg(), "needs a real ffmpeg with libx264")
+class ShortClipEncodeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="retroreel-conv-")
+        self.source = dv_synth.ffmpeg_source_frames("NTSC", self.tmp)
+        self.assertIsNotNone(self.source)
+        self.tape = os.path.join(self.tmp, "mini_dv", "s", "doe", "dv_format", "tape_01_dv-1")
+        os.makedirs(self.tape)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def convert(self, seconds, **settings):
+        dv_synth.write_scenes(self.tape, "doe_mdv_t01-", self.source, "NTSC",
+                              dv_synth.scene_plan("NTSC", seconds / 60, 1))
+        config = make_config(self.tmp, output_profiles=["thumbnails"], root_archive_path=self.tmp, **settings)
+        converter = TapeConverter(self.tape, config, log=lambda message: None)
+        self.assertTrue(converter.run())
+        self.dest_base = converter.dest_base
+        thumbs = []
+        for folder, _, files in os.walk(converter.dest_base):
+            thumbs += [f for f in files if f.endswith(".jpg")]
+        return thumbs
+
+    def test_clip_shorter_than_the_interval(self):
+        self.assertEqual(len(self.convert(4.5)), 1)
+
+    def test_short_tail_segment(self):
+        # 13.4 s in 4 s segments: the second segment and the 1.4 s tail hold no thumbnail frame
+        self.assertEqual(len(self.convert(13.4, segment_encoding=True, segment_seconds=4)), 2)
+
+    def test_segment_output_matches_whole_clip(self):
+        results = []
+        for settings in ({}, {'segment_encoding': True, 'segment_seconds': 5}):
+            shutil.rmtree(os.path.join(os.path.dirname(os.path.dirname(self.tape)), "mp4_format"), ignore_errors=True)
+            self.convert(15, **settings)
+            clip = [os.path.join(folder, f) for folder, _, files in os.walk(self.dest_base)
+                    for f in files if f.endswith(".mp4") and folder != self.dest_base]
+            results.append(probe_video(clip[0]))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][1], "30000/1001")
+
+
+if __name__ == "__main__":
+    unittest.main()
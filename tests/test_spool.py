@@ -0,0 +1,147 @@
+# tests/test_spool.py
+# Claim / lease protocol of the encode spool (core/spool.py) with real worker processes.
+# ffmpeg is a stand-in script that logs each run and writes its output file.
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import tempfile
+import unittest
+import subprocess
+
+from core.spool import EncodeSpool, check_command
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEASE_SECONDS = 2
+FAKE_FFMPEG = """#!{python}
+import os, sys, time
+fd = os.open({log!r}, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+os.write(fd, (sys.argv[sys.argv.index("-i") + 1] + "\\n").encode())
+os.close(fd)
+time.sleep(0.3)
+open(sys.argv[-1], "w").close()
+"""
+
+
+class SpoolWorkersTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="retroreel-spool-")
+        self.archive = os.path.join(self.tmp, "archive")
+        self.tape = os.path.join(self.archive, "mini_dv", "s", "c", "dv_format", "tape_01")
+        self.spool_dir = os.path.join(self.tmp, "spool")
+        self.runs = os.path.join(self.tmp, "runs.log")
+        bin_dir = os.path.join(self.tmp, "bin")
+        for d in (self.tape, bin_dir):
+            os.makedirs(d)
+        with open(os.path.join(bin_dir, "ffmpeg"), "w") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable, log=self.runs))
+        os.chmod(os.path.join(bin_dir, "ffmpeg"), 0o755)
+
+        # Workers get their own config home, pointed at our archive and stand-in ffmpeg
+        env = dict(os.environ, HOME=self.tmp, PYTHONPATH=APP_ROOT)
+        settings = ["root_archive_path=" + self.archive, "tool_dir=" + bin_dir, "governor=false",
+                    f"spool_lease_seconds={LEASE_SECONDS}", "converter_max_jobs=2"]
+        cmd = [sys.executable, "-m", "retroreel", "worker", self.spool_dir]
+        for setting in settings:
+            cmd += ["--set", setting]
+        self.spool = EncodeSpool(self.spool_dir, LEASE_SECONDS, log=lambda message: None).start()
+        self.workers = [subprocess.Popen(cmd, env=env, cwd=self.tmp, stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.DEVNULL) for _ in range(2)]
+
+    def tearDown(self):
+        for proc in self.workers:
+            proc.send_signal(signal.SIGTERM)
+        for proc in self.workers:
+            proc.wait(30)
+        self.spool.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def publish(self, name, dead_claim=False):
+        clip = os.path.join(self.tape, f"{name}.dv")
+        open(clip, "w").close()
+        part = os.path.join(self.tape, f"{name}.mp4.part")
+        argv = ["ffmpeg", "-hide_banner", "-y", "-i", clip, "-c:v", "libx264", part]
+        if dead_claim:
+            # Claimed by a station that died: its lease is several lease times old
+            claim = self.spool.claim_path(self.spool.job_id(argv))
+            with open(claim, "w") as f:
+                json.dump({'token': "gone", 'owner': "dead-station:1"}, f)
+            old = time.time() - 5 * LEASE_SECONDS
+            os.utime(claim, (old, old))
+        return self.spool.publish(argv, [part], name, root=self.archive), clip, part
+
+    def wait_for_results(self, job_ids, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if all(self.spool.result(job_id) for job_id in job_ids):
+                return
+            time.sleep(0.2)
+        self.fail("not every job got a result")
+
+    def test_each_job_runs_once_and_expired_lease_is_reclaimed(self):
+        jobs = [self.publish(f"clip_{n}") for n in range(6)]
+        orphan = self.publish("orphan", dead_claim=True)
+        claim = self.spool.claim_path(orphan[0])
+        jobs.append(orphan)
+
+        self.wait_for_results([job_id for job_id, _, _ in jobs])
+        with open(self.runs) as f:
+            runs = f.read().split()
+        for job_id, clip, part in jobs:
+            self.assertTrue(self.spool.result(job_id)['ok'], job_id)
+            self.assertEqual(runs.count(clip), 1, clip)
+            self.assertTrue(os.path.exists(part), part)
+        self.assertEqual(len(runs), len(jobs))
+        self.assertFalse(os.path.exists(claim))
+        # Both workers took part
+        owners = {self.spool.result(job_id)['owner'] for job_id, _, _ in jobs}
+        self.assertEqual(len(owners), 2)
+
+    def test_foreign_command_is_refused(self):
+        outside = os.path.join(self.tmp, "pwned")
+        job_id = self.spool.publish(["sh", "-c", f"touch {outside}"], [], "evil", root=self.archive)
+        self.wait_for_results([job_id])
+        self.assertFalse(self.spool.result(job_id)['ok'])
+        self.assertFalse(os.path.exists(outside))
+
+
+class CheckCommandTest(unittest.TestCase):
+    root = "/archive"
+
+    def test_converter_command_passes(self):
+        check_command(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-f", "dv", "-i",
+                       "concat:subfile,,start,0,end,120000,,:/archive/a.dv|/archive/b.dv",
+                       "-filter_complex", "[0:v]yadif,format=yuv420p,split=2[s0][s1];[s0]null[o0];"
+                                          "[s1]setpts=PTS+0/TB,fps=1/10[o1]",
+                       "-map", "[o0]", "-map", "0:a?", "-c:v", "libx264", "/archive/a.mp4.part",
+                       "-map", "[o1]", "-q:v", "3", "-frame_pts", "1", "/archive/thumbs/a_%05d.jpg"],
+                      ["/archive/a.mp4.part"], self.root)
+        # A video-only segment with its overlap frames trimmed off
+        check_command(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-f", "dv", "-i",
+                       "concat:subfile,,start,0,end,360000,,:/archive/a.dv|subfile,,start,360000,end,720000,,:/archive/a.dv",
+                       "-c:v", "libx264", "-crf", "20", "-preset", "medium",
+                       "-vf", "yadif,trim=start_frame=2:end_frame=302,setpts=PTS-STARTPTS,format=yuv420p",
+                       "-an", "-movflags", "+faststart", "/archive/.segments_a/part001_master.part.mp4"],
+                      ["/archive/.segments_a/part001_master.part.mp4"], self.root)
+
+    def test_rejects(self):
+        bad = [
+            ["sh", "-c", "true"],
+            ["ffmpeg", "-i", "/archive/a.dv", "/etc/passwd"],
+            ["ffmpeg", "-i", "/archive/../etc/shadow", "/archive/a.mp4"],
+            ["ffmpeg", "-i", "http://example.com/x", "/archive/a.mp4"],
+            ["ffmpeg", "-i", "/archive/a.dv", "-vf", "movie=/etc/passwd", "/archive/a.mp4"],
+            ["ffmpeg", "-i", "/archive/a.dv", "-attach", "/etc/passwd", "/archive/a.mp4"],
+            ["ffmpeg", "-f", "lavfi", "-i", "/archive/a.dv", "/archive/a.mp4"],
+        ]
+        for argv in bad:
+            with self.assertRaises(ValueError, msg=argv):
+                check_command(argv, [], self.root)
+        with self.assertRaises(ValueError):
+            check_command(["ffmpeg", "-i", "/archive/a.dv", "/archive/a.mp4"], ["/tmp/x.part"], self.root)
+
+
+if __name__ == "__main__":
+    unittest.main()